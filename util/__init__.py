@@ -0,0 +1,3 @@
+# gaussian splatting ply -> glb converter for the viewer.
+# submodules are not imported here so that `immerscape-convert` starts fast.
+__version__ = "0.1.0"
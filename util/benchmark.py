@@ -0,0 +1,336 @@
+import numpy as np
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from . import profiling
+from . import synthetic
+from . import sorting
+from . import accel
+from .scene import Scene
+from .threeD import Kernel_3dgs
+
+FORMAT_VERSION = 1
+REORDERS = ('Morton', 'Hilbert')
+# 基准中耗时低于该值（秒）的阶段噪声太大，不参与回归判断
+MIN_COMPARE_WALL = 0.01
+
+
+def machineInfo() -> dict:
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+def caseName(kind: str, distribution: str, count: str) -> str:
+    return f"{kind}-{distribution}-{count}"
+
+def runPipeline(path: str, outputPath: str, reorder: str) -> dict:
+    """
+    按 convert 的流程转换一次（stdout 被丢弃），返回每个阶段的记录。
+    """
+    profiler = profiling.Profiler(traceMemory=False)
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        scene = Scene(path, "benchmark", profiler)
+        scene.reorder(reorder)
+        scene.toGLB(outputPath, False)
+    stages = {stage["name"]: stage for stage in profiler.stages}
+    stages["total"] = {"wall": time.perf_counter() - start_time,
+                       "cpu": sum(stage["cpu"] for stage in profiler.stages)}
+    return stages
+
+def runCase(path: str, workDir: str, repeat: int) -> dict:
+    """
+    对一个场景的每种排序重复 repeat 次，每个阶段取最短的墙钟时间和 CPU 时间。
+    """
+    outputPath = os.path.join(workDir, "benchmark.glb")
+    results = {}
+    try:
+        for reorder in REORDERS:
+            for _ in range(repeat):
+                for name, stage in runPipeline(path, outputPath, reorder).items():
+                    key = f"{reorder}/{name}"
+                    best = results.setdefault(key, {"wall": np.inf, "cpu": np.inf})
+                    best["wall"] = min(best["wall"], stage["wall"])
+                    best["cpu"] = min(best["cpu"], stage["cpu"])
+    finally:
+        if os.path.exists(outputPath):
+            os.remove(outputPath)
+    return results
+
+def curveEncoder(reorder: str):
+    """
+    (编码函数, 有效位数)，与 Kernel_3dgs.z_order_sort / hilbert_curve_sort 相同。
+    """
+    if reorder == 'Morton':
+        return Kernel_3dgs.morton_codes, 63
+    return (lambda points, min_coords, scale: Kernel_3dgs.hilbert_codes(points, 16, min_coords, scale)), 48
+
+def runScaling(points: np.ndarray, threads: list, repeat: int) -> dict:
+    """
+    用不同线程数编码并排序 points，每项取 repeat 次中最短的墙钟时间。
+    'numpy' 为单线程的 numpy 编码加 np.argsort；numba 可用且点数足够时各线程数使用 numba 编码。
+    每种线程数的排列都与 np.argsort(kind='stable') 比较，不一致时抛出异常。
+    """
+    results = {}
+    min_coords, scale = Kernel_3dgs.bounds(points)
+    for reorder in REORDERS:
+        encode, keyBits = curveEncoder(reorder)
+        timings = {}
+
+        best = {"encode": np.inf, "sort": np.inf}
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            with accel.disabled():
+                keys = encode(points, min_coords, scale)
+            best["encode"] = min(best["encode"], time.perf_counter() - start_time)
+            start_time = time.perf_counter()
+            np.argsort(keys)
+            best["sort"] = min(best["sort"], time.perf_counter() - start_time)
+        timings["numpy"] = best
+        expected = np.argsort(keys, kind='stable')
+
+        for count in threads:
+            accel.setWorkers(count)
+            best = {"encode": np.inf, "sort": np.inf}
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                keys = sorting.encode_keys(encode, points, min_coords, scale, count)
+                best["encode"] = min(best["encode"], time.perf_counter() - start_time)
+                start_time = time.perf_counter()
+                order = sorting.parallel_argsort(keys, keyBits, count)
+                best["sort"] = min(best["sort"], time.perf_counter() - start_time)
+            if not np.array_equal(order, expected):
+                raise RuntimeError(f"{reorder} order with {count} thread(s) differs from np.argsort")
+            timings[str(count)] = best
+        accel.setWorkers(None)
+
+        for timing in timings.values():
+            timing["total"] = timing["encode"] + timing["sort"]
+        results[reorder] = timings
+    return results
+
+def printScaling(name: str, scaling: dict):
+    for reorder, timings in scaling.items():
+        base = timings["numpy"]["total"]
+        print(f"\n{name} {reorder}")
+        print(f"{'threads':<10}{'encode(s)':>12}{'sort(s)':>12}{'total(s)':>12}{'speedup':>10}")
+        for count, timing in timings.items():
+            print(f"{count:<10}{timing['encode']:>12.3f}{timing['sort']:>12.3f}{timing['total']:>12.3f}"
+                  f"{base / timing['total']:>10.2f}")
+
+def scalingBenchmark(args, distributions: list, counts: list) -> dict:
+    """
+    只测量 reorder 中的编码和排序，点在内存中生成，不写 ply。
+    """
+    threads = sorted({int(count) for count in args.scaling.split(',')})
+    if threads[0] < 1:
+        raise ValueError("thread counts must be at least 1")
+    cases = {}
+    for distribution in distributions:
+        for count in counts:
+            name = f"{distribution}-{count}"
+            rng = np.random.default_rng([args.seed, 1])
+            centers, sigmas = synthetic.clusters(args.seed)
+            points, _ = synthetic.positions(rng, centers, sigmas, synthetic.parseCount(count), distribution)
+            scaling = runScaling(points.astype(np.float32), threads, args.repeat)
+            cases[name] = {"distribution": distribution, "splats": synthetic.parseCount(count), "threads": scaling}
+            printScaling(name, scaling)
+    return cases
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    与基准结果比较，返回 [(case, stage, baseline wall, wall, ratio)] 中超过阈值的项。
+    """
+    regressions = []
+    print(f"\n{'case':<28}{'stage':<20}{'base(s)':>10}{'now(s)':>10}{'ratio':>8}")
+    for case, result in results["cases"].items():
+        if case not in baseline.get("cases", {}):
+            continue
+        base = baseline["cases"][case]["stages"]
+        for stage, timing in result["stages"].items():
+            if stage not in base:
+                continue
+            before, now = base[stage]["wall"], timing["wall"]
+            ratio = now / before if before > 0 else 1.0
+            regressed = before >= MIN_COMPARE_WALL and ratio > 1.0 + threshold
+            print(f"{case:<28}{stage:<20}{before:>10.3f}{now:>10.3f}{ratio:>8.2f}{'  <- regression' if regressed else ''}")
+            if regressed:
+                regressions.append((case, stage, before, now, ratio))
+    return regressions
+
+def benchmark(args) -> int:
+    kinds = [kind.strip() for kind in args.kinds.split(',')]
+    distributions = [distribution.strip() for distribution in args.distributions.split(',')]
+    counts = [count.strip().upper() for count in args.sizes.split(',')]
+    for kind in kinds:
+        if kind not in synthetic.KINDS:
+            print(f"Error: unknown kind '{kind}'")
+            return 1
+    for distribution in distributions:
+        if distribution not in synthetic.DISTRIBUTIONS:
+            print(f"Error: unknown distribution '{distribution}'")
+            return 1
+    if args.repeat < 1:
+        print(f"Error: repeat must be at least 1")
+        return 1
+
+    dataDir = args.data if args.data is not None else os.path.join(tempfile.gettempdir(), "gs_benchmark")
+    os.makedirs(dataDir, exist_ok=True)
+
+    results = {
+        "format": FORMAT_VERSION,
+        "machine": machineInfo(),
+        "settings": {"repeat": args.repeat, "seed": args.seed},
+        "cases": {},
+    }
+    if args.scaling is not None:
+        try:
+            results["scaling"] = scalingBenchmark(args, distributions, counts)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+        if args.output is not None:
+            with open(args.output, 'w') as file:
+                json.dump(results, file, indent=2)
+            print(f"results saved to {args.output}")
+        return 0
+
+    for kind in kinds:
+        for distribution in distributions:
+            for count in counts:
+                name = caseName(kind, distribution, count)
+                path = os.path.join(dataDir, f"{name}-s{args.seed}.ply")
+                if not os.path.exists(path):
+                    print(f"generating {path}")
+                    synthetic.generate(path, synthetic.parseCount(count), kind, distribution, args.seed)
+
+                stages = runCase(path, dataDir, args.repeat)
+                results["cases"][name] = {
+                    "kind": kind,
+                    "distribution": distribution,
+                    "splats": synthetic.parseCount(count),
+                    "fileBytes": os.path.getsize(path),
+                    "stages": stages,
+                }
+                summary = ", ".join(f"{reorder} {stages[f'{reorder}/total']['wall']:.2f}s" for reorder in REORDERS)
+                print(f"{name}: {summary}")
+
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"results saved to {args.output}")
+
+    if args.compare is not None:
+        with open(args.compare, 'r') as file:
+            baseline = json.load(file)
+        if baseline.get("format") != FORMAT_VERSION:
+            print(f"Error: baseline format {baseline.get('format')} is not {FORMAT_VERSION}")
+            return 1
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than baseline by more than {args.threshold:.0%}")
+            return 1
+        print(f"\nno regression beyond {args.threshold:.0%}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="benchmark the conversion stages on seeded synthetic scenes",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "-s", "--sizes",
+        dest="sizes",
+        type=str,
+        default="100K,1M",
+        help="comma separated scene sizes, e.g. 100K,1M,10M. \n\
+            Default: 100K,1M"
+    )
+    parser.add_argument(
+        "-k", "--kinds",
+        dest="kinds",
+        type=str,
+        default="3dgs,spacetime",
+        help="comma separated gaussian kinds. \n\
+            Default: 3dgs,spacetime"
+    )
+    parser.add_argument(
+        "-d", "--distributions",
+        dest="distributions",
+        type=str,
+        default=",".join(synthetic.DISTRIBUTIONS),
+        help="comma separated distributions: uniform, clustered, floaters. \n\
+            Default: all"
+    )
+    parser.add_argument(
+        "--repeat",
+        dest="repeat",
+        type=int,
+        default=3,
+        help="runs per case, the fastest one is kept. \n\
+            Default: 3"
+    )
+    parser.add_argument(
+        "--seed",
+        dest="seed",
+        type=int,
+        default=0,
+        help="seed of the synthetic scenes. \n\
+            Default: 0"
+    )
+    parser.add_argument(
+        "--data",
+        dest="data",
+        type=str,
+        default=None,
+        help="directory for the generated scenes, reused between runs. \n\
+            Default: <temp dir>/gs_benchmark"
+    )
+    parser.add_argument(
+        "--scaling",
+        dest="scaling",
+        type=str,
+        default=None,
+        help="comma separated thread counts, e.g. 1,2,4,8. Only time the key \n\
+            encoding and sort of reorder with each count against np.argsort, \n\
+            on in-memory points of each size and distribution. \n\
+            Default: run the full pipeline"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        dest="output",
+        type=str,
+        default=None,
+        help="save the results as json"
+    )
+    parser.add_argument(
+        "-c", "--compare",
+        dest="compare",
+        type=str,
+        default=None,
+        help="baseline results json to compare against, exit with 1 on regression"
+    )
+    parser.add_argument(
+        "-t", "--threshold",
+        dest="threshold",
+        type=float,
+        default=0.15,
+        help="allowed slowdown against the baseline. \n\
+            Default: 0.15"
+    )
+
+    return benchmark(parser.parse_args(argv))
+
+if __name__ == "__main__":
+    sys.exit(main())
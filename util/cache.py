@@ -0,0 +1,148 @@
+import numpy as np
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from . import __version__
+
+# 缓存格式或参与计算的代码改变时增加，旧的条目自然失效并被淘汰
+CACHE_VERSION = 1
+HASH_BLOCK = 16 * 2**20
+
+
+def fileHash(path: str) -> str:
+    """
+    文件内容的 sha256，按块读取。
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while block := file.read(HASH_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+def writeAtomic(path: str, text: str) -> bool:
+    """
+    先写临时文件再替换，读者不会看到写了一半的文件。失败时返回 False。
+    """
+    staging = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(staging, 'w') as file:
+            file.write(text)
+        os.replace(staging, path)
+    except OSError:
+        return False
+    return True
+
+
+class StageCache:
+    """
+    按输入内容哈希和阶段参数寻址的磁盘缓存，保存 getParams 的输出和排序的排列。
+
+    每个条目是 directory 下的一个子目录，数组以 .npy 保存，读取时内存映射；
+    条目先写入临时目录再重命名，多个进程可以共用同一个缓存。
+    每次命中时更新条目的修改时间，写入新条目后按修改时间淘汰最久未用的条目，
+    直到总大小不超过 maxBytes。
+
+    Attributes:
+        directory: 缓存目录，不存在时创建。
+        maxBytes: 缓存总大小上限。
+    """
+    def __init__(self, directory: str, maxBytes: int):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(os.path.join(directory, "hashes"), exist_ok=True)
+        # 上限可能比上次运行时小
+        self.evict()
+
+    def contentHash(self, path: str) -> str:
+        """
+        文件内容的 sha256。按 (路径, 大小, 修改时间) 记住结果，文件未改变时不再重新读取。
+        """
+        stat = os.stat(path)
+        identity = f"{os.path.abspath(path)}\n{stat.st_size}\n{stat.st_mtime_ns}"
+        memo = os.path.join(self.directory, "hashes", hashlib.sha256(identity.encode('utf-8')).hexdigest())
+        try:
+            with open(memo, 'r') as file:
+                return file.read().strip()
+        except OSError:
+            pass
+
+        content = fileHash(path)
+        writeAtomic(memo, content)
+        return content
+
+    @staticmethod
+    def key(stage: str, *parts) -> str:
+        """
+        阶段名和参数的 sha256，参数中包含输入内容哈希。
+        """
+        text = json.dumps([CACHE_VERSION, __version__, stage, *[str(part) for part in parts]])
+        return f"{stage}-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]}"
+
+    def get(self, key: str):
+        """
+        返回内存映射的数组 tuple（保存时为 None 的项仍为 None），未命中时返回 None。
+        """
+        entry = os.path.join(self.directory, key)
+        try:
+            with open(os.path.join(entry, "entry.json"), 'r') as file:
+                present = json.load(file)["arrays"]
+            arrays = tuple(np.load(os.path.join(entry, f"{i}.npy"), mmap_mode='r') if has else None
+                           for i, has in enumerate(present))
+            os.utime(entry)
+        except (OSError, ValueError, KeyError):
+            # 不完整的条目（例如淘汰时部分文件无法删除）直接删除
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            return None
+        return arrays
+
+    def put(self, key: str, arrays):
+        """
+        保存数组 tuple（可以包含 None）。超过 maxBytes 的条目不保存。
+        """
+        size = sum(array.nbytes for array in arrays if array is not None)
+        if size > self.maxBytes or os.path.isdir(os.path.join(self.directory, key)):
+            return
+        staging = tempfile.mkdtemp(prefix=f".{key}-", dir=self.directory)
+        try:
+            for i, array in enumerate(arrays):
+                if array is not None:
+                    np.save(os.path.join(staging, f"{i}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(staging, "entry.json"), 'w') as file:
+                json.dump({"arrays": [array is not None for array in arrays], "bytes": size}, file)
+            os.rename(staging, os.path.join(self.directory, key))
+        except OSError:
+            # 另一个进程已经写入了同一个条目，或磁盘已满
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self.evict()
+
+    def entries(self) -> list:
+        """
+        [(修改时间, 大小, 路径)]，按修改时间从旧到新排列。
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            if name.startswith('.') or name == "hashes" or not os.path.isdir(entry):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry, file)) for file in os.listdir(entry))
+                entries.append((os.path.getmtime(entry), size, entry))
+            except OSError:
+                continue
+        entries.sort()
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.maxBytes:
+                break
+            # 已被映射的文件在 windows 上无法删除，留到下次
+            shutil.rmtree(entry, ignore_errors=True)
+            if not os.path.exists(entry):
+                total -= size
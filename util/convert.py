@@ -1,10 +1,260 @@
-from scene import Scene
+from .scene import Scene
+from .outofcore import convertOutOfCore
+from .cache import StageCache
+from .manifest import BuildManifest
+from . import profiling
+from . import accel
+from . import tiling
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
 import argparse
+import io
 import os
+import queue
+import sys
+import threading
+import time
+from typing import NamedTuple, Optional
+
+class Pruning(NamedTuple):
+    """
+    Scene.prune 的参数。floaters 为 (邻居数, 标准差倍数)，None 表示不删除离群点。
+    """
+    minOpacity: Optional[float] = None
+    maxSplats: Optional[int] = None
+    dropDegenerate: bool = False
+    floaters: Optional[tuple] = None
+
+class OutputOptions(NamedTuple):
+    """
+    影响输出内容的选项。转换时只从这里读取这些选项，增量转换的清单也由它生成（见 outputOptions），
+    两者不会不一致。线程数、缓存等不改变输出的选项不在其中。
+
+    Attributes:
+        name: 场景名。
+        reorder: 排序使用的曲线，'Morton' 或 'Hilbert'。
+        saveJson: 同时保存 gltf 的 json。
+        pruning: 删除点的参数，None 表示不删除。
+        shCodebook: 球谐系数码本的大小，None 表示不导出球谐系数。
+        lod: (层级数, 每次合并的点数)，None 表示不生成 LOD。
+        waves: 按重要性把 chunk 分成的组数，None 表示按曲线顺序写入。
+        tiles: 每块最多的点数，None 表示不切块，见 Scene.writeTiles。
+    """
+    name: str
+    reorder: str
+    saveJson: bool = False
+    pruning: Optional[Pruning] = None
+    shCodebook: Optional[int] = None
+    lod: Optional[tuple] = None
+    waves: Optional[int] = None
+    tiles: Optional[int] = None
+
+class ConvertTask(NamedTuple):
+    """
+    一个文件的转换任务，可以传给进程池中的 worker。
+
+    Attributes:
+        file_path: 输入的 ply 文件。
+        out_path: 输出的 glb 文件。
+        options: 影响输出内容的选项。
+        visualize: 排序后显示点云。
+        quiet: 不写输出文件。
+        memoryBudget: out-of-core 转换的内存预算（MB），None 表示在内存中转换。
+        analyze: chunk 紧凑度分析的抽样数，0 表示全部，None 表示不分析。
+        profile: 记录各阶段的耗时和内存。
+        workers: 编码和排序使用的线程数。
+        cache: (缓存目录, 大小上限字节数)，None 表示不使用缓存。
+    """
+    file_path: str
+    out_path: str
+    options: OutputOptions
+    visualize: bool = False
+    quiet: bool = False
+    memoryBudget: Optional[int] = None
+    analyze: Optional[int] = None
+    profile: bool = False
+    workers: Optional[int] = None
+    cache: Optional[tuple] = None
+
+def convertFile(task: ConvertTask):
+    """
+    Returns:
+        (高斯点数量, profile 报告)，未开启 profile 时报告为 None。
+    """
+    options = task.options
+    accel.setWorkers(task.workers)
+    profiler = profiling.Profiler(enabled=task.profile)
+    profiler.start()
+    try:
+        if task.memoryBudget is not None:
+            pointCount = convertOutOfCore(task.file_path, task.out_path, options.name, options.reorder,
+                                          task.memoryBudget * 2**20, profiler)
+        else:
+            scene = Scene(task.file_path, options.name, profiler,
+                          None if task.cache is None else StageCache(*task.cache), options.shCodebook)
+            if scene.params is None:
+                raise ValueError("could not load ply file")
+            if options.pruning is not None:
+                scene.prune(*options.pruning, workers=task.workers)
+            scene.reorder(options.reorder, task.analyze, task.workers)
+            if task.visualize:
+                scene.visualize()
+            if not task.quiet:
+                scene.toGLB(task.out_path, options.saveJson, task.workers, options.lod, options.waves, options.tiles)
+            pointCount = scene.layout.vertexCount
+    finally:
+        profiler.stop()
+
+    if not task.profile:
+        return pointCount, None
+    profiler.info = {"file": task.file_path, "output": None if task.quiet else task.out_path, "name": options.name,
+                     "reorder": options.reorder, "splats": pointCount}
+    report = profiler.report()
+    if not task.quiet:
+        profiling.writeReport(task.out_path + ".profile.json", report)
+    return pointCount, report
+
+def outputFiles(task: ConvertTask) -> list:
+    out_path, saveJson = task.out_path, task.options.saveJson
+    if task.options.tiles is not None:
+        # 块数由数据决定，取自上次写入的块清单
+        glbs = tiling.tileFiles(out_path)
+        return [tiling.manifestPath(out_path)] + [path for glb in glbs for path in ([glb, glb + ".json"] if saveJson else [glb])]
+    return [out_path, out_path + ".json"] if saveJson else [out_path]
+
+def outputOptions(task: ConvertTask) -> dict:
+    """
+    记录在增量转换清单中的选项，由 task.options 的全部字段生成，与转换时使用的选项相同。
+    """
+    def toJson(value):
+        # 清单中的选项要与读回的 json 比较，具名元组写成字典，元组写成列表
+        if hasattr(value, '_asdict'):
+            return {key: toJson(item) for key, item in value._asdict().items()}
+        if isinstance(value, tuple):
+            return [toJson(item) for item in value]
+        return value
+    return toJson(task.options)
+
+def convertFileInWorker(task):
+    """
+    进程池中执行的转换，输出先缓存下来，由主进程按文件顺序打印。
+    """
+    log = io.StringIO()
+    start_time = time.time()
+    try:
+        with contextlib.redirect_stdout(log):
+            result = convertFile(task)
+        return True, log.getvalue(), result, time.time() - start_time
+    except Exception as e:
+        return False, log.getvalue(), f"{type(e).__name__}: {e}", time.time() - start_time
+
+class ThreadLog(io.TextIOBase):
+    """
+    按线程分流的 stdout：流水线中的线程把输出写入当前文件的缓冲区，其他输出照常打印。
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    @contextlib.contextmanager
+    def capture(self, buffer):
+        self.local.buffer = buffer
+        try:
+            yield
+        finally:
+            self.local.buffer = None
+
+def convertPipelined(tasks, depth, done):
+    """
+    三个线程流水线转换一批文件：读取线程解析文件 N+1，计算线程排序、量化文件 N，
+    调用者所在的线程写入文件 N-1，磁盘和 CPU 同时工作。
+    每两个阶段之间的队列最多容纳 depth 个文件，同时驻留内存的文件不超过 2 * depth + 3 个。
+
+    Args:
+        tasks: ConvertTask 列表，不支持 visualize、memoryBudget、profile 和 options.tiles。
+        depth: 队列长度，至少为 1。
+        done: done(task, ok, result, seconds, log)，在调用者线程中按文件顺序调用，
+              result 与 convertFile 的返回值相同，失败时为错误信息。
+    """
+    parsed = queue.Queue(maxsize=depth)
+    computed = queue.Queue(maxsize=depth)
+    log = ThreadLog(sys.stdout)
+
+    @contextlib.contextmanager
+    def stage(item):
+        # 失败的文件跳过之后的阶段，错误随文件传给写入线程
+        start_time = time.time()
+        with log.capture(item["log"]):
+            try:
+                yield
+            except Exception as e:
+                item["error"] = f"{type(e).__name__}: {e}"
+        item["seconds"] += time.time() - start_time
+
+    def read():
+        for task in tasks:
+            item = {"task": task, "log": io.StringIO(), "seconds": 0.0, "error": None}
+            with stage(item):
+                scene = Scene(task.file_path, task.options.name, cache=None if task.cache is None else StageCache(*task.cache),
+                              shCodebook=task.options.shCodebook)
+                if scene.params is None:
+                    raise ValueError("could not load ply file")
+                item["scene"] = scene
+            parsed.put(item)
+        parsed.put(None)
+
+    def compute():
+        while (item := parsed.get()) is not None:
+            if item["error"] is None:
+                task, options = item["task"], item["task"].options
+                with stage(item):
+                    scene = item["scene"]
+                    accel.setWorkers(task.workers)
+                    if options.pruning is not None:
+                        scene.prune(*options.pruning, workers=task.workers)
+                    scene.reorder(options.reorder, task.analyze, task.workers)
+                    if not task.quiet:
+                        item["glb"] = scene.prepareGLB(task.workers, options.lod, options.waves)
+                    # 写入只需要纹理
+                    scene.params = None
+            computed.put(item)
+        computed.put(None)
+
+    with contextlib.redirect_stdout(log):
+        threads = [threading.Thread(target=read, daemon=True), threading.Thread(target=compute, daemon=True)]
+        for thread in threads:
+            thread.start()
+        while (item := computed.get()) is not None:
+            task = item["task"]
+            if item["error"] is None and not task.quiet:
+                with stage(item):
+                    item["scene"].writeGLB(task.out_path, task.options.saveJson, *item.pop("glb"))
+            ok = item["error"] is None
+            result = (item["scene"].layout.vertexCount, None) if ok else item["error"]
+            item.pop("scene", None)
+            done(task, ok, result, item["seconds"], item["log"].getvalue())
+        for thread in threads:
+            thread.join()
 
 def convert(args):
     level, inputPath, outputPath, name = args.level, args.input, args.output, args.name
     quiet, visualize, reorder, saveJson = args.quiet, args.visualize, args.reorder, args.json
+    jobs, memoryBudget, analyze = args.jobs, args.memory_budget, args.analyze
+    profile, threads, depth = args.profile, args.threads, args.pipeline_depth
+    cacheDir, cacheSize, force = args.cache, args.cache_size, args.force
+    minOpacity, maxSplats, dropDegenerate = args.min_opacity, args.max_splats, args.drop_degenerate
+    floaterRatio, floaterNeighbors = args.remove_floaters, args.floater_neighbors
+    shCodebook = args.sh_codebook
+    lodLevels, lodGroup = args.lod, args.lod_group
+    waves = args.waves
+    tiles = args.tiles
 
     has_name = True
     if name == "":
@@ -15,8 +265,75 @@ def convert(args):
     if not os.path.exists(inputPath):
         print(f"Error: input file/directory does not exist")
         exit(1)
+    if jobs < 1:
+        print(f"Error: jobs must be at least 1")
+        exit(1)
+    if visualize and jobs > 1:
+        print(f"Error: --visualize can not be used with --jobs > 1")
+        exit(1)
+    if memoryBudget is not None and (visualize or quiet or saveJson):
+        print(f"Error: --memory-budget can not be used with --visualize, --quiet or --json")
+        exit(1)
+    if cacheDir is not None and memoryBudget is not None:
+        print(f"Error: --cache can not be used with --memory-budget")
+        exit(1)
+    if cacheSize < 0:
+        print(f"Error: cache size must not be negative")
+        exit(1)
+    if maxSplats is not None and maxSplats < 1:
+        print(f"Error: max splats must be at least 1")
+        exit(1)
+    if floaterNeighbors < 1:
+        print(f"Error: floater neighbors must be at least 1")
+        exit(1)
+    floaters = None if floaterRatio is None else (floaterNeighbors, floaterRatio)
+    if (minOpacity is not None or maxSplats is not None or dropDegenerate or floaters is not None) \
+            and memoryBudget is not None:
+        print(f"Error: --min-opacity, --max-splats, --drop-degenerate and --remove-floaters can not be used with --memory-budget")
+        exit(1)
+    if shCodebook is not None and (shCodebook < 2 or shCodebook > 65536 or shCodebook & (shCodebook - 1) != 0):
+        print(f"Error: SH codebook size must be a power of two between 2 and 65536")
+        exit(1)
+    if shCodebook is not None and memoryBudget is not None:
+        print(f"Error: --sh-codebook can not be used with --memory-budget")
+        exit(1)
+    if lodLevels is not None and lodLevels < 1:
+        print(f"Error: LOD levels must be at least 1")
+        exit(1)
+    if lodGroup < 2 or lodGroup > 256 or lodGroup & (lodGroup - 1) != 0:
+        print(f"Error: LOD group must be a power of two between 2 and 256")
+        exit(1)
+    if lodLevels is not None and memoryBudget is not None:
+        print(f"Error: --lod can not be used with --memory-budget")
+        exit(1)
+    lod = None if lodLevels is None else (lodLevels, lodGroup)
+    if waves is not None and waves < 1:
+        print(f"Error: waves must be at least 1")
+        exit(1)
+    if waves is not None and (lod is not None or memoryBudget is not None):
+        print(f"Error: --waves can not be used with --lod or --memory-budget")
+        exit(1)
+    if tiles is not None and tiles < 1:
+        print(f"Error: tile size must be at least 1")
+        exit(1)
+    if tiles is not None and memoryBudget is not None:
+        print(f"Error: --tiles can not be used with --memory-budget")
+        exit(1)
+    if depth < 0:
+        print(f"Error: pipeline depth must not be negative")
+        exit(1)
+    if threads is not None and threads < 1:
+        print(f"Error: threads must be at least 1")
+        exit(1)
+    if analyze is not None and analyze < 0:
+        print(f"Error: analyze sample count must not be negative")
+        exit(1)
+    if analyze is not None and memoryBudget is not None:
+        print(f"Error: --analyze can not be used with --memory-budget")
+        exit(1)
 
     first_level_files = []
+    manifest = None
     if os.path.isdir(inputPath):    # handle files in the directory
         first_level_files = []
         if outputPath is None:
@@ -29,13 +346,15 @@ def convert(args):
                 print(f"Error: output path should be directory")
                 exit(1)
         try:
-            for entry_name in os.listdir(inputPath):
+            for entry_name in sorted(os.listdir(inputPath)):
                 full_path = os.path.join(inputPath, entry_name)
                 full_out_path = os.path.join(outputPath, entry_name)
                 if os.path.isfile(full_path) and entry_name.lower().endswith('.ply'):
                     first_level_files.append((full_path, full_out_path.replace('.ply', '.glb')))
         except OSError as e:
             print(f"do not have access to {inputPath}: {e}")
+        if not quiet:
+            manifest = BuildManifest(outputPath)
     elif os.path.isfile(inputPath):
         if outputPath is None:
             base_name, _ = os.path.splitext(inputPath)
@@ -53,19 +372,118 @@ def convert(args):
         print("Invalid input path")
         exit(1)
 
+    # worker processes share the cores
+    workers = threads if threads is not None else max(1, (os.cpu_count() or 1) // jobs)
+
+    cache = None if cacheDir is None else (cacheDir, cacheSize * 2**20)
+    pruning = None
+    if minOpacity is not None or maxSplats is not None or dropDegenerate or floaters is not None:
+        pruning = Pruning(minOpacity, maxSplats, dropDegenerate, floaters)
+
+    tasks = []
     for file_path, out_path in first_level_files:
         if not has_name:
             name, _ = os.path.splitext(os.path.basename(file_path))
+        options = OutputOptions(name, reorder, saveJson=saveJson, pruning=pruning, shCodebook=shCodebook,
+                                lod=lod, waves=waves, tiles=tiles)
+        tasks.append(ConvertTask(file_path, out_path, options, visualize=visualize, quiet=quiet,
+                                 memoryBudget=memoryBudget, analyze=analyze, profile=profile is not None,
+                                 workers=workers, cache=cache))
+
+    # 清单中记录的输出仍然有效时跳过，只重新转换输入、版本或选项改变的文件
+    skipped = []
+    if manifest is not None and not force:
+        stale = []
+        for task in tasks:
+            if manifest.upToDate(task.file_path, outputFiles(task), outputOptions(task)):
+                skipped.append(task)
+            else:
+                stale.append(task)
+        tasks = stale
+        for task in skipped:
+            print(f"{task.options.name} is up to date, skipped")
+
+    start_time = time.time()
+    total_points = 0
+    total_bytes = 0
+    failed = []
+    reports = []
+
+    def announce(task):
         print(f"\n\n============================================")
-        print(f"converting {name} from {file_path} to {out_path}")
-        scene = Scene(file_path, name)
-        scene.reorder(reorder)
-        if visualize:
-            scene.visualize()
-        if not quiet:
-            scene.toGLB(out_path, saveJson)
+        print(f"converting {task.options.name} from {task.file_path} to {task.out_path}")
 
-if __name__ == "__main__":
+    def report(task, ok, result, seconds):
+        nonlocal total_points, total_bytes
+        file_path, name = task.file_path, task.options.name
+        if ok:
+            pointCount, profileReport = result
+            total_points += pointCount
+            if profileReport is not None:
+                reports.append(profileReport)
+            total_bytes += os.path.getsize(file_path)
+            print(f"{name} done, using: {seconds:.2f}s")
+            if manifest is not None:
+                manifest.record(file_path, outputFiles(task), outputOptions(task))
+        else:
+            if manifest is not None:
+                manifest.forget(file_path)
+            failed.append(file_path)
+            print(f"Error: failed to convert {file_path}: {result}")
+
+    # 单进程转换多个文件时，读取、计算和写入在不同线程中重叠进行；
+    # 可视化需要主线程，out-of-core 自己流式读写，profile 需要各阶段单独计时，切块时每块分别写入，这些情况逐个转换
+    pipelined = jobs == 1 and depth > 0 and len(tasks) > 1 and not visualize \
+        and memoryBudget is None and profile is None and tiles is None
+
+    if pipelined:
+        def done(task, ok, result, seconds, log):
+            announce(task)
+            print(log, end='')
+            report(task, ok, result, seconds)
+
+        convertPipelined(tasks, depth, done)
+    elif jobs == 1:
+        for task in tasks:
+            announce(task)
+            task_start = time.time()
+            try:
+                report(task, True, convertFile(task), time.time() - task_start)
+            except Exception as e:
+                report(task, False, f"{type(e).__name__}: {e}", time.time() - task_start)
+    else:
+        # keep at most `jobs` files in flight so memory stays bounded by the
+        # largest files, results are reported in input order
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            pending = []
+            next_task = 0
+            for task in tasks:
+                while next_task < len(tasks) and len(pending) < jobs:
+                    pending.append(executor.submit(convertFileInWorker, tasks[next_task]))
+                    next_task += 1
+                ok, log, result, seconds = pending.pop(0).result()
+                announce(task)
+                print(log, end='')
+                report(task, ok, result, seconds)
+
+    elapsed = max(time.time() - start_time, 1e-6)
+    print(f"\n============================================")
+    print(f"converted {len(tasks) - len(failed)}/{len(tasks)} files "
+          f"({total_points:,} splats, {total_bytes / 2**20:.1f} MB) in {elapsed:.2f}s "
+          f"with {jobs} job(s): {total_points / elapsed:,.0f} splats/s, {total_bytes / 2**20 / elapsed:.1f} MB/s")
+    if skipped:
+        print(f"skipped {len(skipped)} up-to-date file(s), use --force to convert them again")
+    if profile is not None:
+        summary = profiling.summarize(reports)
+        profiling.printSummary(summary)
+        if profile != "":
+            profiling.writeReport(profile, summary)
+    if failed:
+        for file_path in failed:
+            print(f"failed: {file_path}")
+        exit(1)
+
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="convert between gs file formats",
         formatter_class=argparse.RawTextHelpFormatter # 保持帮助信息中的换行格式
@@ -101,7 +519,7 @@ if __name__ == "__main__":
         type=str,
         default="Morton",
         help="reorder using 'Morton' or 'Hilbert' curve. \n\
-            'Morton' is quick while 'Hilbert' might take a while but brings better quality\n\
+            'Morton' is the quickest while 'Hilbert' brings better quality\n\
             Default: Morton"
     )
 
@@ -136,6 +554,210 @@ if __name__ == "__main__":
         help="save json file about the gltf"
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        '--sh-codebook',
+        dest="sh_codebook",
+        type=int,
+        nargs='?',
+        const=65536,
+        default=None,
+        help="export spherical harmonics (degree 1-3) of 3dgs scenes through a\n\
+            k-means codebook of this many entries (a power of two, at most 65536)\n\
+            and a 16-bit index per splat. \n\
+            Default: base color only, 65536 when given without a value"
+    )
+
+    parser.add_argument(
+        '--lod',
+        dest="lod",
+        type=int,
+        nargs='?',
+        const=3,
+        default=None,
+        help="also write this many coarser levels of detail (3dgs only), each\n\
+            merging --lod-group neighboring splats into one, coarsest level first. \n\
+            Default: full level only, 3 when given without a value"
+    )
 
-    convert(args)
\ No newline at end of file
+    parser.add_argument(
+        '--lod-group',
+        dest="lod_group",
+        type=int,
+        default=8,
+        help="number of splats merged into one for each coarser level,\n\
+            a power of two. \n\
+            Default: 8"
+    )
+
+    parser.add_argument(
+        '--waves',
+        dest="waves",
+        type=int,
+        nargs='?',
+        const=4,
+        default=None,
+        help="group the chunks into this many byte-contiguous waves ordered by\n\
+            opacity x projected area, each a complete texture set, so that the\n\
+            start of the file covers the whole scene with its most visible splats. \n\
+            Default: curve order, 4 when given without a value"
+    )
+
+    parser.add_argument(
+        '--tiles',
+        dest="tiles",
+        type=int,
+        nargs='?',
+        const=tiling.DEFAULT_TILE_SPLATS,
+        default=None,
+        help="split the scene into octree tiles of at most this many splats,\n\
+            written as <output>_tile<i>.glb with an <output>.tiles.json manifest\n\
+            of bounding boxes, splat counts and file sizes. \n\
+            Default: one file, 1048576 when given without a value"
+    )
+
+    parser.add_argument(
+        '--min-opacity',
+        dest="min_opacity",
+        type=float,
+        default=None,
+        help="remove splats whose opacity (after sigmoid) is below this value\n\
+            before sorting. \n\
+            Default: keep all"
+    )
+
+    parser.add_argument(
+        '--max-splats',
+        dest="max_splats",
+        type=int,
+        default=None,
+        help="keep at most this many splats, the ones with the largest\n\
+            opacity x projected area. \n\
+            Default: keep all"
+    )
+
+    parser.add_argument(
+        '--drop-degenerate',
+        dest="drop_degenerate",
+        action='store_true',
+        help="remove splats with NaN / inf values or a collapsed scale"
+    )
+
+    parser.add_argument(
+        '--remove-floaters',
+        dest="remove_floaters",
+        type=float,
+        nargs='?',
+        const=2.0,
+        default=None,
+        help="remove splats whose mean distance to their nearest neighbors is more\n\
+            than this many standard deviations above the mean (needs scipy). \n\
+            Default: keep floaters, 2.0 when given without a value"
+    )
+
+    parser.add_argument(
+        '--floater-neighbors',
+        dest="floater_neighbors",
+        type=int,
+        default=16,
+        help="number of nearest neighbors used by --remove-floaters. \n\
+            Default: 16"
+    )
+
+    parser.add_argument(
+        '--jobs',
+        dest="jobs",
+        type=int,
+        default=1,
+        help="number of files converted in parallel worker processes\n\
+            when input is a directory. \n\
+            Default: 1"
+    )
+
+    parser.add_argument(
+        '--pipeline-depth',
+        dest="pipeline_depth",
+        type=int,
+        default=2,
+        help="when converting a directory with one job, read the next file,\n\
+            convert the current one and write the previous one on separate threads,\n\
+            with at most this many files waiting between two stages. 0 disables it. \n\
+            Default: 2"
+    )
+
+    parser.add_argument(
+        '--threads',
+        dest="threads",
+        type=int,
+        default=None,
+        help="threads used to encode and sort the curve keys of each file. \n\
+            Default: number of cpus divided by jobs"
+    )
+
+    parser.add_argument(
+        '--cache',
+        dest="cache",
+        type=str,
+        default=None,
+        help="directory of a cache for parsed params and sort orders, keyed by\n\
+            the input content hash. Later runs on the same input skip parsing and\n\
+            sorting. Can be shared between runs and processes. \n\
+            Default: no cache"
+    )
+
+    parser.add_argument(
+        '--cache-size',
+        dest="cache_size",
+        type=int,
+        default=10240,
+        help="size limit of the cache (MB), least recently used entries are removed. \n\
+            Default: 10240"
+    )
+
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help="when converting a directory, convert every file again even if\n\
+            the manifest in the output directory shows its output is up to date"
+    )
+
+    parser.add_argument(
+        '--memory-budget',
+        dest="memory_budget",
+        type=int,
+        default=None,
+        help="convert out of core with about this much memory (MB) per file,\n\
+            for scenes larger than RAM. Partitions are written next to the output. \n\
+            Default: convert in memory"
+    )
+
+    parser.add_argument(
+        '--analyze',
+        dest="analyze",
+        type=int,
+        nargs='?',
+        const=0,
+        default=None,
+        help="print chunk compactness statistics after reorder. \n\
+            Optionally analyze only this many randomly sampled chunks. \n\
+            Default: skip analysis"
+    )
+
+    parser.add_argument(
+        '--profile',
+        dest="profile",
+        type=str,
+        nargs='?',
+        const="",
+        default=None,
+        help="record time, cpu time, bytes and peak memory of each stage. \n\
+            A report is saved next to each output as <output>.profile.json, \n\
+            the batch summary is printed and optionally saved to this path. \n\
+            Default: no profiling"
+    )
+
+    args = parser.parse_args(argv)
+
+    convert(args)
+
+if __name__ == "__main__":
+    main()
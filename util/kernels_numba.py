@@ -0,0 +1,106 @@
+import numpy as np
+import numba
+
+# 由 accel 在 numba 可用时导入，每个函数与对应的 numpy 实现逐位一致。
+# 整数运算全部使用 int64（编码不超过 63 位），避免 numba 把 uint64 与 int64 的混合运算提升为 float64。
+
+
+@numba.njit(parallel=True, cache=True)
+def morton_codes(points, min_coords, scale, out):
+    """
+    Kernel_3dgs.morton_codes：float32 归一化、量化到 21 位后按位交错。
+    """
+    max_int_val = np.float32((1 << 21) - 1)
+    for i in numba.prange(points.shape[0]):
+        code = 0
+        for axis in range(3):
+            x = np.int64(((points[i, axis] - min_coords[axis]) / scale) * max_int_val)
+            x = (x | (x << 32)) & 0x001f00000000ffff
+            x = (x | (x << 16)) & 0x001f0000ff0000ff
+            x = (x | (x << 8)) & 0x100f00f00f00f00f
+            x = (x | (x << 4)) & 0x10c30c30c30c30c3
+            x = (x | (x << 2)) & 0x1249249249249249
+            code |= x << axis
+        out[i] = code
+
+@numba.njit(parallel=True, cache=True)
+def hilbert_codes(points, min_coords, scale, bits, digit_table, next_table, out):
+    """
+    Kernel_3dgs.hilbert_codes：逐层查 utils.hilbert_tables(3) 的状态转移表。
+    """
+    max_int_val = np.float32((1 << bits) - 1)
+    for i in numba.prange(points.shape[0]):
+        x = np.int64(((points[i, 0] - min_coords[0]) / scale) * max_int_val)
+        y = np.int64(((points[i, 1] - min_coords[1]) / scale) * max_int_val)
+        z = np.int64(((points[i, 2] - min_coords[2]) / scale) * max_int_val)
+        state = 0
+        distance = 0
+        for level in range(bits - 1, -1, -1):
+            octant = (((x >> level) & 1) << 2) | (((y >> level) & 1) << 1) | ((z >> level) & 1)
+            index = state * 8 + octant
+            distance = (distance << 3) | np.int64(digit_table[index])
+            state = np.int64(next_table[index])
+        out[i] = distance
+
+@numba.njit(parallel=True, cache=True)
+def chunk_quantize(values, shared, levels, value_min, value_max, out):
+    """
+    quantization.quantize 中 'chunk' / 'shared' 模式的 min/max、归一化和取整，一次遍历完成。
+
+    min/max 按 quantization.chunkReduce 的顺序归约（前后两半逐元素比较），与 np.minimum /
+    np.maximum 相同，相等时取后一个（+0 与 -0），NaN 向后传播。
+    归约时 out 的前一半存放 min、后一半存放 max，不分配内存。
+
+    Args:
+        values: (count, size, channels) float32，size 为不小于 2 的 2 的幂。
+        shared: 为 True 时每个 chunk 的所有通道共用一组 min/max（按通道顺序归约）。
+        levels: (channels,) float32，每个通道的 2**bits - 1。
+        value_min, value_max: (count, channels) 输出，shared 时每行各通道相同。
+        out: (count, size, channels) float32 输出，取整后的量化值。
+    """
+    count, size, channels = values.shape
+    half = size // 2
+    for c in numba.prange(count):
+        block = out[c]
+        for k in range(half):
+            for j in range(channels):
+                a = values[c, k, j]
+                b = values[c, k + half, j]
+                block[k, j] = a if (a != a or a < b) else b
+                block[half + k, j] = a if (a != a or a > b) else b
+        n = half
+        while n > 1:
+            n //= 2
+            for k in range(n):
+                for j in range(channels):
+                    a = block[k, j]
+                    b = block[k + n, j]
+                    block[k, j] = a if (a != a or a < b) else b
+                    a = block[half + k, j]
+                    b = block[half + k + n, j]
+                    block[half + k, j] = a if (a != a or a > b) else b
+        for j in range(channels):
+            value_min[c, j] = block[0, j]
+            value_max[c, j] = block[half, j]
+
+        if shared:
+            lo = value_min[c, 0]
+            hi = value_max[c, 0]
+            for j in range(1, channels):
+                a = value_min[c, j]
+                if not (lo != lo or lo < a):
+                    lo = a
+                a = value_max[c, j]
+                if not (hi != hi or hi > a):
+                    hi = a
+            for j in range(channels):
+                value_min[c, j] = lo
+                value_max[c, j] = hi
+
+        for i in range(size):
+            for j in range(channels):
+                lo = value_min[c, j]
+                value_range = value_max[c, j] - lo
+                if value_range == 0:
+                    value_range = np.float32(1.0)
+                block[i, j] = np.rint((values[c, i, j] - lo) / value_range * levels[j])
@@ -0,0 +1,94 @@
+import json
+import os
+from . import __version__
+from .cache import fileHash, writeAtomic
+
+# 目录转换时保存在输出目录中，记录每个输出由哪个输入、哪个版本和哪些选项生成
+MANIFEST_NAME = "immerscape-manifest.json"
+MANIFEST_VERSION = 1
+
+
+def fileStat(path: str) -> dict:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class BuildManifest:
+    """
+    增量转换的清单。每个输入文件一项：
+    {"input": {"sha256", "size", "mtime_ns"}, "converter": 版本, "options": 影响输出的选项,
+     "outputs": {输出文件名: {"size", "mtime_ns"}}}
+
+    输入的大小和修改时间与记录相同时直接使用记录的哈希，不重新读取文件；
+    不同时重新计算哈希，内容未变（例如重新复制）的文件仍然视为最新。
+    输出被删除或被其他程序改写时重新转换。
+
+    Attributes:
+        path: 清单文件路径。
+        files: 输入文件名 -> 记录。
+    """
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self.files = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get("version") == MANIFEST_VERSION:
+                self.files = data["files"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            # 没有清单或清单损坏时全部重新转换
+            self.files = {}
+
+    @staticmethod
+    def entryName(inputPath: str) -> str:
+        return os.path.basename(inputPath)
+
+    def inputHash(self, inputPath: str) -> str:
+        """
+        输入文件的 sha256，大小和修改时间与记录相同时使用记录的值。
+        """
+        record = self.files.get(self.entryName(inputPath), {}).get("input", {})
+        stat = fileStat(inputPath)
+        if record.get("size") == stat["size"] and record.get("mtime_ns") == stat["mtime_ns"] and "sha256" in record:
+            return record["sha256"]
+        return fileHash(inputPath)
+
+    def upToDate(self, inputPath: str, outputs: list, options: dict) -> bool:
+        """
+        outputs 中的文件都存在且未被改动，并且由内容相同的输入、相同的版本和选项生成时返回 True。
+        """
+        record = self.files.get(self.entryName(inputPath))
+        if record is None or record.get("converter") != __version__ or record.get("options") != options:
+            return False
+        recorded = record.get("outputs", {})
+        if sorted(recorded) != sorted(os.path.basename(path) for path in outputs):
+            return False
+        try:
+            if any(fileStat(path) != recorded[os.path.basename(path)] for path in outputs):
+                return False
+            return self.inputHash(inputPath) == record["input"]["sha256"]
+        except (OSError, KeyError):
+            return False
+
+    def record(self, inputPath: str, outputs: list, options: dict):
+        """
+        记录一次成功的转换并立即保存，中断的批量转换不会丢失已完成的记录。
+        """
+        inputRecord = fileStat(inputPath)
+        inputRecord["sha256"] = self.inputHash(inputPath)
+        self.files[self.entryName(inputPath)] = {
+            "input": inputRecord,
+            "converter": __version__,
+            "options": options,
+            "outputs": {os.path.basename(path): fileStat(path) for path in outputs},
+        }
+        self.save()
+
+    def forget(self, inputPath: str):
+        if self.files.pop(self.entryName(inputPath), None) is not None:
+            self.save()
+
+    def save(self):
+        text = json.dumps({"version": MANIFEST_VERSION, "files": self.files}, indent=2, sort_keys=True)
+        if not writeAtomic(self.path, text):
+            print(f"Warning: could not write {self.path}")
@@ -0,0 +1,65 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from . import sorting
+from .threeD import Kernel_3dgs
+
+# 统计离群点（floater）检测：每个点到最近 k 个点的平均距离超过全体均值 + ratio 倍标准差时视为离群点。
+# KD 树来自可选的 scipy（pip install .[clean]），只在使用时导入。
+
+DEFAULT_NEIGHBORS = 16
+DEFAULT_STD_RATIO = 2.0
+# 每次查询的点数，限制 (rows, k + 1) 的距离和索引数组的内存
+BLOCK_ROWS = 1 << 16
+
+
+def neighborDistances(xyz: np.ndarray, neighbors: int = DEFAULT_NEIGHBORS, workers: int = None) -> np.ndarray:
+    """
+    每个点到最近 neighbors 个其他点的平均距离 (float64)。
+
+    按莫顿序把点分块，各线程查询不同的块（cKDTree 查询时释放 GIL），
+    空间上相邻的点连续查询，KD 树的节点留在缓存中。
+
+    Args:
+        xyz: (n, 3) 有限的坐标，n 大于 neighbors。
+        workers: 线程数，缺省为 CPU 数。
+    """
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        raise ImportError("floater removal needs scipy, install it with `pip install .[clean]`")
+
+    workers = sorting.default_workers() if workers is None else workers
+    n = xyz.shape[0]
+    min_coords, scale = Kernel_3dgs.bounds(xyz)
+    order = sorting.parallel_argsort(
+        sorting.encode_keys(Kernel_3dgs.morton_codes, xyz, min_coords, scale, workers), 63, workers)
+    points = np.ascontiguousarray(xyz[order], dtype=np.float64)
+    tree = cKDTree(points, balanced_tree=False, compact_nodes=False)
+
+    distances = np.empty(n, dtype=np.float64)
+
+    def queryBlock(start, end):
+        # 第一个近邻是点自身
+        d, _ = tree.query(points[start:end], k=neighbors + 1, workers=1)
+        distances[order[start:end]] = d[:, 1:].mean(axis=1)
+
+    blocks = [(start, min(start + BLOCK_ROWS, n)) for start in range(0, n, BLOCK_ROWS)]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        sorting.run_blocks(executor, queryBlock, blocks)
+    return distances
+
+def floaterMask(xyz: np.ndarray, neighbors: int = DEFAULT_NEIGHBORS, stdRatio: float = DEFAULT_STD_RATIO,
+                workers: int = None) -> np.ndarray:
+    """
+    离群点为 True 的 bool 数组。坐标含有 NaN / inf 的点也视为离群点。
+    点数不超过 neighbors 时不做判断。
+    """
+    finite = np.isfinite(xyz).all(axis=1)
+    mask = ~finite
+    if int(finite.sum()) <= neighbors:
+        return mask
+
+    distances = neighborDistances(xyz[finite] if not finite.all() else xyz, neighbors, workers)
+    threshold = distances.mean() + stdRatio * distances.std()
+    mask[finite] = distances > threshold
+    return mask
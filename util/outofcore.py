@@ -0,0 +1,258 @@
+import numpy as np
+from . import utils
+from . import ply
+from . import profiling
+import os
+import tempfile
+import time
+from .threeD import Kernel_3dgs
+from .scene import Scene
+
+# 莫顿码 / 希尔伯特距离的前缀位数，用于划分磁盘分区
+PREFIX_BITS = 20
+# 排序、gather 和量化时每个点同时存在的副本数的估计
+WORKING_COPIES = 4
+
+def curveKeys(points: np.ndarray, type: str, min_coords: np.ndarray, scale: np.ndarray):
+    """
+    使用全局归一化参数计算曲线编码，返回 (keys, 有效位数)。
+    """
+    if type == 'Morton':
+        return Kernel_3dgs.morton_codes(points, min_coords, scale), 63
+    elif type == 'Hilbert':
+        return Kernel_3dgs.hilbert_codes(points, 16, min_coords, scale), 48
+    raise ValueError(f"unknown reorder type: {type}")
+
+def convertOutOfCore(inputPath: str, outputPath: str, name: str, type: str, memoryBudget: int,
+                     profiler: profiling.Profiler = None):
+    """
+    两遍流式转换，用于超出内存的场景，峰值内存受 memoryBudget（字节）约束。
+
+    第一遍按曲线编码的前缀把高斯点分桶写入磁盘分区；
+    第二遍依次排序每个分区，按 chunk 量化后直接写入内存映射的 glb 文件。
+    输出与 Scene.reorder + Scene.toGLB 相同（编码相同的点之间的顺序除外）。
+
+    Returns:
+        文件中的高斯点数量。
+    """
+    profiler = profiler if profiler is not None else profiling.Profiler(enabled=False)
+    header = ply.readHeader(inputPath)
+    Kernel, layout = Scene.identify(header)
+    print(f"gaussian type: {Kernel.__name__}")
+
+    n = layout.vertexCount
+    chunk_size = ply.CHUNK_SIZE
+    num_chunks = layout.pointCount // chunk_size
+
+    # 每行记录为所有参数拼接成的 float32，另存 uint64 编码
+    def readBlock(start, end):
+        # 按块读入而不是映射整个文件，避免映射页计入常驻内存
+        return ply.readVertices(inputPath, header, start, end - start)
+
+    template = Kernel.getParams(readBlock(0, 1), layout, rows=1)
+    widths = [0 if p is None else p.shape[1] for p in template]
+    rowWidth = sum(widths)
+    budgetRows = max(chunk_size * 16, memoryBudget // ((4 * rowWidth + 8) * WORKING_COPIES))
+    budgetRows -= budgetRows % chunk_size
+
+    def packRows(params):
+        return np.concatenate([p for p in params if p is not None], axis=1)
+
+    def unpackRows(rows):
+        params = []
+        start = 0
+        for p, width in zip(template, widths):
+            params.append(None if p is None else rows[:, start:start + width])
+            start += width
+        return tuple(params)
+
+    def blockRows(start, end):
+        # 最后一块附带补齐到 chunk 大小的点
+        rows = end - start + (layout.pointCount - n if end == n else 0)
+        return Kernel.getParams(readBlock(start, end), layout, rows=rows)
+
+    dataBytes = n * header.dtype.itemsize
+    partitionBytes = layout.pointCount * (4 * rowWidth + 8)
+    start_time = time.time()
+
+    # --- 第 0 遍: 全局包围盒和编码前缀直方图，只读 xyz ---
+    with profiler.stage('bounds', 2 * dataBytes):
+        min_coords = np.full(3, np.inf, dtype=np.float32)
+        max_coords = np.full(3, -np.inf, dtype=np.float32)
+        for start in range(0, n, budgetRows):
+            xyz, = ply.readGroups(readBlock(start, start + budgetRows), [['x', 'y', 'z']])
+            min_coords = np.minimum(min_coords, xyz.min(axis=0))
+            max_coords = np.maximum(max_coords, xyz.max(axis=0))
+        scale = (max_coords - min_coords).max()
+
+        histogram = np.zeros(1 << PREFIX_BITS, dtype=np.int64)
+        for start in range(0, n, budgetRows):
+            xyz, = ply.readGroups(readBlock(start, start + budgetRows), [['x', 'y', 'z']])
+            keys, keyBits = curveKeys(xyz, type, min_coords, scale)
+            histogram += np.bincount((keys >> np.uint64(keyBits - PREFIX_BITS)).astype(np.int64), minlength=len(histogram))
+        # 补齐的点复制最后一个点，编码相同
+        lastKey, keyBits = curveKeys(blockRows(n - 1, n)[0][:1], type, min_coords, scale)
+        histogram[int(lastKey[0] >> np.uint64(keyBits - PREFIX_BITS))] += layout.pointCount - n
+
+        # 贪心地合并相邻前缀，使每个分区不超过 budgetRows（每个分区至少一个前缀），
+        # 在前缀和上二分查找每个分区的终点，循环次数等于分区数
+        prefixes = np.flatnonzero(histogram)
+        cumulative = np.cumsum(histogram[prefixes])
+        boundaries = [0]
+        first, base = 0, 0
+        while True:
+            first = max(first + 1, int(np.searchsorted(cumulative, base + budgetRows, side='right')))
+            if first >= len(prefixes):
+                break
+            boundaries.append(prefixes[first])
+            base = cumulative[first - 1]
+        boundaries = np.array(boundaries, dtype=np.uint64)
+        if histogram.max() > budgetRows:
+            print(f"Warning: {histogram.max():,} splats share one key prefix, memory budget may be exceeded")
+        print(f"bounds and key histogram done, {len(boundaries)} partitions, using: {time.time() - start_time:.2f}s")
+
+    tempDir = tempfile.TemporaryDirectory(prefix="gs_ooc_", dir=os.path.dirname(os.path.abspath(outputPath)))
+    try:
+        # --- 第 1 遍: 分桶写入磁盘分区 ---
+        with profiler.stage('partition', dataBytes) as record:
+            start_time = time.time()
+            rowFiles = [open(os.path.join(tempDir.name, f"{i}.rows"), 'wb') for i in range(len(boundaries))]
+            keyFiles = [open(os.path.join(tempDir.name, f"{i}.keys"), 'wb') for i in range(len(boundaries))]
+            try:
+                for start in range(0, n, budgetRows):
+                    end = min(start + budgetRows, n)
+                    params = blockRows(start, end)
+                    keys, keyBits = curveKeys(params[0], type, min_coords, scale)
+                    partition = np.searchsorted(boundaries, keys >> np.uint64(keyBits - PREFIX_BITS), side='right') - 1
+                    order = np.argsort(partition, kind='stable')
+                    rows = packRows(params)[order]
+                    keys = keys[order]
+                    splits = np.searchsorted(partition[order], np.arange(1, len(boundaries)))
+                    for i, (rowPart, keyPart) in enumerate(zip(np.split(rows, splits), np.split(keys, splits))):
+                        rowPart.tofile(rowFiles[i])
+                        keyPart.tofile(keyFiles[i])
+            finally:
+                for file in rowFiles + keyFiles:
+                    file.close()
+            print(f"partition done, using: {time.time() - start_time:.2f}s")
+            record['bytesOut'] = partitionBytes
+
+        # --- 第 2 遍: 逐分区排序、量化并写入 glb ---
+        with profiler.stage('sort-write', partitionBytes) as record:
+            start_time = time.time()
+            sampleQuantized, texture_formats = Kernel.quantize(tuple(
+                None if p is None else np.zeros((chunk_size, p.shape[1]), dtype=np.float32) for p in template), layout)
+            # 与 utils.layoutPages 相同：超过一页时每页一套纹理，纹理名加后缀 `_page{p}`
+            pageRanges = utils.pageRanges(num_chunks)
+            paged = len(pageRanges) > 1
+            pageShapes = [utils.compute_tex_size(count, True) for _, count in pageRanges]
+
+            descriptors = [{} for _ in pageRanges]
+            offset = 0
+            for page, (chunkWidth, chunkHeight) in enumerate(pageShapes):
+                for key, quantized_param in sampleQuantized.items():
+                    texels, channels = quantized_param.shape[1], quantized_param.shape[2]
+                    if texels == chunk_size:
+                        height, width = chunkHeight * 16, chunkWidth * 16
+                    else:
+                        # special for u_range: RGBA32UI texels of each chunk are stored side by side
+                        height, width = chunkHeight, chunkWidth * texels * channels // 4
+                    size = chunkHeight * chunkWidth * texels * channels * quantized_param.itemsize
+                    descriptors[page]["u_" + key] = {
+                        "offset": offset,
+                        "size": size,
+                        "width": width,
+                        "height": height,
+                        "format": texture_formats[key],
+                        "bind": page * len(sampleQuantized) + len(descriptors[page]),
+                    }
+                    offset += size
+            texDataLength = offset
+
+            extras = None
+            if paged:
+                extras = {"pages": [{"page": page, "firstChunk": first, "chunks": count,
+                                     "textures": {key: f"{key}_page{page}" for key in descriptors[page]}}
+                                    for page, (first, count) in enumerate(pageRanges)]}
+                allDescriptors = {f"{key}_page{page}": descriptor
+                                  for page in range(len(pageRanges)) for key, descriptor in descriptors[page].items()}
+            else:
+                allDescriptors = descriptors[0]
+            gltf = utils.buildGLTF(allDescriptors, texDataLength, Kernel.gsType, name, layout.pointCount, extras)
+            binLength = texDataLength + len(utils.PLACEHOLDER_POS)
+            with open(outputPath, 'wb') as output:
+                binOffset = utils.writeGLBHeader(output, gltf, binLength)
+                # 未写入的区域（补齐的纹素和占位符顶点）均为 0
+                output.truncate(binOffset + binLength)
+
+                # 每个纹理只在内存中保留当前一行 chunk（16 行纹素），写满后追加到文件；每页的宽度不同
+                bands = {}
+                band_destinations = None
+                page = 0
+                chunkWidth = 0
+
+                def startPage(page):
+                    nonlocal bands, band_destinations, chunkWidth
+                    chunkWidth = pageShapes[page][0]
+                    bands = {}
+                    for key, quantized_param in sampleQuantized.items():
+                        if quantized_param.shape[1] == chunk_size:
+                            bands[key] = np.zeros([16 * chunkWidth * 16, quantized_param.shape[2]], dtype=quantized_param.dtype)
+                        else:
+                            bands[key] = np.zeros([chunkWidth, quantized_param.shape[1] * quantized_param.shape[2]], dtype=quantized_param.dtype)
+                    # 一行 chunk 相当于 chunkWidth × 1 个 chunk 的纹理
+                    band_destinations = utils.tile_destinations(chunkWidth, 1)
+
+                def writeBands(chunkRow):
+                    for key, band in bands.items():
+                        output.seek(binOffset + descriptors[page]["u_" + key]['offset'] + chunkRow * band.nbytes)
+                        band.tofile(output)
+                        band.fill(0)
+
+                startPage(page)
+                carryRows = np.zeros((0, rowWidth), dtype=np.float32)
+                chunk = 0
+                for i in range(len(boundaries)):
+                    rows = np.fromfile(os.path.join(tempDir.name, f"{i}.rows"), dtype=np.float32).reshape([-1, rowWidth])
+                    keys = np.fromfile(os.path.join(tempDir.name, f"{i}.keys"), dtype=np.uint64)
+                    os.remove(os.path.join(tempDir.name, f"{i}.rows"))
+                    os.remove(os.path.join(tempDir.name, f"{i}.keys"))
+
+                    rows = np.concatenate([carryRows, rows[np.argsort(keys)]], axis=0)
+                    full = rows.shape[0] - rows.shape[0] % chunk_size
+                    carryRows = rows[full:]
+                    if full == 0:
+                        continue
+
+                    quantized_params, _ = Kernel.quantize(unpackRows(rows[:full]), layout)
+
+                    # 按 chunk 行填充 band，一行或一页写满时写入文件
+                    done = 0
+                    count = full // chunk_size
+                    while done < count:
+                        first, pageChunks = pageRanges[page]
+                        local = chunk + done - first
+                        column = local % chunkWidth
+                        step = min(count - done, chunkWidth - column, pageChunks - local)
+                        for key, band in bands.items():
+                            part = quantized_params[key][done:done + step]
+                            if part.shape[1] == chunk_size:
+                                destinations = band_destinations[column * chunk_size:(column + step) * chunk_size]
+                                utils.scatterRows(band, destinations, part.reshape([-1, part.shape[2]]))
+                            else:
+                                band[column:column + step] = part.reshape([step, -1])
+                        done += step
+                        local += step
+                        if local % chunkWidth == 0 or local == pageChunks:
+                            writeBands((local - 1) // chunkWidth)
+                            if local == pageChunks and page + 1 < len(pageRanges):
+                                page += 1
+                                startPage(page)
+                    chunk += count
+
+            print(f"sort and quantize done, using: {time.time() - start_time:.2f}s")
+            record['bytesOut'] = os.path.getsize(outputPath)
+    finally:
+        tempDir.cleanup()
+
+    return n
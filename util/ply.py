@@ -0,0 +1,184 @@
+import numpy as np
+import os
+
+# ply scalar type -> numpy type code
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1',
+    'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2',
+    'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4',
+    'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+
+PLY_FORMATS = {
+    'binary_little_endian': '<',
+    'binary_big_endian': '>',
+}
+
+HEADER_READ_SIZE = 1 << 16
+ROWS_PER_BLOCK = 1 << 16
+CHUNK_SIZE = 256
+
+
+class PlyHeader:
+    """
+    解析后的 ply 文件头，只描述 vertex element。
+
+    Attributes:
+        text: 原始文件头字符串（包含 end_header）。
+        byteOrder: '<' 或 '>'。
+        vertexCount: 顶点数量。
+        properties: [(name, numpy type code), ...]，按文件中的顺序。
+        dataOffset: vertex 数据在文件中的起始字节偏移。
+    """
+    def __init__(self, text: str, byteOrder: str, vertexCount: int, properties: list, dataOffset: int):
+        self.text = text
+        self.byteOrder = byteOrder
+        self.vertexCount = vertexCount
+        self.properties = properties
+        self.dataOffset = dataOffset
+
+    @property
+    def propertyNames(self) -> list:
+        return [name for name, _ in self.properties]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype([(name, self.byteOrder + code) for name, code in self.properties])
+
+
+class Layout:
+    """
+    单个文件的属性布局，由 Kernel.identify 生成，
+    与 params 一起经过 getParams / reorder / prepareForGLB。
+    每个文件各自持有一份，多个转换可以在同一进程中并发进行。
+
+    Attributes:
+        columns: {property name: 文件中的列序号}。
+        total: 属性总数。
+        vertexCount: 文件中的高斯点数量。
+        pointCount: 按 chunk 对齐后的高斯点数量。
+        hasSH: getParams 是否读取了 f_rest_*。
+    """
+    def __init__(self, properties: list, vertexCount: int):
+        self.columns = {name: i for i, name in enumerate(properties)}
+        self.total = len(properties)
+        self.vertexCount = vertexCount
+        self.pointCount = (vertexCount + CHUNK_SIZE - 1) // CHUNK_SIZE * CHUNK_SIZE
+        self.hasSH = False
+
+    def __getitem__(self, name: str) -> int:
+        return self.columns.get(name, -1)
+
+    def has(self, names) -> bool:
+        return all(name in self.columns for name in names)
+
+
+def readHeader(path: str) -> PlyHeader:
+    with open(path, 'rb') as file:
+        raw = b''
+        while True:
+            chunk = file.read(HEADER_READ_SIZE)
+            raw += chunk
+            marker = raw.find(b'end_header')
+            end = raw.find(b'\n', marker) if marker >= 0 else -1
+            if end >= 0:
+                break
+            if not chunk:
+                raise ValueError("文件中未找到 'end_header'。")
+
+    text = raw[:end + 1].decode('utf-8')
+    lines = [line.split() for line in text.splitlines()]
+    if not lines or lines[0] != ['ply']:
+        raise ValueError("not a ply file")
+
+    byteOrder = None
+    elements = []   # [name, count, [(prop, code)], has_list]
+    for line in lines[1:]:
+        if not line:
+            continue
+        if line[0] == 'format':
+            if line[1] not in PLY_FORMATS:
+                raise ValueError(f"unsupported ply format: {line[1]}")
+            byteOrder = PLY_FORMATS[line[1]]
+        elif line[0] == 'element':
+            elements.append([line[1], int(line[2]), [], False])
+        elif line[0] == 'property':
+            if not elements:
+                raise ValueError("ply property declared before any element")
+            if line[1] == 'list':
+                elements[-1][3] = True
+            elif line[1] in PLY_TYPES:
+                elements[-1][2].append((line[2], PLY_TYPES[line[1]]))
+            else:
+                raise ValueError(f"unknown ply property type: {line[1]}")
+
+    if byteOrder is None:
+        raise ValueError("ply format not declared")
+
+    # elements stored before 'vertex' shift the data offset
+    dataOffset = end + 1
+    for name, count, properties, has_list in elements:
+        if name == 'vertex':
+            if has_list:
+                raise ValueError("list property in vertex element is not supported")
+            return PlyHeader(text, byteOrder, count, properties, dataOffset)
+        if has_list:
+            raise ValueError(f"cannot skip element '{name}' with list property")
+        dataOffset += count * sum(np.dtype(code).itemsize for _, code in properties)
+
+    raise ValueError("ply file has no vertex element")
+
+
+def memmapVertices(path: str, header: PlyHeader) -> np.ndarray:
+    """
+    将 vertex 数据映射为结构化数组，不读入内存。
+    """
+    dtype = header.dtype
+    expected = header.dataOffset + header.vertexCount * dtype.itemsize
+    if os.path.getsize(path) < expected:
+        raise ValueError(f"ply file is truncated: expected at least {expected} bytes")
+    if header.vertexCount == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=header.dataOffset, shape=(header.vertexCount,))
+
+
+def readVertices(path: str, header: PlyHeader, start: int, count: int) -> np.ndarray:
+    """
+    把 [start, start + count) 的顶点读入内存，分块处理大文件时使用，读完即可释放。
+    """
+    dtype = header.dtype
+    count = max(0, min(count, header.vertexCount - start))
+    vertices = np.fromfile(path, dtype=dtype, count=count, offset=header.dataOffset + start * dtype.itemsize)
+    if vertices.shape[0] != count:
+        raise ValueError(f"ply file is truncated: expected {header.vertexCount} vertices")
+    return vertices
+
+
+def readGroups(vertices: np.ndarray, groups: list, rows: int = None) -> list:
+    """
+    按行块遍历一次 vertices，把每组属性读成独立的连续 float32 数组。
+
+    Args:
+        vertices: memmapVertices 返回的结构化数组。
+        groups: [[name, ...], ...]，每组对应一个输出数组的列。
+        rows: 输出数组的行数，大于顶点数时多出的行留给调用者填充。
+
+    Returns:
+        与 groups 一一对应的 (rows, len(group)) float32 数组列表。
+    """
+    n = vertices.shape[0]
+    rows = n if rows is None else rows
+    outputs = [np.empty((rows, len(group)), dtype=np.float32) for group in groups]
+
+    for start in range(0, n, ROWS_PER_BLOCK):
+        end = min(start + ROWS_PER_BLOCK, n)
+        block = vertices[start:end]
+        for out, group in zip(outputs, groups):
+            for i, name in enumerate(group):
+                out[start:end, i] = block[name]
+
+    return outputs
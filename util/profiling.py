@@ -0,0 +1,144 @@
+import numpy as np
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:     # not available on windows
+    resource = None
+
+
+def maxRSS():
+    """
+    进程常驻内存的历史最大值（字节），平台不支持时返回 None。
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def nbytes(arrays) -> int:
+    """
+    数组（tuple / list / dict，可包含 None）的总字节数。
+    """
+    if isinstance(arrays, dict):
+        arrays = arrays.values()
+    return int(sum(array.nbytes for array in arrays if isinstance(array, np.ndarray)))
+
+
+class Profiler:
+    """
+    记录转换流程中每个阶段的耗时、字节数和内存峰值。
+
+    enabled 为 False 时 stage() 只返回记录而不做统计，Scene 默认使用这种 Profiler。
+    内存峰值来自 tracemalloc（numpy 的分配也会计入，内存映射的页不会），
+    同时记录进程的最大常驻内存 maxRSS。
+
+    Attributes:
+        stages: 每个阶段一条记录，按执行顺序排列。
+        info: 写入报告的文件信息，由调用者填写。
+    """
+    def __init__(self, enabled: bool = True, traceMemory: bool = True):
+        self.enabled = enabled
+        self.traceMemory = enabled and traceMemory
+        self.stages = []
+        self.info = {}
+        self.ownsTrace = False
+
+    def start(self):
+        if self.traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.ownsTrace = True
+
+    def stop(self):
+        if self.ownsTrace:
+            tracemalloc.stop()
+            self.ownsTrace = False
+
+    @contextlib.contextmanager
+    def stage(self, name: str, bytesIn: int = 0):
+        """
+        统计 with 块内的一个阶段，调用者可以在块内设置 record['bytesOut']。
+        """
+        record = {"name": name, "bytesIn": int(bytesIn), "bytesOut": 0}
+        if not self.enabled:
+            yield record
+            return
+
+        tracing = self.traceMemory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall"] = time.perf_counter() - wall
+            record["cpu"] = time.process_time() - cpu
+            record["bytesOut"] = int(record["bytesOut"])
+            record["peakMemory"] = tracemalloc.get_traced_memory()[1] if tracing else None
+            record["maxRSS"] = maxRSS()
+            self.stages.append(record)
+
+    def report(self) -> dict:
+        peaks = [stage["peakMemory"] for stage in self.stages if stage["peakMemory"] is not None]
+        return {
+            **self.info,
+            "stages": self.stages,
+            "wall": sum(stage["wall"] for stage in self.stages),
+            "cpu": sum(stage["cpu"] for stage in self.stages),
+            "peakMemory": max(peaks) if peaks else None,
+            "maxRSS": maxRSS(),
+        }
+
+
+def summarize(reports: list) -> dict:
+    """
+    汇总多个文件的报告：每个阶段累加耗时和字节数，内存取最大值。
+    """
+    stages = {}
+    for report in reports:
+        for stage in report["stages"]:
+            total = stages.setdefault(stage["name"], {"count": 0, "wall": 0.0, "cpu": 0.0,
+                                                      "bytesIn": 0, "bytesOut": 0, "peakMemory": None})
+            total["count"] += 1
+            for key in ("wall", "cpu", "bytesIn", "bytesOut"):
+                total[key] += stage[key]
+            if stage["peakMemory"] is not None:
+                total["peakMemory"] = max(total["peakMemory"] or 0, stage["peakMemory"])
+
+    def largest(key):
+        values = [report[key] for report in reports if report.get(key) is not None]
+        return max(values) if values else None
+
+    wall = sum(report["wall"] for report in reports)
+    splats = sum(report.get("splats", 0) for report in reports)
+    return {
+        "files": len(reports),
+        "splats": splats,
+        "wall": wall,
+        "cpu": sum(report["cpu"] for report in reports),
+        "splatsPerSecond": splats / wall if wall > 0 else 0.0,
+        "peakMemory": largest("peakMemory"),
+        "maxRSS": largest("maxRSS"),
+        "stages": stages,
+    }
+
+def printSummary(summary: dict):
+    def mb(value):
+        return "-" if value is None else f"{value / 2**20:.1f}"
+
+    print(f"\nprofile of {summary['files']} file(s), {summary['splats']:,} splats, "
+          f"{summary['splatsPerSecond']:,.0f} splats/s")
+    print(f"{'stage':<12}{'wall(s)':>10}{'cpu(s)':>10}{'in(MB)':>10}{'out(MB)':>10}{'peak(MB)':>10}")
+    for name, stage in summary["stages"].items():
+        print(f"{name:<12}{stage['wall']:>10.2f}{stage['cpu']:>10.2f}{mb(stage['bytesIn']):>10}"
+              f"{mb(stage['bytesOut']):>10}{mb(stage['peakMemory']):>10}")
+    print(f"max RSS: {mb(summary['maxRSS'])} MB")
+
+def writeReport(path: str, report: dict):
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
@@ -0,0 +1,259 @@
+import numpy as np
+from . import ply
+from . import accel
+
+# 纹理格式 -> (numpy 类型, 每个纹素的通道数)
+TEXTURE_FORMATS = {
+    'R32UI': (np.uint32, 1),
+    'RGBA8': (np.uint8, 4),
+    'RGB8': (np.uint8, 3),
+    'RGBA32UI': (np.uint32, 4),
+    'R16UI': (np.uint16, 1),
+}
+
+# u_range 中每个 chunk 的 min/max 以 float16 存储，格式固定为 RGBA32UI
+RANGE_FORMAT = 'RGBA32UI'
+RANGE_HALFS_PER_TEXEL = 8
+
+# 每次处理的 chunk 数量，使临时数组保持在缓存友好的大小
+CHUNKS_PER_BLOCK = 256
+
+
+class Attribute:
+    """
+    一个参数的量化方式。
+
+    Attributes:
+        source: 参数在 params 中的序号。
+        channels: 通道数。
+        bits: 每个通道的位数，int 表示所有通道相同，mode 为 'half' 时忽略。
+        mode: 'chunk': 每个 chunk 的每个通道各自一组 min/max；
+              'shared': 每个 chunk 的所有通道共用一组 min/max；
+              'fixed': 固定范围 fixedRange，不写入 u_range；
+              'half': 不量化，按 float16 存储。
+        fixedRange: mode 为 'fixed' 时的 (min, max)。
+        transform: 量化前对数值的变换，例如 np.sqrt。
+        rangeOrder: mode 为 'chunk' 时 min/max 在 u_range 中的排列，
+                    'grouped' 为先全部 min 后全部 max，'interleaved' 为每个通道的 min、max 相邻。
+        rangeChannels: 写入 u_range 的通道数，默认全部。
+    """
+    def __init__(self, source: int, channels: int, bits=8, mode: str = 'chunk', fixedRange: tuple = None,
+                 transform=None, rangeOrder: str = 'grouped', rangeChannels: int = None):
+        if mode not in ('chunk', 'shared', 'fixed', 'half'):
+            raise ValueError(f"unknown quantization mode: {mode}")
+        if mode == 'fixed' and fixedRange is None:
+            raise ValueError("fixed quantization needs fixedRange")
+        if rangeOrder not in ('grouped', 'interleaved'):
+            raise ValueError(f"unknown range order: {rangeOrder}")
+        self.source = source
+        self.channels = channels
+        self.bits = tuple(bits) if isinstance(bits, (tuple, list)) else (bits,) * channels
+        self.mode = mode
+        self.fixedRange = fixedRange
+        self.transform = transform
+        self.rangeOrder = rangeOrder
+        self.rangeChannels = channels if rangeChannels is None else rangeChannels
+        self.levels = np.array([(1 << b) - 1 for b in self.bits], dtype=np.float32)
+
+    @property
+    def rangeSize(self) -> int:
+        """
+        每个 chunk 在 u_range 中占用的 float16 个数。
+        """
+        if self.mode == 'chunk':
+            return 2 * self.rangeChannels
+        if self.mode == 'shared':
+            return 2
+        return 0
+
+
+class Texture:
+    """
+    一个数据纹理的打包方式。
+
+    Attributes:
+        format: TEXTURE_FORMATS 中的格式。
+        fields: [(attribute name, [channel, ...]), ...]，按顺序打包进每个纹素。
+        packing: 'bytes': 量化值依次按 uint8（'half' 属性为 float16）排列；
+                 'bits': 量化值按各自的位数从低位到高位拼成一个 uint32。
+    """
+    def __init__(self, format: str, fields: list, packing: str = 'bytes'):
+        if format not in TEXTURE_FORMATS:
+            raise ValueError(f"unknown texture format: {format}")
+        if packing not in ('bytes', 'bits'):
+            raise ValueError(f"unknown texture packing: {packing}")
+        self.format = format
+        self.fields = [(name, list(channels)) for name, channels in fields]
+        self.packing = packing
+
+    @property
+    def dtype(self):
+        return TEXTURE_FORMATS[self.format][0]
+
+    @property
+    def channels(self) -> int:
+        return TEXTURE_FORMATS[self.format][1]
+
+
+class Schema:
+    """
+    一个 Kernel 的量化描述，供 quantize 使用。
+
+    Args:
+        attributes: {name: Attribute}。
+        textures: {name: Texture}，输出按此顺序排列，最后是 u_range。
+        range: u_range 中每个 chunk 的排列，元素为 attribute 名，或表示补零个数（float16）的 int。
+    """
+    def __init__(self, attributes: dict, textures: dict, range: list):
+        self.attributes = attributes
+        self.textures = textures
+
+        self.rangeOffsets = {}
+        offset = 0
+        for item in range:
+            if isinstance(item, int):
+                offset += item
+            else:
+                self.rangeOffsets[item] = offset
+                offset += attributes[item].rangeSize
+        if offset % RANGE_HALFS_PER_TEXEL != 0:
+            raise ValueError(f"u_range of {offset} halfs is not a whole number of {RANGE_FORMAT} texels")
+        self.rangeLength = offset
+
+        for name, attribute in attributes.items():
+            if attribute.rangeSize > 0 and name not in self.rangeOffsets:
+                raise ValueError(f"range of attribute '{name}' is not placed in u_range")
+
+        for name, texture in textures.items():
+            texelBytes = texture.channels * np.dtype(texture.dtype).itemsize
+            if texture.packing == 'bits':
+                size = sum(attributes[field].bits[c] for field, channels in texture.fields for c in channels)
+                if texture.format != 'R32UI' or size > 32:
+                    raise ValueError(f"texture '{name}': bit packing needs R32UI and at most 32 bits")
+            else:
+                size = sum((2 if attributes[field].mode == 'half' else 1) * len(channels)
+                           for field, channels in texture.fields)
+                if size != texelBytes:
+                    raise ValueError(f"texture '{name}': fields take {size} bytes, {texture.format} has {texelBytes}")
+
+    @property
+    def formats(self) -> dict:
+        formats = {name: texture.format for name, texture in self.textures.items()}
+        formats['range'] = RANGE_FORMAT
+        return formats
+
+
+def chunkReduce(values: np.ndarray, op) -> np.ndarray:
+    """
+    沿 axis 1 做 min/max 归约：两半逐元素比较，重复 log2(256) 次。
+    比 values.min(axis=1) 在通道数很少时的跨步归约快一个数量级，结果相同。
+    """
+    while values.shape[1] > 1 and values.shape[1] % 2 == 0:
+        half = values.shape[1] // 2
+        values = op(values[:, :half], values[:, half:])
+    return op.reduce(values, axis=1)
+
+def quantize(params: tuple, schema: Schema):
+    """
+    按 schema 量化 params，params 的点数须为 chunk 大小的整数倍。
+
+    按 CHUNKS_PER_BLOCK 个 chunk 一块遍历一次所有参数，在同一块内完成
+    min/max、归一化、取整和打包，直接写入预先分配的输出。
+
+    Returns:
+        (quantized_params, texture_formats)，quantized_params 中每项形状为
+        (num_chunks, 256 或 1, channels)。
+    """
+    chunk_size = ply.CHUNK_SIZE
+    first = next(iter(schema.attributes.values()))
+    num_chunks = params[first.source].shape[0] // chunk_size
+
+    outputs = {name: np.zeros((num_chunks, chunk_size, texture.channels), dtype=texture.dtype)
+               for name, texture in schema.textures.items()}
+    ranges = np.zeros((num_chunks, schema.rangeLength), dtype=np.float16)
+    fuse = accel.enabled(num_chunks * chunk_size)
+
+    for start in range(0, num_chunks, CHUNKS_PER_BLOCK):
+        end = min(start + CHUNKS_PER_BLOCK, num_chunks)
+        count = end - start
+
+        quantized = {}
+        for name, attribute in schema.attributes.items():
+            values = params[attribute.source][start * chunk_size:end * chunk_size]
+            values = values.reshape((count, chunk_size, attribute.channels))
+            if attribute.transform is not None:
+                values = attribute.transform(values)
+
+            if attribute.mode == 'half':
+                quantized[name] = values.astype(np.float16)
+                continue
+
+            if attribute.mode == 'fixed':
+                value_min = np.array(attribute.fixedRange[0], dtype=np.float32)
+                value_max = np.array(attribute.fixedRange[1], dtype=np.float32)
+                normalized = values - value_min
+                normalized /= value_max - value_min
+            else:
+                # 可用时 numba 内核一次完成 min/max、归一化和取整，结果相同
+                fused = accel.chunk_quantize(values, attribute.mode == 'shared', attribute.levels) if fuse else None
+                if fused is not None:
+                    value_min, value_max, quantized[name] = fused
+                else:
+                    value_min = chunkReduce(values, np.minimum)   # Shape: (count, channels)
+                    value_max = chunkReduce(values, np.maximum)
+                    if attribute.mode == 'shared':
+                        value_min = value_min.min(axis=1)           # Shape: (count,)
+                        value_max = value_max.max(axis=1)
+
+                offset = schema.rangeOffsets[name]
+                if attribute.mode == 'shared':
+                    ranges[start:end, offset] = value_min
+                    ranges[start:end, offset + 1] = value_max
+                elif attribute.rangeOrder == 'grouped':
+                    k = attribute.rangeChannels
+                    ranges[start:end, offset:offset + k] = value_min[:, :k]
+                    ranges[start:end, offset + k:offset + 2 * k] = value_max[:, :k]
+                else:
+                    k = attribute.rangeChannels
+                    ranges[start:end, offset:offset + 2 * k:2] = value_min[:, :k]
+                    ranges[start:end, offset + 1:offset + 2 * k:2] = value_max[:, :k]
+
+                if fused is not None:
+                    continue
+                value_range = value_max - value_min
+                value_range[value_range == 0] = 1.0
+                if attribute.mode == 'chunk':
+                    value_min, value_range = value_min[:, np.newaxis, :], value_range[:, np.newaxis, :]
+                else:
+                    value_min, value_range = value_min[:, np.newaxis, np.newaxis], value_range[:, np.newaxis, np.newaxis]
+                normalized = values - value_min
+                normalized /= value_range
+
+            # 原地运算，每个块只分配一个临时数组
+            normalized *= attribute.levels
+            quantized[name] = np.around(normalized, out=normalized)
+
+        for name, texture in schema.textures.items():
+            if texture.packing == 'bits':
+                packed = np.zeros((count, chunk_size), dtype=np.uint32)
+                shift = 0
+                for field, channels in texture.fields:
+                    for c in channels:
+                        packed |= quantized[field][..., c].astype(np.uint32) << np.uint32(shift)
+                        shift += schema.attributes[field].bits[c]
+                outputs[name][start:end, :, 0] = packed
+            else:
+                texels = outputs[name][start:end].view(np.uint8)
+                position = 0
+                for field, channels in texture.fields:
+                    if schema.attributes[field].mode == 'half':
+                        data = quantized[field][..., channels].view(np.uint8)
+                    else:
+                        data = quantized[field][..., channels].astype(np.uint8)
+                    texels[..., position:position + data.shape[-1]] = data
+                    position += data.shape[-1]
+
+    quantized_params = dict(outputs)
+    quantized_params['range'] = ranges.view(np.uint32).reshape([num_chunks, 1, -1])
+
+    return quantized_params, schema.formats
@@ -1,70 +1,291 @@
 import numpy as np
-import utils as utils
-from threeD import Kernel_3dgs
-from spacetime import Kernel_spacetime
+from . import utils
+from . import ply
+from . import profiling
+from . import tiling
+from .cache import StageCache
+from .threeD import Kernel_3dgs
+from .spacetime import Kernel_spacetime
+import copy
 import os
 
 class Scene:
-    def __init__(self, inputPath: str = '', name: str = ''):
+    def __init__(self, inputPath: str = '', name: str = '', profiler: profiling.Profiler = None, cache: StageCache = None,
+                 shCodebook: int = None):
+        """
+        shCodebook: 球谐系数码本的大小，None 表示只导出 0 阶颜色。
+        """
         if not os.path.exists(inputPath):
             raise FileNotFoundError(f"输入路径不存在: {inputPath}")
             
         self.inputPath = inputPath
-        self.header: str | None = None
-        self.data: bytes | None = None
+        self.header: ply.PlyHeader | None = None
+        self.vertices: np.ndarray | None = None
         self.Kernel = None
+        self.layout: ply.Layout | None = None
         self.params = None
         self.name = name
+        self.analysis = None
+        self.profiler = profiler if profiler is not None else profiling.Profiler(enabled=False)
+        # 有缓存时复用解析结果和排序的排列
+        self.cache = cache
+        self.contentHash = None
+        # prune 的参数，排序的缓存与之相关
+        self.pruning = None
+        self.shCodebook = shCodebook
 
         if inputPath != '':
             self.load(inputPath)
 
     def load(self, inputPath):
         self.inputPath = inputPath
-        try:
-            with open(self.inputPath, 'rb') as file:
-                header_str = ''
-                while 'end_header\n' not in header_str:
-                    byte = file.read(1)
-                    if not byte:
-                        raise ValueError("文件中未找到 'end_header'。")
-                    header_str += byte.decode('utf-8')
-                
-                self.header = header_str
-                self.data = file.read()
-
-        except Exception as e:
-            print(f"Load ply file error: {e}")
-            return
+        with self.profiler.stage('parse', os.path.getsize(self.inputPath)) as record:
+            try:
+                self.header = ply.readHeader(self.inputPath)
+                self.vertices = ply.memmapVertices(self.inputPath, self.header)
+
+            except Exception as e:
+                print(f"Load ply file error: {e}")
+                return
+
+            self.Kernel, self.layout = Scene.identify(self.header)
+            print(f"gaussian type: {self.Kernel.__name__}")
 
+            exportSH = self.shCodebook is not None and self.Kernel.shExport
+            key = None
+            if self.cache is not None:
+                self.contentHash = self.cache.contentHash(self.inputPath)
+                key = StageCache.key('params', self.contentHash, self.Kernel.__name__, exportSH)
+                self.params = self.cache.get(key)
+            if self.params is None:
+                if exportSH:
+                    self.params = self.Kernel.getParams(self.vertices, self.layout, exportSH=True)
+                else:
+                    self.params = self.Kernel.getParams(self.vertices, self.layout)
+                if key is not None:
+                    self.cache.put(key, self.params)
+            else:
+                self.layout.hasSH = exportSH and self.params[4] is not None
+                print(f"params loaded from cache")
+            if self.shCodebook is not None and not self.layout.hasSH:
+                print(f"Warning: no spherical harmonics to export, only the base color is written")
+            self.vertices = None
+            self.pointCount = self.layout.pointCount
+            record['bytesOut'] = profiling.nbytes(self.params)
+
+    @staticmethod
+    def identify(header: ply.PlyHeader):
         known_kernels = [Kernel_3dgs, Kernel_spacetime]
         
-        IdentifiedKernel = None
         for kernel_class in known_kernels:
-            if kernel_class.identify([line.split() for line in self.header.splitlines()]):
-                IdentifiedKernel = kernel_class
-                break
-        
-        if IdentifiedKernel:
-            print(f"gaussian type: {IdentifiedKernel.__name__}")
-            self.Kernel = IdentifiedKernel
-        else:
-            raise ValueError(f"Unknown gaussian type")
-        
-        self.params = self.Kernel.getParams(self.data)
-        self.data = None
-        self.pointCount = self.params[0].shape[0]
+            layout = kernel_class.identify(header)
+            if layout is not None:
+                return kernel_class, layout
 
-    def reorder(self, type):
-        self.params = self.Kernel.reorder(self.params, type)
-        self.Kernel.analyze_point_blocks(self.params[0])
+        raise ValueError(f"Unknown gaussian type")
+
+    def prune(self, minOpacity: float = None, maxSplats: int = None, dropDegenerate: bool = False,
+              floaters: tuple = None, workers: int = None):
+        """
+        排序之前删除透明度低于 minOpacity 的点、退化的点（dropDegenerate）和离群点（floaters），
+        点数仍多于 maxSplats 时按 opacity × 投影面积保留最重要的点。参数都为缺省值时不做任何事。
+
+        Args:
+            floaters: (近邻数, 标准差倍数)，见 outliers.floaterMask，需要 scipy。
+            workers: 离群点检测使用的线程数，缺省为 CPU 数。
+        """
+        if minOpacity is None and maxSplats is None and not dropDegenerate and floaters is None:
+            return
+        isFloater = None
+        if floaters is not None:
+            from . import outliers
+            isFloater = lambda xyz: outliers.floaterMask(xyz, *floaters, workers=workers)
+        with self.profiler.stage('prune', profiling.nbytes(self.params)) as record:
+            before = self.layout.vertexCount
+            self.params = self.Kernel.prune(self.params, self.layout, minOpacity, maxSplats, dropDegenerate, isFloater)
+            self.pruning = (minOpacity, maxSplats, dropDegenerate, floaters)
+            self.pointCount = self.layout.pointCount
+            record['bytesOut'] = profiling.nbytes(self.params)
+        print(f"pruned {before - self.layout.vertexCount:,} of {before:,} splats")
+
+    def reorder(self, type, analyze=None, workers=None):
+        """
+        analyze: None 表示跳过 chunk 紧凑度分析，0 表示分析全部 chunk，正数表示随机抽取的 chunk 数量。
+        workers: 曲线编码和排序使用的线程数，缺省为 CPU 数。
+        """
+        with self.profiler.stage('reorder', profiling.nbytes(self.params)) as record:
+            sort_indices = None
+            if self.cache is not None:
+                key = StageCache.key('order', self.contentHash, self.Kernel.__name__, type, self.pruning)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    sort_indices, = cached
+                    print(f"{type} order loaded from cache")
+                else:
+                    sort_indices = self.Kernel.sortIndices(self.params, type, workers)
+                    self.cache.put(key, (sort_indices,))
+            self.params = self.Kernel.reorder(self.params, type, self.layout, workers, sort_indices)
+            record['bytesOut'] = profiling.nbytes(self.params)
+        if analyze is not None:
+            with self.profiler.stage('analyze', self.params[0].nbytes):
+                self.analysis = utils.analyze_point_blocks(self.params[0], ply.CHUNK_SIZE, sample=analyze)
 
     def visualize(self):
         self.Kernel.visualize_with_pyvista(self.params)
 
-    def toGLB(self, outputPath, saveJson):
-        gltf = self.Kernel.toGLB(self.params, self.pointCount, self.name)
-        gltf.save(outputPath)
-        if saveJson:
-            gltf.save_json(outputPath + ".json")
-        
\ No newline at end of file
+    def toGLB(self, outputPath, saveJson, workers=None, lod=None, waves=None, tiles=None):
+        """
+        tiles: 每块最多的点数，None 表示写成一个文件，见 writeTiles。
+        """
+        if tiles is not None:
+            self.writeTiles(outputPath, saveJson, tiles, workers, lod, waves)
+            return
+        gltf, textures = self.prepareGLB(workers, lod, waves)
+        self.writeGLB(outputPath, saveJson, gltf, textures)
+
+    def writeTiles(self, outputPath, saveJson, maxSplats, workers=None, lod=None, waves=None):
+        """
+        把排序后的点按八叉树切成每块不超过 maxSplats 个点的块（tiling.octreeTiles），
+        每块按原来的 chunk 和纹理排布写成 `<output>_tile{i}.glb`，块内保持曲线顺序；
+        块的文件名、包含的八叉树格子、点数、包围盒和文件大小写入 `<output>.tiles.json`。
+        lod、waves 对每块分别生效。
+        """
+        with self.profiler.stage('tile', self.params[0].nbytes) as record:
+            rows = self.Kernel.splatRows(self.params)
+            cells = [(tileCells, rows[indices])
+                     for tileCells, indices in tiling.octreeTiles(self.params[0][rows], maxSplats, workers)]
+            record['bytesOut'] = sum(indices.nbytes for _, indices in cells)
+        print(f"{len(cells)} tiles")
+
+        entries = []
+        for tile, (tileCells, indices) in enumerate(cells):
+            # 与原场景共用缓存、码本大小和 profiler，只替换点
+            part = copy.copy(self)
+            part.params, part.layout = self.Kernel.subset(self.params, self.layout, indices)
+            part.pointCount = part.layout.pointCount
+            path = tiling.tilePath(outputPath, tile)
+            part.toGLB(path, saveJson, workers, lod, waves)
+            low, high = self.Kernel.tileBounds(part.params, part.layout)
+            entries.append({"file": os.path.basename(path), "cells": [list(c) for c in tileCells], "num": len(indices),
+                            "min": low.tolist(), "max": high.tolist(), "bytes": os.path.getsize(path)})
+        tiling.writeManifest(outputPath, self.Kernel.gsType, self.name, entries)
+
+    def prepareGLB(self, workers=None, lod=None, waves=None):
+        """
+        量化并排布纹理，返回 (gltf, textures)，由 writeGLB 写入文件。
+        workers: 球谐码本聚类使用的线程数，缺省为 CPU 数。
+        lod: (层级数, 每次合并的点数)，None 表示只写完整的一级，见 buildLevels。
+        waves: 按重要性把 chunk 分成的组数，None 表示按曲线顺序写一组纹理，见 layoutWaves。
+        """
+        if lod is not None and waves is not None:
+            raise ValueError("LOD and importance waves cannot be combined")
+        # same steps as Kernel.toGLB, split so that each one is profiled
+        with self.profiler.stage('quantize', profiling.nbytes(self.params)) as record:
+            quantized_params, texture_formats = self.Kernel.quantize(self.params, self.layout)
+            record['bytesOut'] = profiling.nbytes(quantized_params)
+
+        codebook = None
+        if self.shCodebook is not None and self.layout.hasSH:
+            with self.profiler.stage('sh', profiling.nbytes(self.params[4:])) as record:
+                quantized_params['sh'], codebook = self.Kernel.encodeSH(self.params, self.layout, self.shCodebook, workers)
+                texture_formats['sh'] = 'R16UI'
+                record['bytesOut'] = quantized_params['sh'].nbytes + codebook.nbytes
+
+        levels = self.buildLevels(*lod) if lod is not None else []
+
+        with self.profiler.stage('layout', profiling.nbytes(quantized_params)) as record:
+            extras = None
+            if waves is not None:
+                descriptors, textures, extras = self.layoutWaves(quantized_params, texture_formats, codebook, waves)
+            else:
+                num_chunks = self.layout.pointCount // ply.CHUNK_SIZE
+                descriptors, textures, pages = utils.layoutPages(quantized_params, texture_formats, num_chunks)
+                if codebook is not None:
+                    utils.appendTexture(descriptors, textures, 'shCodebook', codebook, 'RGBA32UI')
+                if pages is not None:
+                    extras = {"pages": pages}
+            if levels:
+                # 最粗的一级写在最前面，只下载文件开头的一部分即可显示粗略的场景
+                sets = [(f"_lod{level}", levelDescriptors, levelTextures)
+                        for level, _, (levelDescriptors, levelTextures, _) in levels[::-1]] \
+                    + [("", descriptors, textures)]
+                counts = [(level, num, pages) for level, num, (_, _, pages) in levels[::-1]] \
+                    + [(0, self.layout.vertexCount, (extras or {}).get("pages"))]
+                descriptors, textures, ranges = utils.concatTextureSets(sets)
+                table = []
+                for (level, num, pages), (offset, length, names) in zip(counts, ranges):
+                    entry = {"level": level, "num": num, "byteOffset": offset, "byteLength": length, "textures": names}
+                    if pages is not None:
+                        entry["pages"] = utils.renamePages(pages, names)
+                    table.append(entry)
+                extras = {**(extras or {}), "lod": table}
+            texDataLength = profiling.nbytes(textures)
+            gltf = utils.buildGLTF(descriptors, texDataLength, self.Kernel.gsType, self.name, self.layout.pointCount, extras)
+            record['bytesOut'] = texDataLength
+        return gltf, list(textures.values())
+
+    def layoutWaves(self, quantized_params: dict, texture_formats: dict, codebook, waves: int) -> tuple:
+        """
+        按 Kernel.waveChunks 把 chunk 分组，每组单独排布一套完整的纹理（含 u_range），首尾相接写入文件，
+        只下载文件开头的一部分即可显示整个场景中最重要的点。第 i 组的纹理名加后缀 `_wave{i}`，
+        球谐码本为各组共用，写在最前面。node extras 的 "waves" 为分组表，按文件中的顺序排列，每项为
+        {"wave", "chunks", "num", "byteOffset", "byteLength", "textures": {原纹理名: 该组的纹理名}}，
+        一组超过一页时还有该组的页表 "pages"，见 utils.layoutPages。
+
+        Returns:
+            (descriptors, textures, extras)
+        """
+        sets = []
+        if codebook is not None:
+            shared = ({}, {})
+            utils.appendTexture(*shared, 'shCodebook', codebook, 'RGBA32UI')
+            sets.append(("", *shared))
+        chunkSets = self.Kernel.waveChunks(self.params, waves)
+        wavePages = []
+        for wave, chunks in enumerate(chunkSets):
+            subset = {key: value[chunks] for key, value in quantized_params.items()}
+            descriptors, textures, pages = utils.layoutPages(subset, texture_formats, len(chunks))
+            sets.append((f"_wave{wave}", descriptors, textures))
+            wavePages.append(pages)
+        descriptors, textures, ranges = utils.concatTextureSets(sets)
+        table = []
+        for wave, (chunks, pages, (offset, length, names)) \
+                in enumerate(zip(chunkSets, wavePages, ranges[len(sets) - len(chunkSets):])):
+            entry = {"wave": wave, "chunks": len(chunks), "num": len(chunks) * ply.CHUNK_SIZE,
+                     "byteOffset": offset, "byteLength": length, "textures": names}
+            if pages is not None:
+                entry["pages"] = utils.renamePages(pages, names)
+            table.append(entry)
+        return descriptors, textures, {"waves": table}
+
+    def buildLevels(self, levels: int, group: int) -> list:
+        """
+        由排序后的点逐级合并出更粗的层级（Kernel.buildLOD），各自量化并排布纹理。
+        写入文件时第 l 级的纹理名加后缀 `_lod{l}`，完整的一级保持原名；
+        node extras 的 "lod" 为层级表，按文件中的顺序（从最粗到完整）排列，每项为
+        {"level", "num", "byteOffset", "byteLength", "textures": {原纹理名: 该级的纹理名}}，
+        一级超过一页时还有该级的页表 "pages"，见 utils.layoutPages。
+
+        Returns:
+            [(level, vertexCount, (descriptors, textures, pages))]，从第 1 级到最粗的一级。
+        """
+        if not self.Kernel.lodExport:
+            print(f"Warning: {self.Kernel.__name__} does not support LOD, only the full level is written")
+            return []
+
+        result = []
+        with self.profiler.stage('lod', profiling.nbytes(self.params[:4])) as record:
+            for level, (params, layout) in enumerate(self.Kernel.buildLOD(self.params, self.layout, levels, group), 1):
+                quantized_params, texture_formats = self.Kernel.quantize(params, layout)
+                textureSet = utils.layoutPages(quantized_params, texture_formats, layout.pointCount // ply.CHUNK_SIZE)
+                result.append((level, layout.vertexCount, textureSet))
+                print(f"LOD level {level}: {layout.vertexCount:,} splats")
+            record['bytesOut'] = sum(profiling.nbytes(textureSet[1]) for _, _, textureSet in result)
+        return result
+
+    def writeGLB(self, outputPath, saveJson, gltf, textures):
+        with self.profiler.stage('write', profiling.nbytes(textures)) as record:
+            utils.writeGLB(outputPath, gltf, textures)
+            if saveJson:
+                utils.writeGLTFJson(outputPath + ".json", gltf, textures)
+            record['bytesOut'] = os.path.getsize(outputPath)
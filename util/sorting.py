@@ -0,0 +1,142 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from . import accel
+import os
+
+# 基数分配使用的编码最高位数
+PARTITION_BITS = 16
+# 每个线程平均分到的桶数，桶越多负载越均衡；桶号为 uint8
+PARTITIONS_PER_WORKER = 4
+MAX_PARTITIONS = 256
+# 每个线程至少处理的点数，点数较少时线程调度的开销大于收益
+MIN_ROWS_PER_WORKER = 1 << 16
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+def split_rows(n: int, workers: int) -> list:
+    """
+    把 [0, n) 分成最多 workers 个连续区间，每个区间不少于 MIN_ROWS_PER_WORKER 行。
+    """
+    count = max(1, min(workers, n // MIN_ROWS_PER_WORKER))
+    bounds = np.linspace(0, n, count + 1).astype(np.int64)
+    return [(int(bounds[i]), int(bounds[i + 1])) for i in range(count)]
+
+def run_blocks(executor, function, blocks: list) -> list:
+    # numpy 的数组运算会释放 GIL，线程之间可以真正并行
+    if executor is None or len(blocks) == 1:
+        return [function(*block) for block in blocks]
+    return list(executor.map(lambda block: function(*block), blocks))
+
+def encode_keys(encode, points: np.ndarray, min_coords: np.ndarray, scale, workers: int = None) -> np.ndarray:
+    """
+    分块并行计算曲线编码，结果与 encode(points, min_coords, scale) 相同。
+
+    Args:
+        encode: 接受 (points, min_coords, scale) 的编码函数，例如 Kernel_3dgs.morton_codes。
+        min_coords, scale: 全局归一化参数，每块使用相同的值。
+    """
+    if accel.enabled(points.shape[0]):
+        # numba 内核自身是并行的，且不能被多个线程同时调用
+        return encode(points, min_coords, scale)
+
+    workers = default_workers() if workers is None else workers
+    blocks = split_rows(points.shape[0], workers)
+    keys = np.empty(points.shape[0], dtype=np.uint64)
+
+    def encodeBlock(start, end):
+        keys[start:end] = encode(points[start:end], min_coords, scale)
+
+    with ThreadPoolExecutor(max_workers=len(blocks)) as executor:
+        run_blocks(executor, encodeBlock, blocks)
+    return keys
+
+def stable_ties(keys: np.ndarray, order: np.ndarray) -> np.ndarray:
+    """
+    order 使 keys 有序但相等编码之间的顺序不确定时，把每段相等编码的索引按升序排列，
+    结果与 np.argsort(keys, kind='stable') 相同。相等的编码很少（通常只有补齐的点）。
+    """
+    sorted_keys = keys[order]
+    equal = sorted_keys[1:] == sorted_keys[:-1]
+    if not equal.any():
+        return order
+    tied = np.zeros(len(order), dtype=bool)
+    tied[1:] |= equal
+    tied[:-1] |= equal
+    # 每段相等编码的编号，段内按索引排序
+    runs = np.cumsum(np.concatenate([[True], ~equal]))[tied]
+    members = order[tied]
+    order[tied] = members[np.lexsort((members, runs))]
+    return order
+
+def parallel_argsort(keys: np.ndarray, keyBits: int = 64, workers: int = None) -> np.ndarray:
+    """
+    uint64 编码的并行排序，返回 np.argsort(keys, kind='stable')。
+
+    先按最高 PARTITION_BITS 位做一遍基数分配：各线程统计自己区间的直方图，
+    按前缀和把编码分成 PARTITIONS_PER_WORKER * workers（最多 MAX_PARTITIONS）个点数相近的桶，
+    各线程再把自己区间内的点稳定地写入每个桶的对应位置；
+    然后各线程用 np.argsort 排序不同的桶。分配是稳定的，所以桶内相等编码的顺序只需按位置修正。
+
+    Args:
+        keys: uint64 数组。
+        keyBits: 编码的有效位数。
+        workers: 线程数，缺省为 CPU 数。
+    """
+    workers = default_workers() if workers is None else workers
+    n = keys.shape[0]
+    blocks = split_rows(n, workers)
+    if len(blocks) == 1:
+        return stable_ties(keys, np.argsort(keys))
+
+    shift = np.uint64(max(keyBits - PARTITION_BITS, 0))
+    counts = np.zeros((len(blocks), 1 << PARTITION_BITS), dtype=np.int64)
+    sorted_keys = np.empty(n, dtype=np.uint64)
+    indices = np.empty(n, dtype=np.int64)
+
+    with ThreadPoolExecutor(max_workers=len(blocks)) as executor:
+        def countBlock(b, start, end):
+            prefix = (keys[start:end] >> shift).astype(np.uint16)
+            counts[b] = np.bincount(prefix, minlength=1 << PARTITION_BITS)
+            return prefix
+
+        prefixes = run_blocks(executor, countBlock, [(b, start, end) for b, (start, end) in enumerate(blocks)])
+
+        # 在前缀和上二分查找，把相邻前缀合并为点数相近的桶
+        cumulative = np.cumsum(counts.sum(axis=0))
+        partitions = min(PARTITIONS_PER_WORKER * len(blocks), MAX_PARTITIONS)
+        targets = np.arange(1, partitions) * (n / partitions)
+        bucket_of_prefix = np.zeros(1 << PARTITION_BITS, dtype=np.uint8)
+        edges = np.unique(np.searchsorted(cumulative, targets, side='right'))
+        edges = edges[(edges > 0) & (edges < len(cumulative))]
+        bucket_of_prefix[edges] = 1
+        bucket_of_prefix = np.cumsum(bucket_of_prefix, dtype=np.uint8)
+        num_buckets = len(edges) + 1
+
+        bucket_counts = np.add.reduceat(counts, np.concatenate([[0], edges]), axis=1)
+        # starts[b, k]: 第 b 个区间中属于第 k 个桶的第一个点在输出中的位置，先按桶、再按区间排列
+        starts = (np.cumsum(bucket_counts.T.ravel()) - bucket_counts.T.ravel()).reshape(num_buckets, len(blocks)).T
+        local = np.cumsum(bucket_counts, axis=1) - bucket_counts
+
+        def scatterBlock(b, start, end):
+            bucket = bucket_of_prefix[prefixes[b]]
+            order = np.argsort(bucket, kind='stable')
+            positions = (starts[b] - local[b])[bucket[order]]
+            positions += np.arange(end - start)
+            sorted_keys[positions] = keys[start:end][order]
+            order += start
+            indices[positions] = order
+
+        run_blocks(executor, scatterBlock, [(b, start, end) for b, (start, end) in enumerate(blocks)])
+
+        bucket_starts = np.concatenate([[0], np.cumsum(bucket_counts.sum(axis=0))])
+
+        def sortBucket(start, end):
+            order = stable_ties(sorted_keys[start:end], np.argsort(sorted_keys[start:end]))
+            indices[start:end] = indices[start:end][order]
+
+        run_blocks(executor, sortBucket, [(int(bucket_starts[k]), int(bucket_starts[k + 1]))
+                                          for k in range(num_buckets) if bucket_starts[k + 1] > bucket_starts[k]])
+
+    return indices
@@ -1,85 +1,127 @@
 from enum import IntEnum, auto
 import numpy as np
 import struct
-import utils as utils
+from . import utils
+from . import ply
+from . import quantization
+from .quantization import Attribute, Texture
 import time
-from hilbertcurve.hilbertcurve import HilbertCurve
-from pygltflib import *
 import math
-import pyvista as pv
-from scipy.spatial.distance import pdist
-import keyboard
-from threeD import Kernel_3dgs
-
-P = {
-    'x': -1,
-    'y': -1,
-    'z': -1,
-    'trbf_center': -1,
-    'trbf_scale': -1,
-    'nx': -1,
-    'ny': -1,
-    'nz': -1,
-    'motion_0': -1,
-    'motion_1': -1,
-    'motion_2': -1,
-    'motion_3': -1,
-    'motion_4': -1,
-    'motion_5': -1,
-    'motion_6': -1,
-    'motion_7': -1,
-    'motion_8': -1,
-    'f_dc_0': -1,
-    'f_dc_1': -1,
-    'f_dc_2': -1,
-    'opacity': -1,
-    'scale_0': -1,
-    'scale_1': -1,
-    'scale_2': -1,
-    'rot_0': -1,
-    'rot_1': -1,
-    'rot_2': -1,
-    'rot_3': -1,
-    'omega_0': -1,
-    'omega_1': -1,
-    'omega_2': -1,
-    'omega_3': -1,
-    'total': -1,
-}
+import copy
+from .threeD import Kernel_3dgs
+
+# properties a file of this kind may contain, the per-file column layout
+# is built by identify() and passed along with the params
+PROPERTIES = (
+    'x',
+    'y',
+    'z',
+    'trbf_center',
+    'trbf_scale',
+    'nx',
+    'ny',
+    'nz',
+    'motion_0',
+    'motion_1',
+    'motion_2',
+    'motion_3',
+    'motion_4',
+    'motion_5',
+    'motion_6',
+    'motion_7',
+    'motion_8',
+    'f_dc_0',
+    'f_dc_1',
+    'f_dc_2',
+    'opacity',
+    'scale_0',
+    'scale_1',
+    'scale_2',
+    'rot_0',
+    'rot_1',
+    'rot_2',
+    'rot_3',
+    'omega_0',
+    'omega_1',
+    'omega_2',
+    'omega_3',
+)
+
+REQUIRED = ['x', 'y', 'z', 'trbf_center', 'trbf_scale',
+            'motion_0', 'motion_1', 'motion_2', 'motion_3', 'motion_4',
+            'motion_5', 'motion_6', 'motion_7', 'motion_8',
+            'f_dc_0', 'f_dc_1', 'f_dc_2', 'opacity',
+            'scale_0', 'scale_1', 'scale_2', 'rot_0', 'rot_1', 'rot_2', 'rot_3']
+
+# params: xyz, motion1, motion2, motion3, tc, s, ts, q, color
+# u_other per texel: motion1 + s.x, motion2 + s.y, motion3 + s.z as uint8, tc and ts as float16
+QUANTIZE_SCHEMA = quantization.Schema(
+    attributes={
+        'xyz': Attribute(0, 3, bits=(11, 10, 11)),
+        'motion1': Attribute(1, 3, mode='shared'),
+        'motion2': Attribute(2, 3, mode='shared'),
+        'motion3': Attribute(3, 3, mode='shared'),
+        'tc': Attribute(4, 1, mode='half'),
+        's': Attribute(5, 3, mode='shared', transform=np.sqrt),
+        'ts': Attribute(6, 1, mode='half'),
+        'q': Attribute(7, 4, mode='fixed', fixedRange=(-1, 1)),
+        'color': Attribute(8, 4, rangeOrder='interleaved', rangeChannels=3),
+    },
+    textures={
+        'xyz': Texture('R32UI', [('xyz', [0, 1, 2])], packing='bits'),
+        'q': Texture('RGBA8', [('q', [0, 1, 2, 3])]),
+        'color': Texture('RGBA8', [('color', [0, 1, 2, 3])]),
+        'other': Texture('RGBA32UI', [('motion1', [0, 1, 2]), ('s', [0]),
+                                      ('motion2', [0, 1, 2]), ('s', [1]),
+                                      ('motion3', [0, 1, 2]), ('s', [2]),
+                                      ('tc', [0]), ('ts', [0])]),
+    },
+    range=['xyz', 's', 'motion1', 'motion2', 'motion3', 2, 'color', 2],
+)
+
+# 计算 chunk 活跃时间区间时的可见阈值：opacity × exp(-ts (t - tc)^2) 不低于该值的点视为可见。
+# 查看器剔除 alpha 低于 alphaCullThreshold（不低于 3/255）的点，透明度量化为 8 位时误差不超过 0.5/255，
+# 取 0.5/255 不会漏掉可见的点
+VISIBILITY_THRESHOLD = 0.5 / 255
 
 class Kernel_spacetime:
+    gsType = "SPACETIME"
+    shExport = False
+    lodExport = False
 
     @staticmethod
-    def identify(headerLines: str):
-        for key in P:
-            P[key] = -1
-        cnter = 0
-        for line in headerLines:
-            if line[0] == 'property' and line[1] == 'float':
-                key = line[2]
-                if key in P:
-                    P[key] = cnter
-                    cnter = cnter + 1
-                else:
-                    return False
-        P['total'] = cnter
-        return True
+    def identify(header: ply.PlyHeader):
+        for key in header.propertyNames:
+            if key not in PROPERTIES:
+                return None
+        layout = ply.Layout(header.propertyNames, header.vertexCount)
+        return layout if layout.has(REQUIRED) else None
     
     @staticmethod
-    def getParams(data: bytes):
-        ply = np.frombuffer(data, dtype=np.float32).reshape([-1, P['total']])
-        ply = utils.alignTo256(ply, P['opacity'], 256)
-
-        xyz = ply[:, [P['x'], P['y'], P['z']]]
-        motion1 = ply[:, [P['motion_0'],  P['motion_1'], P['motion_2']]]
-        motion2 = ply[:, [P['motion_3'],  P['motion_4'], P['motion_5']]]
-        motion3 = ply[:, [P['motion_6'],  P['motion_7'], P['motion_8']]]
-        tc = ply[:, P['trbf_center']:P['trbf_center'] + 1]
-        s = ply[:, [P['scale_0'], P['scale_1'], P['scale_2']]]
-        ts = ply[:, P['trbf_scale']:P['trbf_scale'] + 1]
-        q = ply[:, [P['rot_1'], P['rot_2'], P['rot_3'], P['rot_0']]]
-        omega = ply[:, [P['omega_1'], P['omega_2'], P['omega_3'], P['omega_0']]]
-        color = ply[:, [P['f_dc_0'], P['f_dc_1'], P['f_dc_2'], P['opacity']]]
+    def getParams(vertices: np.ndarray, layout: ply.Layout, rows: int = None):
+        # only the columns we need are read from the memory-mapped file,
+        # nx/ny/nz and omega are never touched.
+        # rows defaults to layout.pointCount, pass it when reading a slice of vertices
+        n = vertices.shape[0]
+        rows = layout.pointCount if rows is None else rows
+        groups = [
+            ['x', 'y', 'z'],
+            ['motion_0', 'motion_1', 'motion_2'],
+            ['motion_3', 'motion_4', 'motion_5'],
+            ['motion_6', 'motion_7', 'motion_8'],
+            ['trbf_center'],
+            ['scale_0', 'scale_1', 'scale_2'],
+            ['trbf_scale'],
+            ['rot_1', 'rot_2', 'rot_3', 'rot_0'],
+            ['f_dc_0', 'f_dc_1', 'f_dc_2', 'opacity'],
+        ]
+
+        arrays = ply.readGroups(vertices, groups, rows)
+        for x in arrays:
+            utils.fillPadding(x, n)
+
+        xyz, motion1, motion2, motion3, tc, s, ts, q, color = arrays
+        color[n:, 3] = -70  # small opacity for padded splats
         
         color[:, 3] = utils.sigmoid(color[:, 3])
         # rgb value may exceed 1.0, hack: clamp to 6.0
@@ -133,17 +175,69 @@ class Kernel_spacetime:
         return res
 
     @staticmethod
-    def reorder(params, type):
+    def prune(params, layout: ply.Layout, minOpacity: float = None, maxSplats: int = None, dropDegenerate: bool = False,
+              floaters=None):
+        """
+        与 Kernel_3dgs.prune 相同，透明度不考虑时间上的衰减。
+        """
         xyz, motion1, motion2, motion3, tc, s, ts, q, color = params
+        n = layout.vertexCount
+        indices = utils.pruneIndices(xyz[:n], color[:n, 3], s[:n], [x[:n] for x in params],
+                                     minOpacity, maxSplats, dropDegenerate, floaters)
+        if indices is None:
+            return params
+        if len(indices) == 0:
+            raise ValueError("all splats were pruned")
+
+        params, pruned = Kernel_spacetime.subset(params, layout, indices)
+        layout.vertexCount, layout.pointCount = pruned.vertexCount, pruned.pointCount
+        return params
+
+    @staticmethod
+    def subset(params, layout: ply.Layout, indices: np.ndarray) -> tuple:
+        """
+        与 Kernel_3dgs.subset 相同。
+        """
+        params = utils.gatherPadded(params, indices, ply.CHUNK_SIZE)
+        params[8][len(indices):, 3] = utils.sigmoid(np.float32(-70))  # small opacity for padded splats
+        layout = copy.copy(layout)
+        layout.vertexCount = len(indices)
+        layout.pointCount = params[0].shape[0]
+        return params, layout
+
+    @staticmethod
+    def splatRows(params) -> np.ndarray:
+        """
+        与 Kernel_3dgs.splatRows 相同。
+        """
+        return np.flatnonzero(params[8][:, 3] != utils.sigmoid(np.float32(-70)))
 
-        xyzt = np.concatenate([xyz, tc], axis=1).copy()
+    @staticmethod
+    def tileBounds(params, layout: ply.Layout) -> tuple:
+        """
+        与 Kernel_3dgs.tileBounds 相同，只考虑 tc 时刻的位置，不包含运动的范围。
+        """
+        n = layout.vertexCount
+        return utils.splatBounds(params[0][:n], params[5][:n])
 
+    @staticmethod
+    def sortIndices(params, type, workers: int = None) -> np.ndarray:
+        """
+        按 type 曲线排序的排列，reorder 使用。
+        """
         # use time as the fourth dimension may even make results worse
         # use 3dgs methods for now before more tests
-        if type == 'Morton':
-            sort_indices = Kernel_3dgs.z_order_sort(xyz)
-        elif type == 'Hilbert':
-            sort_indices = Kernel_3dgs.hilbert_curve_sort(xyz)
+        return Kernel_3dgs.sortIndices(params, type, workers)
+
+    @staticmethod
+    def reorder(params, type, layout: ply.Layout, workers: int = None, sort_indices: np.ndarray = None):
+        """
+        sort_indices: 已知的排列（例如来自缓存），缺省时由 sortIndices 计算。
+        """
+        xyz, motion1, motion2, motion3, tc, s, ts, q, color = params
+
+        if sort_indices is None:
+            sort_indices = Kernel_spacetime.sortIndices(params, type, workers)
         
         xyz = xyz[sort_indices]
         motion1 = motion1[sort_indices]
@@ -156,6 +250,14 @@ class Kernel_spacetime:
         color = color[sort_indices]
         return xyz, motion1, motion2, motion3, tc, s, ts, q, color
     
+    @staticmethod
+    def waveChunks(params: tuple, waves: int) -> list:
+        """
+        与 Kernel_3dgs.waveChunks 相同，透明度不考虑时间上的衰减。
+        """
+        s, color = params[5], params[8]
+        return utils.waveChunks(color[:, 3], s, waves, ply.CHUNK_SIZE)
+
     @staticmethod
     def z_order_sort(xyzt: np.ndarray, time_weight: float = 1.0) -> np.ndarray:
         """
@@ -216,7 +318,7 @@ class Kernel_spacetime:
         return sort_indices
 
     @staticmethod
-    def hilbert_curve_sort(xyzt: np.ndarray, time_weight: float = 1.0) -> np.ndarray:
+    def hilbert_curve_sort(xyzt: np.ndarray, time_weight: float = 1.0, bits: int = 16) -> np.ndarray:
         """
         沿希尔伯特曲线对4D点（xyzt）进行排序。
 
@@ -227,12 +329,16 @@ class Kernel_spacetime:
             xyzt: 一个形状为 (N, 4) 的numpy数组，代表xyzt坐标。
             time_weight: 一个浮点数，用于调整时间维度在排序中的权重。
                          大于1会增加时间的重要性，小于1会降低其重要性。
+            bits: 每个维度的比特数，4维时最大为16。
 
         Returns:
             一个形状为 (N,) 的numpy数组，包含可以对原始点数组进行排序的索引。
         """
         start_time = time.time()
 
+        if not (1 <= bits <= 16):
+            raise ValueError("bits of 4D hilbert curve must be in [1, 16]")
+
         # --- 步骤 A: 加权、归一化和量化 ---
         # 【修改】创建一个点的副本以进行加权
         xyzt_weighted = xyzt.copy()
@@ -246,14 +352,11 @@ class Kernel_spacetime:
 
         normalized_xyzt = (xyzt_weighted - min_coords) / scale
 
-        p = 16 
-        n = 4 
-        max_int_val = (1 << p) - 1
+        max_int_val = (1 << bits) - 1
         int_coords = (normalized_xyzt * max_int_val).astype(np.uint64)
 
         # --- 步骤 B: 计算希尔伯特曲线距离 ---
-        hilbert_curve = HilbertCurve(p, n)
-        hilbert_distances = hilbert_curve.distances_from_points(int_coords)
+        hilbert_distances = utils.hilbert_distances(int_coords, bits)
 
         # --- 步骤 C: 排序 ---
         sort_indices = np.argsort(hilbert_distances)
@@ -264,378 +367,74 @@ class Kernel_spacetime:
         return sort_indices
     
     @staticmethod
-    def toGLB(params, pointCount, name):
-        chunk_size = 256
-        num_chunks = pointCount // chunk_size
-
-        descriptors, metadata = Kernel_spacetime.prepareForGLB(params)
-        texData_len = len(metadata)
-        gltf = GLTF2()
-
-        # 2. 创建一个 Buffer 和一个 Sampler
-        gltf.buffers.append(Buffer(byteLength=texData_len))
-        gltf.samplers.append(Sampler(magFilter=NEAREST, minFilter=NEAREST))
-
-        # 3. 为每个数据块创建 Image 和 Texture
-        texture_indices = {}
-
-        for key, descriptor in descriptors.items():
-            buffer_view = BufferView(buffer=0, byteOffset=descriptor['offset'], byteLength=descriptor['size'])
-            buffer_view_index = len(gltf.bufferViews)
-            gltf.bufferViews.append(buffer_view)
-
-            image = Image(
-                bufferView=buffer_view_index,
-                mimeType="image/vnd.custom-raw",
-                extras={
-                    "name": key,
-                    "format": descriptor['format'],
-                    "width": descriptor['width'],
-                    "height": descriptor['height']
-                }
-            )
-            image_index = len(gltf.images)
-            gltf.images.append(image)
-
-            texture = Texture(sampler=0, source=image_index)
-            texture_index = len(gltf.textures)
-            gltf.textures.append(texture)
-            texture_indices[key] = texture_index
-
-        # 4. 创建一个虚拟材质，并在 extras 中存储纹理映射
-        material = Material(
-            pbrMetallicRoughness=PbrMetallicRoughness(baseColorFactor=[1.0, 1.0, 1.0, 1.0]),
-            extras={"dataTextures": texture_indices}
-        )
-        gltf.materials.append(material)
-
-        # 5. 创建一个占位符 Mesh, Node, 和 Scene
-        placeholder_pos = np.array([[0,0,0]], dtype="float32").tobytes()
-        metadata += placeholder_pos
-
-        gltf.buffers[0].byteLength = len(metadata)
-
-        gltf.bufferViews.append(BufferView(buffer=0, byteOffset=texData_len, byteLength=len(placeholder_pos), target=ARRAY_BUFFER))
-        gltf.accessors.append(Accessor(bufferView=len(gltf.bufferViews)-1, componentType=FLOAT, count=1, type=VEC3, max=[0,0,0], min=[0,0,0]))
-
-        primitive = Primitive(attributes=Attributes(POSITION=0), material=0, mode=POINTS)
-        gltf.meshes.append(Mesh(primitives=[primitive]))
-
-        gltf.nodes.append(Node(
-            mesh=0,
-            matrix=[
-              1, 0, 0, 0,
-              0, 1, 0, 0,
-              0, 0, 1, 0,
-              0, 0, 0, 1
-            ],
-            extras={
-                "gsType": "SPACETIME",
-                "name": name,
-                "num": pointCount,
-                "quality": "medium",
-            }
-        ))
-        gltf.scenes.append(Scene(nodes=[0]))
-
-        # 6. 附加最终的二进制数据
-        gltf.set_binary_blob(metadata)
-
-        return gltf
-
-    @staticmethod
-    def prepareForGLB(params: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]):
-        xyz, motion1, motion2, motion3, tc, s, ts, q, color = params
-        n = xyz.shape[0]
-        chunk_size = 256
-        num_chunks = n // chunk_size
-
-        # xyz, Shape: uint32 (num_chunks, chunk_size, 1)
-        xyz_chunks = xyz.reshape((num_chunks, chunk_size, 3))
-        xyz_min = xyz_chunks.min(axis=1)  # Shape: (num_chunks, 3)
-        xyz_max = xyz_chunks.max(axis=1)  # Shape: (num_chunks, 3)
-        xyz_metadata = np.concatenate((xyz_min, xyz_max), axis=1) # Shape: (num_chunks, 6)
+    def toGLB(params, layout: ply.Layout, name):
+        """
+        Returns:
+            (gltf, textures)，二进制数据不放进 gltf，由 utils.writeGLB 按 textures 的顺序直接写入文件。
+        """
+        descriptors, textures, pages = Kernel_spacetime.prepareForGLB(params, layout)
+        texDataLength = sum(texture.nbytes for texture in textures.values())
+        gltf = utils.buildGLTF(descriptors, texDataLength, Kernel_spacetime.gsType, name, layout.pointCount,
+                               None if pages is None else {"pages": pages})
 
-        xyz_range = xyz_max - xyz_min
-        xyz_range[xyz_range == 0] = 1.0 
-        normalized_xyz = (xyz_chunks - xyz_min[:, np.newaxis, :]) / xyz_range[:, np.newaxis, :]
-
-        quant_x = np.around(normalized_xyz[..., 0:1] * ((1 << 11) - 1)).astype(np.uint32)
-        quant_y = np.around(normalized_xyz[..., 1:2] * ((1 << 10) - 1)).astype(np.uint32)
-        quant_z = np.around(normalized_xyz[..., 2:3] * ((1 << 11) - 1)).astype(np.uint32)
-
-        quantized_xyz = (quant_z << 21) | (quant_y << 11) | quant_x
-
-        # q, Shape: uint8 (num_chunks, chunk_size, 4)
-        q_chunks = q.reshape((num_chunks, chunk_size, 4))
-        q_min = np.array(-1, dtype=np.float32)
-        q_max = np.array( 1, dtype=np.float32)
-
-        normalized_q = (q_chunks - q_min) / (q_max - q_min)
-
-        quantized_q = np.around(normalized_q * ((1 << 8) - 1)).astype(np.uint8)
-
-        # color, Shape: uint8 (num_chunks, chunk_size, 4)
-        color_chunks = color.reshape((num_chunks, chunk_size, 4))
-
-        color_min = color_chunks.min(axis=1)  # Shape: (num_chunks, 4)
-        color_max = color_chunks.max(axis=1)  # Shape: (num_chunks, 4)
-        color_metadata = np.concatenate([
-            np.concatenate([color_min[:, i:i+1], color_max[:, i:i+1]], axis=1) for i in range(4)
-        ], axis=1) # Shape: (num_chunks, 8)
-
-        color_range = color_max - color_min
-        color_range[color_range == 0] = 1.0
-        normalized_color = (color_chunks - color_min[:, np.newaxis, :]) / color_range[:, np.newaxis, :]
-
-        quantized_color = np.around(normalized_color * ((1 << 8) - 1)).astype(np.uint8)
-
-        # s, Shape: uint8 (num_chunks, chunk_size, 3)
-        s_chunks = np.sqrt(s.reshape((num_chunks, chunk_size, 3)))
-        s_min = s_chunks.min(axis=(1, 2)) # Shape: (num_chunks,)
-        s_max = s_chunks.max(axis=(1, 2)) # Shape: (num_chunks,)
-        s_metadata = np.stack((s_min, s_max), axis=1) # Shape: (num_chunks, 2)
-
-        s_range = s_max - s_min
-        s_range[s_range == 0] = 1.0
-        normalized_s = (s_chunks - s_min[:, np.newaxis, np.newaxis]) / s_range[:, np.newaxis, np.newaxis]
-
-        quantized_s = np.around(normalized_s * ((1 << 8) - 1)).astype(np.uint8)
-
-        # motion1, Shape: uint8 (num_chunks, chunk_size, 3)
-        motion1_chunks = motion1.reshape((num_chunks, chunk_size, 3))
-        motion1_min = motion1_chunks.min(axis=(1, 2)) # Shape: (num_chunks,)
-        motion1_max = motion1_chunks.max(axis=(1, 2)) # Shape: (num_chunks,)
-        motion1_metadata = np.stack((motion1_min, motion1_max), axis=1) # Shape: (num_chunks, 2)
-
-        motion1_range = motion1_max - motion1_min
-        motion1_range[motion1_range == 0] = 1.0
-        normalized_motion1 = (motion1_chunks - motion1_min[:, np.newaxis, np.newaxis]) / motion1_range[:, np.newaxis, np.newaxis]
-
-        quantized_motion1 = np.around(normalized_motion1 * ((1 << 8) - 1)).astype(np.uint8)
-
-        # motion2, Shape: uint8 (num_chunks, chunk_size, 3)
-        motion2_chunks = motion2.reshape((num_chunks, chunk_size, 3))
-        motion2_min = motion2_chunks.min(axis=(1, 2)) # Shape: (num_chunks,)
-        motion2_max = motion2_chunks.max(axis=(1, 2)) # Shape: (num_chunks,)
-        motion2_metadata = np.stack((motion2_min, motion2_max), axis=1) # Shape: (num_chunks, 2)
-
-        motion2_range = motion2_max - motion2_min
-        motion2_range[motion2_range == 0] = 1.0
-        normalized_motion2 = (motion2_chunks - motion2_min[:, np.newaxis, np.newaxis]) / motion2_range[:, np.newaxis, np.newaxis]
-
-        quantized_motion2 = np.around(normalized_motion2 * ((1 << 8) - 1)).astype(np.uint8)
-
-        # motion3, Shape: uint8 (num_chunks, chunk_size, 3)
-        motion3_chunks = motion3.reshape((num_chunks, chunk_size, 3))
-        motion3_min = motion3_chunks.min(axis=(1, 2)) # Shape: (num_chunks,)
-        motion3_max = motion3_chunks.max(axis=(1, 2)) # Shape: (num_chunks,)
-        motion3_metadata = np.stack((motion3_min, motion3_max), axis=1) # Shape: (num_chunks, 2)
-
-        motion3_range = motion3_max - motion3_min
-        motion3_range[motion3_range == 0] = 1.0
-        normalized_motion3 = (motion3_chunks - motion3_min[:, np.newaxis, np.newaxis]) / motion3_range[:, np.newaxis, np.newaxis]
-
-        quantized_motion3 = np.around(normalized_motion3 * ((1 << 8) - 1)).astype(np.uint8)
-
-        # tc_ts
-        tc_ts = np.concatenate([tc, ts], axis=1).reshape((num_chunks, chunk_size, 2))
-        quantized_tc_ts = tc_ts.astype(np.float16).view(np.uint8)
-
-        # other
-        quantized_other = np.concatenate([quantized_motion1, quantized_s[:, :, 0:1], 
-                                          quantized_motion2, quantized_s[:, :, 1:2], 
-                                          quantized_motion3, quantized_s[:, :, 2:3], 
-                                          quantized_tc_ts], axis=-1).view(np.uint32)
-
-        # range, Shape: uint32 (num_chunks, 1, 12)
-        quantized_range = np.concatenate((xyz_metadata, s_metadata, 
-                                          motion1_metadata, motion2_metadata, motion3_metadata,
-                                          np.zeros_like(motion1_metadata),
-                                          color_metadata[:, :6],
-                                          np.zeros_like(motion1_metadata)), axis=-1).astype(np.float16).view(np.uint32)
-        quantized_range = quantized_range.reshape([num_chunks, 1, -1])
-
-        # declare the textures
-        quantized_params = {
-            'xyz': quantized_xyz,
-            'q': quantized_q,
-            'color': quantized_color,
-            'other': quantized_other,
-            'range': quantized_range,
-        }
-
-        texture_formats = {
-            'xyz': 'R32UI', 
-            'q': 'RGBA8', 
-            'color': 'RGBA8',
-            'other': 'RGBA32UI', 
-            'range': 'RGBA32UI'
-        }
-
-        # hilbert reorder for 16*16 texel region
-        hilbert_order = Kernel_spacetime.generate_hilbert_array(16).flatten()
-        for key in quantized_params.keys():
-            quantized_param = quantized_params[key]
-            if quantized_param.shape[1] == 256:
-                quantized_params[key] = quantized_param[:, hilbert_order, :]
-
-        # pad for textures
-        chunkWidth, chunkHeight = utils.compute_tex_size(num_chunks, True)
-        num_pad = chunkHeight * chunkWidth - num_chunks
-        if num_pad > 0:
-            for key in quantized_params.keys():
-                quantized_param = quantized_params[key]
-                shape = quantized_param.shape
-                zeros = np.zeros([num_pad, shape[1], shape[2]], dtype=quantized_param.dtype)
-                quantized_params[key] = np.concatenate([quantized_param, zeros], axis=0)
-
-        # memory reorder for 16*16 texel region
-        for key in quantized_params.keys():
-            quantized_param = quantized_params[key]
-            localHeight = localWidth = math.isqrt(quantized_param.shape[1])
-            quantized_param = quantized_param.reshape([chunkHeight, chunkWidth, localHeight, localWidth, -1])
-            quantized_param = quantized_param.transpose(0, 2, 1, 3, 4)
-            quantized_param = quantized_param.reshape([chunkHeight * localHeight, chunkWidth * localWidth, -1])
-            quantized_params[key] = quantized_param
-
-        # create descriptors and metadata
-        # special for u_range
-        quantized_params['range'] = quantized_params['range'].reshape((chunkHeight, -1, 4))
-        metadata = b""
-        descriptors = {}
-        offset = 0
-        bind = 0
-        for key, quantized_param in quantized_params.items():
-            size = quantized_param.nbytes
-            texture_name = "u_" + key
-            descriptor = {
-                "offset": offset,
-                "size": size,
-                "width": quantized_param.shape[1],
-                "height": quantized_param.shape[0],
-                "format": texture_formats[key],
-                "bind": bind,
-            }
-            bind += 1
-            offset += size
-            metadata += quantized_param.tobytes()
-            descriptors[texture_name] = descriptor
-        
-        return descriptors, metadata
+        return gltf, list(textures.values())
 
     @staticmethod
-    def generate_hilbert_array(size: int) -> np.ndarray:
+    def quantize(params: tuple, layout: ply.Layout):
         """
-        生成一个按希尔伯特曲线顺序填充的2维 NumPy 数组。
-
-        Args:
-            size (int): 数组的边长，必须是2的幂 (e.g., 4, 8, 16, 32)。
+        按 QUANTIZE_SCHEMA 逐 chunk 量化，params 的点数须为 chunk 大小的整数倍。
+        另外写入每个 chunk 的活跃时间区间 u_timeRange，见 timeRanges。
 
         Returns:
-            np.ndarray: 一个 (size, size) 的数组，其值表示希尔伯特曲线的访问顺序。
+            (quantized_params, texture_formats)，quantized_params 中每项形状为
+            (num_chunks, 256 或 1, channels)。
         """
-        if size <= 0 or (size & (size - 1)) != 0:
-            raise ValueError("Size 必须是 2 的正整数次幂。")
-
-        hilbert_array = np.zeros((size, size), dtype=np.int32)
-
-        def _d2xy(d: int, n: int) -> tuple[int, int]:
-            """
-            将一维希尔伯特距离 d 转换为二维坐标 (x, y)。
-            n 是网格的阶数 (size = 2**n)。
-            """
-            x, y = 0, 0
-            s = 1
-            while s < n:
-                rx = 1 & (d >> 1)
-                ry = 1 & (d ^ rx)
-
-                # 旋转和翻转子方块
-                if ry == 0:
-                    if rx == 1:
-                        x = s - 1 - x
-                        y = s - 1 - y
-                    x, y = y, x
-
-                x += s * rx
-                y += s * ry
-                d >>= 2
-                s <<= 1
-            return x, y
-
-        total_points = size * size
-        for i in range(total_points):
-            # 注意：这里 n 是 size，不是阶数
-            x, y = _d2xy(i, size)
-            hilbert_array[y, x] = i
-
-        return hilbert_array
-    
+        quantized_params, texture_formats = quantization.quantize(params, QUANTIZE_SCHEMA)
+        quantized_params['timeRange'] = Kernel_spacetime.timeRanges(params)
+        texture_formats['timeRange'] = 'RGBA32UI'
+        return quantized_params, texture_formats
+
     @staticmethod
-    def analyze_point_blocks(points: np.ndarray, block_size: int = 256):
+    def timeRanges(params: tuple, threshold: float = VISIBILITY_THRESHOLD) -> np.ndarray:
         """
-        分析已分组的点云，统计组内的距离特性。
+        每个 chunk 中有点可见的时间区间 [start, end]：点的不透明度为 opacity × exp(-ts (t - tc)^2)，
+        不低于 threshold 的时间为 tc ± sqrt(ln(opacity / threshold) / ts)，chunk 的区间包含其中所有点的区间。
+        tc、ts 使用写入文件的 float16 值，float32 的区间向外取整，渲染时 t 不在区间内的 chunk 可以整个跳过。
+        没有点可见的 chunk（例如只有补齐的点）为 [inf, -inf]，ts 为 0 的点在任何时间都可见。
 
-        Args:
-            points: 已排序和分组的点云，形状为 (N, 3)。
-            block_size: 每个分组的大小。
+        Returns:
+            (num_chunks, 1, 4) uint32，每个 chunk 一个 RGBA32UI 纹素：start 和 end 的 float32 位，其余两个通道为 0。
         """
-        start_time = time.time()
-
-        n_points = len(points)
-        num_blocks = (n_points + block_size - 1) // block_size
-
-        threshold_distance = np.sqrt(3)
-
-        # 用于存储每个块的最大内部距离
-        all_max_distances = []
-
-        # 遍历每个块
-        for i in range(num_blocks):
-            start_idx = i * block_size
-            end_idx = min((i + 1) * block_size, n_points)
+        tc = params[4][:, 0].astype(np.float16).astype(np.float64)
+        ts = params[6][:, 0].astype(np.float16).astype(np.float64)
+        opacity = params[8][:, 3].astype(np.float64)
+        visible = opacity >= threshold
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            width = np.sqrt(np.log(np.maximum(opacity, threshold) / threshold) / ts)
+        width[ts <= 0] = np.inf
+        start = np.where(visible, tc - width, np.inf).reshape([-1, ply.CHUNK_SIZE]).min(axis=1)
+        end = np.where(visible, tc + width, -np.inf).reshape([-1, ply.CHUNK_SIZE]).max(axis=1)
+
+        start32, end32 = start.astype(np.float32), end.astype(np.float32)
+        start32 = np.where(start32 > start, np.nextafter(start32, np.float32(-np.inf)), start32)
+        end32 = np.where(end32 < end, np.nextafter(end32, np.float32(np.inf)), end32)
+
+        texels = np.zeros((start.shape[0], 1, 4), dtype=np.uint32)
+        texels[:, 0, 0] = start32.view(np.uint32)
+        texels[:, 0, 1] = end32.view(np.uint32)
+        return texels
 
-            current_block = points[start_idx:end_idx]
+    @staticmethod
+    def prepareForGLB(params: tuple, layout: ply.Layout):
+        """
+        量化并按页排布 chunk 纹理，见 utils.layoutPages。
 
-            # 如果块内少于2个点，则无法计算距离
-            if len(current_block) < 2:
-                all_max_distances.append(0)
-                continue
-            
-            # 使用 pdist 高效计算块内所有点对的距离
-            # pdist 返回一个压缩后的一维距离矩阵
-            pairwise_distances = pdist(current_block, metric='euclidean')
-
-            # 找到这个块内的最大距离
-            max_dist_in_block = np.max(pairwise_distances)
-            all_max_distances.append(max_dist_in_block)
-
-        all_max_distances = np.array(all_max_distances)
-
-        # --- 开始统计 ---
-        # 1. 有多少个组
-        total_blocks_found = len(all_max_distances)
-
-        # 2. 组内最大距离小于 sqrt(3) 的组的数量和百分比
-        compact_blocks_count = np.sum(all_max_distances < threshold_distance)
-        percentage_compact = (compact_blocks_count / total_blocks_found) * 100 if total_blocks_found > 0 else 0
-
-        # 3. 组内最大距离的最大值
-        overall_max_distance = np.max(all_max_distances) if total_blocks_found > 0 else 0
-
-        analysis_time = time.time() - start_time
-        print(f"Analysis done, using {analysis_time:.2f}s")
-        print("-" * 25)
-        print(f"point num: {n_points:,}")
-        print(f"chunk size: {block_size}")
-        print(f"chunk num: {total_blocks_found}")
-        print("-" * 25)
-        print(f"compact threshold: sqrt(3) ≈ {threshold_distance:.4f}")
-        print(f"compact chunk num: {compact_blocks_count} / {total_blocks_found}")
-        print(f"compact chunk percentage: {percentage_compact:.2f}%")
-        print("-" * 25)
-        print(f"max radius of chunk: {overall_max_distance:.4f}\n")
+        Returns:
+            (descriptors, textures, pages)，只有一页时 pages 为 None。
+        """
+        quantized_params, texture_formats = Kernel_spacetime.quantize(params, layout)
+        return utils.layoutPages(quantized_params, texture_formats, layout.pointCount // ply.CHUNK_SIZE)
 
     @staticmethod
     def visualize_with_pyvista(params: tuple):
@@ -667,6 +466,10 @@ class Kernel_spacetime:
         print("Creating visualization with PyVista...")
         colors = utils.create_block_colors_high_contrast(xyz_.shape[0], 256)
 
+        # visualization only dependencies, keyboard needs root and an input device on linux
+        import pyvista as pv
+        import keyboard
+
         plotter = pv.Plotter(window_size=[1280, 720])
         pv.set_plot_theme("dark")
 
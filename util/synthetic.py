@@ -0,0 +1,132 @@
+import numpy as np
+import argparse
+from . import threeD
+from . import spacetime
+
+# 生成的场景按块写入，峰值内存与点数无关
+ROWS_PER_BLOCK = 1 << 20
+CLUSTERS = 64
+FLOATER_FRACTION = 0.15
+SCENE_EXTENT = 10.0
+FLOATER_EXTENT = 100.0
+
+KINDS = {
+    '3dgs': threeD.PROPERTIES,
+    'spacetime': spacetime.PROPERTIES,
+}
+DISTRIBUTIONS = ('uniform', 'clustered', 'floaters')
+
+
+def parseCount(text: str) -> int:
+    """
+    '100K' / '1M' / '10M' / '12345' -> 点数。
+    """
+    text = text.strip().upper()
+    scale = {'K': 10**3, 'M': 10**6}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+def clusters(seed: int = 0):
+    """
+    团簇中心和半径，在整个文件中共享。
+    """
+    rng = np.random.default_rng([seed, 0])
+    centers = rng.uniform(-SCENE_EXTENT, SCENE_EXTENT, size=(CLUSTERS, 3))
+    sigmas = rng.uniform(0.1, 1.0, size=CLUSTERS)
+    return centers, sigmas
+
+def positions(rng: np.random.Generator, centers: np.ndarray, sigmas: np.ndarray, count: int, distribution: str):
+    """
+    生成位置和每个点是否为 floater。
+
+    uniform: 均匀分布在 [-SCENE_EXTENT, SCENE_EXTENT]^3；
+    clustered: CLUSTERS 个各向同性的高斯团簇；
+    floaters: 与 clustered 相同，另有 FLOATER_FRACTION 的点稀疏地散布在 FLOATER_EXTENT 范围内。
+    """
+    floaters = np.zeros(count, dtype=bool)
+    if distribution == 'uniform':
+        return rng.uniform(-SCENE_EXTENT, SCENE_EXTENT, size=(count, 3)), floaters
+
+    cluster = rng.integers(0, len(centers), size=count)
+    xyz = centers[cluster] + rng.normal(size=(count, 3)) * sigmas[cluster, np.newaxis]
+    if distribution == 'floaters':
+        floaters = rng.random(count) < FLOATER_FRACTION
+        xyz[floaters] = rng.uniform(-FLOATER_EXTENT, FLOATER_EXTENT, size=(int(floaters.sum()), 3))
+    return xyz, floaters
+
+def generate(path: str, count: int, kind: str = '3dgs', distribution: str = 'uniform', seed: int = 0):
+    """
+    写入一个可以被 Scene 读取的 binary_little_endian ply。
+    同样的参数总是生成完全相同的文件。
+
+    Args:
+        path: 输出路径。
+        count: 高斯点数量。
+        kind: '3dgs' 或 'spacetime'，属性与对应 Kernel 的 PROPERTIES 一致。
+        distribution: DISTRIBUTIONS 之一。
+        seed: 随机种子。
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown gaussian kind: {kind}")
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"unknown distribution: {distribution}")
+
+    properties = KINDS[kind]
+    columns = {name: i for i, name in enumerate(properties)}
+    dtype = np.dtype([(name, '<f4') for name in properties])
+
+    # 每块使用独立的随机流
+    centers, sigmas = clusters(seed)
+
+    header = "ply\nformat binary_little_endian 1.0\n"
+    header += f"element vertex {count}\n"
+    header += "".join(f"property float {name}\n" for name in properties)
+    header += "end_header\n"
+
+    with open(path, 'wb') as file:
+        file.write(header.encode('utf-8'))
+        for block, start in enumerate(range(0, count, ROWS_PER_BLOCK)):
+            rows = min(ROWS_PER_BLOCK, count - start)
+            rng = np.random.default_rng([seed, block + 1])
+            data = np.zeros((rows, len(properties)), dtype=np.float32)
+
+            def fill(names, values):
+                data[:, [columns[name] for name in names]] = values
+
+            xyz, floaters = positions(rng, centers, sigmas, rows, distribution)
+            fill(['x', 'y', 'z'], xyz)
+            fill(['f_dc_0', 'f_dc_1', 'f_dc_2'], rng.normal(0.0, 0.8, size=(rows, 3)))
+            fill(['rot_0', 'rot_1', 'rot_2', 'rot_3'], rng.normal(size=(rows, 4)))
+
+            # floater 通常透明度低而尺寸大
+            opacity = rng.normal(1.0, 1.5, size=rows)
+            opacity[floaters] = rng.normal(-3.0, 1.0, size=int(floaters.sum()))
+            fill(['opacity'], opacity[:, np.newaxis])
+            scale = rng.normal(-4.0, 0.5, size=(rows, 3))
+            scale[floaters] += 3.0
+            fill(['scale_0', 'scale_1', 'scale_2'], scale)
+
+            if kind == '3dgs':
+                fill([f'f_rest_{i}' for i in range(45)], rng.normal(0.0, 0.05, size=(rows, 45)))
+            else:
+                fill(['trbf_center'], rng.random((rows, 1)))
+                fill(['trbf_scale'], rng.normal(-2.0, 0.5, size=(rows, 1)))
+                fill([f'motion_{i}' for i in range(9)], rng.normal(0.0, 0.1, size=(rows, 9)))
+                fill([f'omega_{i}' for i in range(4)], rng.normal(0.0, 0.1, size=(rows, 4)))
+
+            data.view(dtype).tofile(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="write a seeded synthetic gaussian scene as ply")
+    parser.add_argument("-o", "--output", dest="output", type=str, required=True, help="output ply path")
+    parser.add_argument("-n", "--count", dest="count", type=str, default="100K", help="number of splats, e.g. 100K, 1M")
+    parser.add_argument("-k", "--kind", dest="kind", choices=list(KINDS), default='3dgs', help="gaussian kind")
+    parser.add_argument("-d", "--distribution", dest="distribution", choices=DISTRIBUTIONS, default='uniform',
+                        help="spatial distribution")
+    parser.add_argument("-s", "--seed", dest="seed", type=int, default=0, help="random seed")
+    args = parser.parse_args(argv)
+
+    generate(args.output, parseCount(args.count), args.kind, args.distribution, args.seed)
+
+if __name__ == "__main__":
+    main()
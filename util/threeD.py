@@ -1,124 +1,152 @@
 from enum import IntEnum, auto
 import numpy as np
 import struct
-import utils as utils
+from . import utils
+from . import ply
+from . import quantization
+from . import sorting
+from . import accel
+from . import vq
+from .quantization import Attribute, Texture
 import time
-from hilbertcurve.hilbertcurve import HilbertCurve
-from pygltflib import *
 import math
-import pyvista as pv
-from scipy.spatial.distance import pdist
-
-P = {
-    'x': -1,
-    'y': -1,
-    'z': -1,
-    'nx': -1,
-    'ny': -1,
-    'nz': -1,
-    'f_dc_0': -1,
-    'f_dc_1': -1,
-    'f_dc_2': -1,
-    'f_rest_0': -1,
-    'f_rest_1': -1,
-    'f_rest_2': -1,
-    'f_rest_3': -1,
-    'f_rest_4': -1,
-    'f_rest_5': -1,
-    'f_rest_6': -1,
-    'f_rest_7': -1,
-    'f_rest_8': -1,
-    'f_rest_9': -1,
-    'f_rest_10': -1,
-    'f_rest_11': -1,
-    'f_rest_12': -1,
-    'f_rest_13': -1,
-    'f_rest_14': -1,
-    'f_rest_15': -1,
-    'f_rest_16': -1,
-    'f_rest_17': -1,
-    'f_rest_18': -1,
-    'f_rest_19': -1,
-    'f_rest_20': -1,
-    'f_rest_21': -1,
-    'f_rest_22': -1,
-    'f_rest_23': -1,
-    'f_rest_24': -1,
-    'f_rest_25': -1,
-    'f_rest_26': -1,
-    'f_rest_27': -1,
-    'f_rest_28': -1,
-    'f_rest_29': -1,
-    'f_rest_30': -1,
-    'f_rest_31': -1,
-    'f_rest_32': -1,
-    'f_rest_33': -1,
-    'f_rest_34': -1,
-    'f_rest_35': -1,
-    'f_rest_36': -1,
-    'f_rest_37': -1,
-    'f_rest_38': -1,
-    'f_rest_39': -1,
-    'f_rest_40': -1,
-    'f_rest_41': -1,
-    'f_rest_42': -1,
-    'f_rest_43': -1,
-    'f_rest_44': -1,
-    'opacity': -1,
-    'scale_0': -1,
-    'scale_1': -1,
-    'scale_2': -1,
-    'rot_0': -1,
-    'rot_1': -1,
-    'rot_2': -1,
-    'rot_3': -1,
-    'total': -1,
-}
+import copy
+
+# properties a file of this kind may contain, the per-file column layout
+# is built by identify() and passed along with the params
+PROPERTIES = (
+    'x',
+    'y',
+    'z',
+    'nx',
+    'ny',
+    'nz',
+    'f_dc_0',
+    'f_dc_1',
+    'f_dc_2',
+    'f_rest_0',
+    'f_rest_1',
+    'f_rest_2',
+    'f_rest_3',
+    'f_rest_4',
+    'f_rest_5',
+    'f_rest_6',
+    'f_rest_7',
+    'f_rest_8',
+    'f_rest_9',
+    'f_rest_10',
+    'f_rest_11',
+    'f_rest_12',
+    'f_rest_13',
+    'f_rest_14',
+    'f_rest_15',
+    'f_rest_16',
+    'f_rest_17',
+    'f_rest_18',
+    'f_rest_19',
+    'f_rest_20',
+    'f_rest_21',
+    'f_rest_22',
+    'f_rest_23',
+    'f_rest_24',
+    'f_rest_25',
+    'f_rest_26',
+    'f_rest_27',
+    'f_rest_28',
+    'f_rest_29',
+    'f_rest_30',
+    'f_rest_31',
+    'f_rest_32',
+    'f_rest_33',
+    'f_rest_34',
+    'f_rest_35',
+    'f_rest_36',
+    'f_rest_37',
+    'f_rest_38',
+    'f_rest_39',
+    'f_rest_40',
+    'f_rest_41',
+    'f_rest_42',
+    'f_rest_43',
+    'f_rest_44',
+    'opacity',
+    'scale_0',
+    'scale_1',
+    'scale_2',
+    'rot_0',
+    'rot_1',
+    'rot_2',
+    'rot_3',
+)
 
 SH_C0 = 0.28209479177387814
 
+REQUIRED = ['x', 'y', 'z', 'f_dc_0', 'f_dc_1', 'f_dc_2', 'opacity',
+            'scale_0', 'scale_1', 'scale_2', 'rot_0', 'rot_1', 'rot_2', 'rot_3']
+
+# f_rest_* is stored channel by channel (15 R, 15 G, 15 B coefficients),
+# each band is regrouped as interleaved rgb
+SH_D1 = [f'f_rest_{i + 15 * c}' for i in range(0, 3) for c in range(3)]
+SH_D2 = [f'f_rest_{i + 15 * c}' for i in range(3, 8) for c in range(3)]
+SH_D3 = [f'f_rest_{i + 15 * c}' for i in range(8, 15) for c in range(3)]
+
+# params: xyz, s, q, color
+# u_range per chunk (float16): xyz min/max, s min/max, rgb min/max interleaved, 2 zeros
+QUANTIZE_SCHEMA = quantization.Schema(
+    attributes={
+        'xyz': Attribute(0, 3, bits=(11, 10, 11)),
+        's': Attribute(1, 3, mode='shared', transform=np.sqrt),
+        'q': Attribute(2, 4, mode='fixed', fixedRange=(-1, 1)),
+        'color': Attribute(3, 4, rangeOrder='interleaved', rangeChannels=3),
+    },
+    textures={
+        'xyz': Texture('R32UI', [('xyz', [0, 1, 2])], packing='bits'),
+        'q': Texture('RGBA8', [('q', [0, 1, 2, 3])]),
+        'color': Texture('RGBA8', [('color', [0, 1, 2, 3])]),
+        's': Texture('RGB8', [('s', [0, 1, 2])]),
+    },
+    range=['xyz', 's', 'color', 2],
+)
+
 class Kernel_3dgs:
+    gsType = "ThreeD"
+    # getParams 可以读取 1-3 阶球谐系数
+    shExport = True
+    # 可以用 buildLOD 生成多级细节
+    lodExport = True
 
     @staticmethod
-    def identify(headerLines: str):
-        for key in P:
-            P[key] = -1
-        cnter = 0
-        for line in headerLines:
-            if line[0] == 'property' and line[1] == 'float':
-                key = line[2]
-                if key in P:
-                    P[key] = cnter
-                    cnter = cnter + 1
-                else:
-                    return False
-        P['total'] = cnter
-        return True
+    def identify(header: ply.PlyHeader):
+        for key in header.propertyNames:
+            if key not in PROPERTIES:
+                return None
+        layout = ply.Layout(header.propertyNames, header.vertexCount)
+        return layout if layout.has(REQUIRED) else None
     
     @staticmethod
-    def getParams(data: bytes):
-        ply = np.frombuffer(data, dtype=np.float32).reshape([-1, P['total']])
-        ply = utils.alignTo256(ply, P['opacity'], 256)
-
-        xyz = ply[:, P['x']:P['z'] + 1]
-        s = ply[:, P['scale_0']:P['scale_2'] + 1]
-        q = ply[:, [P['rot_1'], P['rot_2'], P['rot_3'], P['rot_0']]]
-        color = ply[:, [P['f_dc_0'], P['f_dc_1'], P['f_dc_2'], P['opacity']]]
-        d1 = ply[:, [P['f_rest_0'],  P['f_rest_15'], P['f_rest_30'], 
-                     P['f_rest_1'],  P['f_rest_16'], P['f_rest_31'], 
-                     P['f_rest_2'],  P['f_rest_17'], P['f_rest_32']]]
-        d2 = ply[:, [P['f_rest_3'],  P['f_rest_18'], P['f_rest_33'], 
-                     P['f_rest_4'],  P['f_rest_19'], P['f_rest_34'], 
-                     P['f_rest_5'],  P['f_rest_20'], P['f_rest_35'],
-                     P['f_rest_6'],  P['f_rest_21'], P['f_rest_36'], 
-                     P['f_rest_7'],  P['f_rest_22'], P['f_rest_37']]]
-        d3 = ply[:, [P['f_rest_8'],  P['f_rest_23'], P['f_rest_38'], 
-                     P['f_rest_9'],  P['f_rest_24'], P['f_rest_39'], 
-                     P['f_rest_10'], P['f_rest_25'], P['f_rest_40'],
-                     P['f_rest_11'], P['f_rest_26'], P['f_rest_41'],
-                     P['f_rest_12'], P['f_rest_27'], P['f_rest_42'],
-                     P['f_rest_13'], P['f_rest_28'], P['f_rest_43'], 
-                     P['f_rest_14'], P['f_rest_29'], P['f_rest_44']]]
+    def getParams(vertices: np.ndarray, layout: ply.Layout, exportSH: bool = False, rows: int = None):
+        # only the columns we need are read from the memory-mapped file,
+        # nx/ny/nz are never touched and f_rest_* only when SH is exported.
+        # rows defaults to layout.pointCount, pass it when reading a slice of vertices
+        n = vertices.shape[0]
+        rows = layout.pointCount if rows is None else rows
+        layout.hasSH = exportSH and layout.has(SH_D1 + SH_D2 + SH_D3)
+        groups = [
+            ['x', 'y', 'z'],
+            ['scale_0', 'scale_1', 'scale_2'],
+            ['rot_1', 'rot_2', 'rot_3', 'rot_0'],
+            ['f_dc_0', 'f_dc_1', 'f_dc_2', 'opacity'],
+        ]
+        if layout.hasSH:
+            groups += [SH_D1, SH_D2, SH_D3]
+
+        arrays = ply.readGroups(vertices, groups, rows)
+        for x in arrays:
+            utils.fillPadding(x, n)
+
+        xyz, s, q, color = arrays[:4]
+        d1, d2, d3 = arrays[4:] if layout.hasSH else (None, None, None)
+        color[n:, 3] = -70  # small opacity for padded splats
         
         # rgb value may exceed 1.0, hack: clamp to 6.0
         color[:, 0:3] = np.clip(0.5 + SH_C0 * color[:, 0:3], 0.0, 6.0)
@@ -169,33 +197,112 @@ class Kernel_3dgs:
         return res
 
     @staticmethod
-    def reorder(params, type):
-        xyz, s, q, color, d1, d2, d3 = params
+    def prune(params, layout: ply.Layout, minOpacity: float = None, maxSplats: int = None, dropDegenerate: bool = False,
+              floaters=None):
+        """
+        在排序之前删除透明度过低、退化或离群的高斯点，或按重要性只保留 maxSplats 个，
+        并更新 layout 的点数。规则见 utils.pruneIndices。
+        """
+        xyz, s, q, color = params[:4]
+        n = layout.vertexCount
+        indices = utils.pruneIndices(xyz[:n], color[:n, 3], s[:n], [xyz[:n], s[:n], q[:n], color[:n]],
+                                     minOpacity, maxSplats, dropDegenerate, floaters)
+        if indices is None:
+            return params
+        if len(indices) == 0:
+            raise ValueError("all splats were pruned")
+
+        params, pruned = Kernel_3dgs.subset(params, layout, indices)
+        layout.vertexCount, layout.pointCount = pruned.vertexCount, pruned.pointCount
+        return params
+
+    @staticmethod
+    def subset(params, layout: ply.Layout, indices: np.ndarray) -> tuple:
+        """
+        取出 indices 的点并补齐到 chunk 的整数倍。
 
+        Returns:
+            (params, layout)，layout 为更新了点数的副本。
+        """
+        params = utils.gatherPadded(params, indices, ply.CHUNK_SIZE)
+        params[3][len(indices):, 3] = utils.sigmoid(np.float32(-70))  # small opacity for padded splats
+        layout = copy.copy(layout)
+        layout.vertexCount = len(indices)
+        layout.pointCount = params[0].shape[0]
+        return params, layout
+
+    @staticmethod
+    def splatRows(params) -> np.ndarray:
+        """
+        不是补齐的点的行号。排序后补齐的点混在原来的点之间，按补齐时设置的透明度区分，
+        透明度恰好相同的原有的点也一并排除（它们不可见）。
+        """
+        return np.flatnonzero(params[3][:, 3] != utils.sigmoid(np.float32(-70)))
+
+    @staticmethod
+    def tileBounds(params, layout: ply.Layout) -> tuple:
+        """
+        所有点 3 倍最大轴长范围的包围盒，见 utils.splatBounds。
+        """
+        n = layout.vertexCount
+        return utils.splatBounds(params[0][:n], params[1][:n])
+
+    @staticmethod
+    def sortIndices(params, type, workers: int = None) -> np.ndarray:
+        """
+        按 type 曲线排序的排列，reorder 使用。
+        """
         if type == 'Morton':
-            sort_indices = Kernel_3dgs.z_order_sort(xyz)
+            return Kernel_3dgs.z_order_sort(params[0], workers)
         elif type == 'Hilbert':
-            sort_indices = Kernel_3dgs.hilbert_curve_sort(xyz)
+            return Kernel_3dgs.hilbert_curve_sort(params[0], workers=workers)
+        raise ValueError(f"unknown reorder type: {type}")
+
+    @staticmethod
+    def reorder(params, type, layout: ply.Layout, workers: int = None, sort_indices: np.ndarray = None):
+        """
+        sort_indices: 已知的排列（例如来自缓存），缺省时由 sortIndices 计算。
+        """
+        xyz, s, q, color, d1, d2, d3 = params
+
+        if sort_indices is None:
+            sort_indices = Kernel_3dgs.sortIndices(params, type, workers)
         
         xyz = xyz[sort_indices]
         s = s[sort_indices]
         q = q[sort_indices]
         color = color[sort_indices]
-        d1 = d1[sort_indices]
-        d2 = d2[sort_indices]
-        d3 = d3[sort_indices]
+        if layout.hasSH:
+            d1 = d1[sort_indices]
+            d2 = d2[sort_indices]
+            d3 = d3[sort_indices]
         return xyz, s, q, color, d1, d2, d3
     
     @staticmethod
-    def z_order_sort(points: np.ndarray) -> np.ndarray:
-        start_time = time.time()
+    def bounds(points: np.ndarray):
+        """
+        曲线编码使用的归一化参数：最小坐标和最大边长。
+        """
+        min_coords = points.min(axis=0)
+        max_coords = points.max(axis=0)
+        scale = (max_coords - min_coords).max()
+        return min_coords, scale
 
+    @staticmethod
+    def morton_codes(points: np.ndarray, min_coords: np.ndarray = None, scale: np.ndarray = None) -> np.ndarray:
+        """
+        63 位莫顿码。min_coords / scale 缺省时由 points 计算，分块编码时传入全局值。
+        """
         # --- 步骤 A: 归一化和量化 ---
         # 莫顿编码作用于非负整数，所以我们首先要将浮点坐标映射到整数空间。
         # 我们将点云归一化到一个单位立方体 [0, 1]^3 中。
-        min_coords = points.min(axis=0)
-        max_coords = points.max(axis=0)
-        scale = (max_coords - min_coords).max()
+        if min_coords is None:
+            min_coords, scale = Kernel_3dgs.bounds(points)
+
+        # 可用时使用 numba 内核，结果相同
+        morton_codes = accel.morton_codes(points, min_coords, scale) if accel.enabled(points.shape[0]) else None
+        if morton_codes is not None:
+            return morton_codes
 
         normalized_points = (points - min_coords) / scale
 
@@ -219,10 +326,21 @@ class Kernel_3dgs:
         morton_codes = (spread_bits(int_coords[:, 0]) |
                         (spread_bits(int_coords[:, 1]) << 1) |
                         (spread_bits(int_coords[:, 2]) << 2))
+        return morton_codes
+
+    @staticmethod
+    def z_order_sort(points: np.ndarray, workers: int = None) -> np.ndarray:
+        """
+        workers: 编码和排序使用的线程数，缺省为 CPU 数。相等编码按原顺序排列，结果与线程数无关。
+        """
+        start_time = time.time()
+
+        min_coords, scale = Kernel_3dgs.bounds(points)
+        morton_codes = sorting.encode_keys(Kernel_3dgs.morton_codes, points, min_coords, scale, workers)
         
         # --- 步骤 C: 排序 ---
         # 获取根据莫顿码排序的索引
-        sort_indices = np.argsort(morton_codes)
+        sort_indices = sorting.parallel_argsort(morton_codes, 63, workers)
         
         end_time = time.time()
         print(f"Morton curve sort done, using: {end_time - start_time:.2f}s\n")
@@ -230,33 +348,47 @@ class Kernel_3dgs:
         return sort_indices
 
     @staticmethod
-    def hilbert_curve_sort(points: np.ndarray) -> np.ndarray:
-        start_time = time.time()
-
+    def hilbert_codes(points: np.ndarray, bits: int = 16, min_coords: np.ndarray = None, scale: np.ndarray = None) -> np.ndarray:
+        """
+        3 * bits 位希尔伯特距离。min_coords / scale 缺省时由 points 计算。
+        """
         # --- 步骤 A: 归一化和量化 (与Z曲线版本相同) ---
-        min_coords = points.min(axis=0)
-        max_coords = points.max(axis=0)
-        scale = (max_coords - min_coords).max()
+        if min_coords is None:
+            min_coords, scale = Kernel_3dgs.bounds(points)
+
+        # 定义希尔伯特曲线的精度（每个维度上的比特数）。
+        # bits=16 意味着每个坐标将被映射到 [0, 2^16 - 1] 的整数范围内，最大 21 位。
+        if not (1 <= bits <= 21):
+            raise ValueError("bits of 3D hilbert curve must be in [1, 21]")
+
+        hilbert_distances = accel.hilbert_codes(points, bits, min_coords, scale) if accel.enabled(points.shape[0]) else None
+        if hilbert_distances is not None:
+            return hilbert_distances
 
         normalized_points = (points - min_coords) / scale
 
-        # 定义希尔伯特曲线的精度（每个维度上的比特数）。
-        # p=16 意味着每个坐标将被映射到 [0, 2^16 - 1] 的整数范围内。
-        p = 16 
-        n = 3 # 3个维度
-        max_int_val = (1 << p) - 1
+        max_int_val = (1 << bits) - 1
         int_coords = (normalized_points * max_int_val).astype(np.uint64)
 
         # --- 步骤 B: 计算希尔伯特曲线距离 (一维索引) ---
-        # 1. 创建一个3D、16位精度的希尔伯特曲线对象
-        hilbert_curve = HilbertCurve(p, n)
+        # 查表法，全部为 uint64 数组运算，结果与 hilbertcurve 库一致
+        return utils.hilbert_distances(int_coords, bits)
+
+    @staticmethod
+    def hilbert_curve_sort(points: np.ndarray, bits: int = 16, workers: int = None) -> np.ndarray:
+        """
+        workers: 编码和排序使用的线程数，缺省为 CPU 数。
+        """
+        start_time = time.time()
+
+        def encode(block, min_coords, scale):
+            return Kernel_3dgs.hilbert_codes(block, bits, min_coords, scale)
 
-        # 2. 将所有整数坐标点转换为它们在曲线上的距离（一维索引）
-        # 这是一个高效的、向量化的操作
-        hilbert_distances = hilbert_curve.distances_from_points(int_coords)
+        min_coords, scale = Kernel_3dgs.bounds(points)
+        hilbert_distances = sorting.encode_keys(encode, points, min_coords, scale, workers)
 
         # --- 步骤 C: 排序 ---
-        sort_indices = np.argsort(hilbert_distances)
+        sort_indices = sorting.parallel_argsort(hilbert_distances, 3 * bits, workers)
 
         end_time = time.time()
         print(f"Hilbert curve sort done, using: {end_time - start_time:.2f}s\n")
@@ -264,329 +396,166 @@ class Kernel_3dgs:
         return sort_indices
     
     @staticmethod
-    def toGLB(params, pointCount, name):
-        chunk_size = 256
-        num_chunks = pointCount // chunk_size
-
-        descriptors, metadata = Kernel_3dgs.prepareForGLB(params)
-        texData_len = len(metadata)
-        gltf = GLTF2()
-
-        # 2. 创建一个 Buffer 和一个 Sampler
-        gltf.buffers.append(Buffer(byteLength=texData_len))
-        gltf.samplers.append(Sampler(magFilter=NEAREST, minFilter=NEAREST))
-
-        # 3. 为每个数据块创建 Image 和 Texture
-        texture_indices = {}
-
-        for key, descriptor in descriptors.items():
-            buffer_view = BufferView(buffer=0, byteOffset=descriptor['offset'], byteLength=descriptor['size'])
-            buffer_view_index = len(gltf.bufferViews)
-            gltf.bufferViews.append(buffer_view)
-
-            image = Image(
-                bufferView=buffer_view_index,
-                mimeType="image/vnd.custom-raw",
-                extras={
-                    "name": key,
-                    "format": descriptor['format'],
-                    "width": descriptor['width'],
-                    "height": descriptor['height']
-                }
-            )
-            image_index = len(gltf.images)
-            gltf.images.append(image)
-
-            texture = Texture(sampler=0, source=image_index)
-            texture_index = len(gltf.textures)
-            gltf.textures.append(texture)
-            texture_indices[key] = texture_index
-
-        # 4. 创建一个虚拟材质，并在 extras 中存储纹理映射
-        material = Material(
-            pbrMetallicRoughness=PbrMetallicRoughness(baseColorFactor=[1.0, 1.0, 1.0, 1.0]),
-            extras={"dataTextures": texture_indices}
-        )
-        gltf.materials.append(material)
-
-        # 5. 创建一个占位符 Mesh, Node, 和 Scene
-        placeholder_pos = np.array([[0,0,0]], dtype="float32").tobytes()
-        metadata += placeholder_pos
-
-        gltf.buffers[0].byteLength = len(metadata)
-
-        gltf.bufferViews.append(BufferView(buffer=0, byteOffset=texData_len, byteLength=len(placeholder_pos), target=ARRAY_BUFFER))
-        gltf.accessors.append(Accessor(bufferView=len(gltf.bufferViews)-1, componentType=FLOAT, count=1, type=VEC3, max=[0,0,0], min=[0,0,0]))
-
-        primitive = Primitive(attributes=Attributes(POSITION=0), material=0, mode=POINTS)
-        gltf.meshes.append(Mesh(primitives=[primitive]))
-
-        gltf.nodes.append(Node(
-            mesh=0,
-            matrix=[
-              1, 0, 0, 0,
-              0, 1, 0, 0,
-              0, 0, 1, 0,
-              0, 0, 0, 1
-            ],
-            extras={
-                "gsType": "ThreeD",
-                "name": name,
-                "num": pointCount,
-                "quality": "medium",
-            }
-        ))
-        gltf.scenes.append(Scene(nodes=[0]))
-
-        # 6. 附加最终的二进制数据
-        gltf.set_binary_blob(metadata)
-
-        return gltf
+    def toGLB(params, layout: ply.Layout, name):
+        """
+        Returns:
+            (gltf, textures)，二进制数据不放进 gltf，由 utils.writeGLB 按 textures 的顺序直接写入文件。
+        """
+        descriptors, textures, pages = Kernel_3dgs.prepareForGLB(params, layout)
+        texDataLength = sum(texture.nbytes for texture in textures.values())
+        gltf = utils.buildGLTF(descriptors, texDataLength, Kernel_3dgs.gsType, name, layout.pointCount,
+                               None if pages is None else {"pages": pages})
 
-    @staticmethod
-    def prepareForGLB(params: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]):
-        xyz, s, q, color, d1, d2, d3 = params
-        n = xyz.shape[0]
-        chunk_size = 256
-        num_chunks = n // chunk_size
-
-        # xyz, Shape: uint32 (num_chunks, chunk_size, 1)
-        xyz_chunks = xyz.reshape((num_chunks, chunk_size, 3))
-        xyz_min = xyz_chunks.min(axis=1)  # Shape: (num_chunks, 3)
-        xyz_max = xyz_chunks.max(axis=1)  # Shape: (num_chunks, 3)
-        xyz_metadata = np.concatenate((xyz_min, xyz_max), axis=1) # Shape: (num_chunks, 6)
-
-        xyz_range = xyz_max - xyz_min
-        xyz_range[xyz_range == 0] = 1.0 
-        normalized_xyz = (xyz_chunks - xyz_min[:, np.newaxis, :]) / xyz_range[:, np.newaxis, :]
-
-        quant_x = np.around(normalized_xyz[..., 0:1] * ((1 << 11) - 1)).astype(np.uint32)
-        quant_y = np.around(normalized_xyz[..., 1:2] * ((1 << 10) - 1)).astype(np.uint32)
-        quant_z = np.around(normalized_xyz[..., 2:3] * ((1 << 11) - 1)).astype(np.uint32)
-
-        quantized_xyz = (quant_z << 21) | (quant_y << 11) | quant_x
-
-        # q, Shape: uint8 (num_chunks, chunk_size, 4)
-        q_chunks = q.reshape((num_chunks, chunk_size, 4))
-        q_min = np.array(-1, dtype=np.float32)
-        q_max = np.array( 1, dtype=np.float32)
-
-        normalized_q = (q_chunks - q_min) / (q_max - q_min)
-
-        quantized_q = np.around(normalized_q * ((1 << 8) - 1)).astype(np.uint8)
-
-        # color, Shape: uint8 (num_chunks, chunk_size, 4)
-        color_chunks = color.reshape((num_chunks, chunk_size, 4))
-
-        color_min = color_chunks.min(axis=1)  # Shape: (num_chunks, 4)
-        color_max = color_chunks.max(axis=1)  # Shape: (num_chunks, 4)
-        color_metadata = np.concatenate([
-            np.concatenate([color_min[:, i:i+1], color_max[:, i:i+1]], axis=1) for i in range(4)
-        ], axis=1) # Shape: (num_chunks, 8)
-
-        color_range = color_max - color_min
-        color_range[color_range == 0] = 1.0
-        normalized_color = (color_chunks - color_min[:, np.newaxis, :]) / color_range[:, np.newaxis, :]
-
-        quantized_color = np.around(normalized_color * ((1 << 8) - 1)).astype(np.uint8)
-
-        # s, Shape: uint8 (num_chunks, chunk_size, 3)
-        s_chunks = np.sqrt(s.reshape((num_chunks, chunk_size, 3)))
-        s_min = s_chunks.min(axis=(1, 2)) # Shape: (num_chunks,)
-        s_max = s_chunks.max(axis=(1, 2)) # Shape: (num_chunks,)
-        s_metadata = np.stack((s_min, s_max), axis=1) # Shape: (num_chunks, 2)
-
-        s_range = s_max - s_min
-        s_range[s_range == 0] = 1.0
-        normalized_s = (s_chunks - s_min[:, np.newaxis, np.newaxis]) / s_range[:, np.newaxis, np.newaxis]
-
-        quantized_s = np.around(normalized_s * ((1 << 8) - 1)).astype(np.uint8)
-
-        # range, Shape: uint32 (num_chunks, 1, 8)
-        quantized_range = np.concatenate((xyz_metadata, s_metadata,
-                                          color_metadata[:, :6],
-                                          np.zeros_like(s_metadata)), axis=1).astype(np.float16).view(np.uint32)
-        quantized_range = quantized_range.reshape([num_chunks, 1, -1])
-
-        # declare the textures
-        quantized_params = {
-            'xyz': quantized_xyz,
-            'q': quantized_q,
-            'color': quantized_color,
-            's': quantized_s,
-            'range': quantized_range,
-        }
-
-        texture_formats = {
-            'xyz': 'R32UI', 
-            'q': 'RGBA8', 
-            'color': 'RGBA8',
-            's': 'RGB8', 
-            'range': 'RGBA32UI'
-        }
-
-        # hilbert reorder for 16*16 texel region
-        hilbert_order = Kernel_3dgs.generate_hilbert_array(16).flatten()
-        for key in quantized_params.keys():
-            quantized_param = quantized_params[key]
-            if quantized_param.shape[1] == 256:
-                quantized_params[key] = quantized_param[:, hilbert_order, :]
-
-        # pad for textures
-        chunkWidth, chunkHeight = utils.compute_tex_size(num_chunks, True)
-        num_pad = chunkHeight * chunkWidth - num_chunks
-        if num_pad > 0:
-            for key in quantized_params.keys():
-                quantized_param = quantized_params[key]
-                shape = quantized_param.shape
-                zeros = np.zeros([num_pad, shape[1], shape[2]], dtype=quantized_param.dtype)
-                quantized_params[key] = np.concatenate([quantized_param, zeros], axis=0)
-
-        # memory reorder for 16*16 texel region
-        for key in quantized_params.keys():
-            quantized_param = quantized_params[key]
-            localHeight = localWidth = math.isqrt(quantized_param.shape[1])
-            quantized_param = quantized_param.reshape([chunkHeight, chunkWidth, localHeight, localWidth, -1])
-            quantized_param = quantized_param.transpose(0, 2, 1, 3, 4)
-            quantized_param = quantized_param.reshape([chunkHeight * localHeight, chunkWidth * localWidth, -1])
-            quantized_params[key] = quantized_param
-
-        # create descriptors and metadata
-        # special for u_range
-        quantized_params['range'] = quantized_params['range'].reshape((chunkHeight, -1, 4))
-        metadata = b""
-        descriptors = {}
-        offset = 0
-        bind = 0
-        for key, quantized_param in quantized_params.items():
-            size = quantized_param.nbytes
-            texture_name = "u_" + key
-            descriptor = {
-                "offset": offset,
-                "size": size,
-                "width": quantized_param.shape[1],
-                "height": quantized_param.shape[0],
-                "format": texture_formats[key],
-                "bind": bind,
-            }
-            bind += 1
-            offset += size
-            metadata += quantized_param.tobytes()
-            descriptors[texture_name] = descriptor
-        
-        return descriptors, metadata
+        return gltf, list(textures.values())
 
     @staticmethod
-    def generate_hilbert_array(size: int) -> np.ndarray:
+    def quantize(params: tuple, layout: ply.Layout):
         """
-        生成一个按希尔伯特曲线顺序填充的2维 NumPy 数组。
-
-        Args:
-            size (int): 数组的边长，必须是2的幂 (e.g., 4, 8, 16, 32)。
+        按 QUANTIZE_SCHEMA 逐 chunk 量化，params 的点数须为 chunk 大小的整数倍。
 
         Returns:
-            np.ndarray: 一个 (size, size) 的数组，其值表示希尔伯特曲线的访问顺序。
-        """
-        if size <= 0 or (size & (size - 1)) != 0:
-            raise ValueError("Size 必须是 2 的正整数次幂。")
-
-        hilbert_array = np.zeros((size, size), dtype=np.int32)
-
-        def _d2xy(d: int, n: int) -> tuple[int, int]:
-            """
-            将一维希尔伯特距离 d 转换为二维坐标 (x, y)。
-            n 是网格的阶数 (size = 2**n)。
-            """
-            x, y = 0, 0
-            s = 1
-            while s < n:
-                rx = 1 & (d >> 1)
-                ry = 1 & (d ^ rx)
-
-                # 旋转和翻转子方块
-                if ry == 0:
-                    if rx == 1:
-                        x = s - 1 - x
-                        y = s - 1 - y
-                    x, y = y, x
-
-                x += s * rx
-                y += s * ry
-                d >>= 2
-                s <<= 1
-            return x, y
-
-        total_points = size * size
-        for i in range(total_points):
-            # 注意：这里 n 是 size，不是阶数
-            x, y = _d2xy(i, size)
-            hilbert_array[y, x] = i
-
-        return hilbert_array
-    
-    def analyze_point_blocks(points: np.ndarray, block_size: int = 256):
+            (quantized_params, texture_formats)，quantized_params 中每项形状为
+            (num_chunks, 256 或 1, channels)。
         """
-        分析已分组的点云，统计组内的距离特性。
+        return quantization.quantize(params, QUANTIZE_SCHEMA)
 
-        Args:
-            points: 已排序和分组的点云，形状为 (N, 3)。
-            block_size: 每个分组的大小。
+    @staticmethod
+    def mergeGroups(params: tuple, group: int) -> tuple:
         """
-        start_time = time.time()
+        把每 group 个相邻的高斯点矩匹配（moment matching）合并为一个：
+        权重 w = opacity × 投影面积（体积的 2/3 次方），均值和颜色按 w 加权平均，
+        协方差为 sum(w * (cov_i + d_i d_i^T)) / sum(w)，d_i 为到合并后均值的偏移；
+        特征分解得到 s 和 q，透明度使 opacity × 投影面积之和不变（不超过 1）。
+        权重之和为 0 的组（全部为补齐的点）按相等权重合并。
 
-        n_points = len(points)
-        num_blocks = (n_points + block_size - 1) // block_size
-
-        threshold_distance = np.sqrt(3)
-
-        # 用于存储每个块的最大内部距离
-        all_max_distances = []
+        Args:
+            params: (xyz, s, q, color)，点数为 group 的整数倍。
 
-        # 遍历每个块
-        for i in range(num_blocks):
-            start_idx = i * block_size
-            end_idx = min((i + 1) * block_size, n_points)
+        Returns:
+            (xyz, s, q, color)，点数为原来的 1 / group。
+        """
+        xyz, s, q, color = params[:4]
+        count = xyz.shape[0] // group
+        merged = [np.empty((count, x.shape[1]), dtype=np.float32) for x in (xyz, s, q, color)]
+        upper = [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)]
+
+        # 按块处理，临时的 (rows, 3, 3) 数组保持在较小的大小
+        blockGroups = max(1, (1 << 16) // group)
+        for start in range(0, count, blockGroups):
+            end = min(start + blockGroups, count)
+            rows = slice(start * group, end * group)
+            m = end - start
+
+            area = np.cbrt(s[rows].astype(np.float64).prod(axis=1)) ** 2
+            opacity = color[rows, 3].astype(np.float64)
+            w = (opacity * area).reshape(m, group)
+            total = w.sum(axis=1, keepdims=True)
+            w = np.where(total > 0, w / np.where(total > 0, total, 1.0), 1.0 / group)
+
+            points = xyz[rows].astype(np.float64).reshape(m, group, 3)
+            mean = (w[..., np.newaxis] * points).sum(axis=1)
+            offsets = points - mean[:, np.newaxis, :]
+            cov = Kernel_3dgs.calcCov(s[rows], q[rows]).astype(np.float64).reshape(m, group, 6)
+
+            full = np.empty((m, 3, 3), dtype=np.float64)
+            for k, (i, j) in enumerate(upper):
+                full[:, i, j] = (w * (cov[..., k] + offsets[..., i] * offsets[..., j])).sum(axis=1)
+                full[:, j, i] = full[:, i, j]
+
+            eigenvalues, vectors = np.linalg.eigh(full)
+            vectors[np.linalg.det(vectors) < 0, :, 0] *= -1
+            scales = np.sqrt(np.maximum(eigenvalues, 0.0))
+            mergedArea = np.cbrt(scales.prod(axis=1)) ** 2
+
+            merged[0][start:end] = mean
+            merged[1][start:end] = scales
+            merged[2][start:end] = utils.rotationToQuaternion(vectors)
+            merged[3][start:end, :3] = (w[..., np.newaxis] * color[rows, :3].reshape(m, group, 3)).sum(axis=1)
+            coverage = (opacity * area).reshape(m, group).sum(axis=1)
+            merged[3][start:end, 3] = np.clip(coverage / np.maximum(mergedArea, 1e-30), 0.0, 1.0)
+        return tuple(merged)
 
-            current_block = points[start_idx:end_idx]
+    @staticmethod
+    def buildLOD(params: tuple, layout: ply.Layout, levels: int, group: int = 8) -> list:
+        """
+        由排序后的 params 逐级合并得到更粗的层级。相邻的点在曲线上相邻，合并后仍然按曲线排列，
+        每一级都可以按 chunk 量化。点数不超过一个 chunk 时停止。
 
-            # 如果块内少于2个点，则无法计算距离
-            if len(current_block) < 2:
-                all_max_distances.append(0)
-                continue
-            
-            # 使用 pdist 高效计算块内所有点对的距离
-            # pdist 返回一个压缩后的一维距离矩阵
-            pairwise_distances = pdist(current_block, metric='euclidean')
+        排序后补齐的点混在原有的点之间，先用 splatRows 把原有的点移到前面，补齐的点只出现在末尾，
+        每一级只丢弃全部为补齐的点的组。每一级检查合并后的点代表的原有点数之和，
+        以及各组 opacity × 投影面积之和（合并前）与上一级相同。
 
-            # 找到这个块内的最大距离
-            max_dist_in_block = np.max(pairwise_distances)
-            all_max_distances.append(max_dist_in_block)
+        Returns:
+            [(level params, level layout)]，从第 1 级（点数约为 1 / group）到最粗的一级，
+            params 为 (xyz, s, q, color, None, None, None)，layout.vertexCount 为该级的点数。
+        """
+        result = []
+        rows = Kernel_3dgs.splatRows(params)
+        current, _ = Kernel_3dgs.subset(params[:4], layout, rows)
+        vertexCount = len(rows)
+        # 每个点代表的原有点数，补齐的点为 0
+        members = np.zeros(current[0].shape[0], dtype=np.int64)
+        members[:vertexCount] = 1
+        for level in range(1, levels + 1):
+            if vertexCount <= ply.CHUNK_SIZE:
+                break
+            importance = utils.splatImportance(current[3][:, 3], current[1])
+            merged = Kernel_3dgs.mergeGroups(current, group)
+            starts = np.arange(0, current[0].shape[0], group)
+            groupMembers = np.add.reduceat(members, starts)
+            groupImportance = np.add.reduceat(importance, starts)
+
+            previous = vertexCount
+            vertexCount = -(-vertexCount // group)
+            if groupMembers[:vertexCount].sum() != members.sum() or \
+                    not np.isclose(groupImportance[:vertexCount].sum(), importance[:previous].sum(), rtol=1e-9):
+                raise ValueError(f"LOD level {level} does not cover all splats of the previous level")
+
+            current = utils.gatherPadded(merged, np.arange(vertexCount), ply.CHUNK_SIZE)
+            current[3][vertexCount:, 3] = utils.sigmoid(np.float32(-70))  # small opacity for padded splats
+            members = np.zeros(current[0].shape[0], dtype=np.int64)
+            members[:vertexCount] = groupMembers[:vertexCount]
+
+            levelLayout = copy.copy(layout)
+            levelLayout.vertexCount = vertexCount
+            levelLayout.pointCount = current[0].shape[0]
+            levelLayout.hasSH = False
+            result.append((current + (None, None, None), levelLayout))
+        return result
 
-        all_max_distances = np.array(all_max_distances)
+    @staticmethod
+    def waveChunks(params: tuple, waves: int) -> list:
+        """
+        按重要性把排序后的 chunk 分成 waves 组，见 utils.waveChunks。
+        """
+        xyz, s, q, color = params[:4]
+        return utils.waveChunks(color[:, 3], s, waves, ply.CHUNK_SIZE)
 
-        # --- 开始统计 ---
-        # 1. 有多少个组
-        total_blocks_found = len(all_max_distances)
+    @staticmethod
+    def encodeSH(params: tuple, layout: ply.Layout, size: int = vq.CODEBOOK_SIZE, workers: int = None):
+        """
+        1-3 阶球谐系数的矢量量化，params 须由 getParams(exportSH=True) 读取。
 
-        # 2. 组内最大距离小于 sqrt(3) 的组的数量和百分比
-        compact_blocks_count = np.sum(all_max_distances < threshold_distance)
-        percentage_compact = (compact_blocks_count / total_blocks_found) * 100 if total_blocks_found > 0 else 0
+        Returns:
+            (indices, codebook)：(num_chunks, 256, 1) uint16 的码本索引（R16UI）和
+            utils.codebookTexture 排布的码本纹理（RGBA32UI），每个码字为 d1、d2、d3 依次排列的 45 个系数。
+        """
+        d1, d2, d3 = params[4:]
+        vectors = np.concatenate([d1, d2, d3], axis=1)
+        codebook, indices = vq.buildCodebook(vectors, size, workers)
+        num_chunks = layout.pointCount // ply.CHUNK_SIZE
+        return indices.reshape([num_chunks, ply.CHUNK_SIZE, 1]), utils.codebookTexture(codebook)
 
-        # 3. 组内最大距离的最大值
-        overall_max_distance = np.max(all_max_distances) if total_blocks_found > 0 else 0
+    @staticmethod
+    def prepareForGLB(params: tuple, layout: ply.Layout):
+        """
+        量化并按页排布 chunk 纹理，见 utils.layoutPages。
 
-        analysis_time = time.time() - start_time
-        print(f"Analysis done, using {analysis_time:.2f}s")
-        print("-" * 25)
-        print(f"point num: {n_points:,}")
-        print(f"chunk size: {block_size}")
-        print(f"chunk num: {total_blocks_found}")
-        print("-" * 25)
-        print(f"compact threshold: sqrt(3) ≈ {threshold_distance:.4f}")
-        print(f"compact chunk num: {compact_blocks_count} / {total_blocks_found}")
-        print(f"compact chunk percentage: {percentage_compact:.2f}%")
-        print("-" * 25)
-        print(f"max radius of chunk: {overall_max_distance:.4f}\n")
+        Returns:
+            (descriptors, textures, pages)，只有一页时 pages 为 None。
+        """
+        quantized_params, texture_formats = Kernel_3dgs.quantize(params, layout)
+        return utils.layoutPages(quantized_params, texture_formats, layout.pointCount // ply.CHUNK_SIZE)
 
     def visualize_with_pyvista(params: tuple):
         """
@@ -602,6 +571,9 @@ class Kernel_3dgs:
         print("Creating visualization with PyVista...")
         colors = utils.create_block_colors_high_contrast(points.shape[0], 256)
 
+        # visualization only dependency, not needed for headless conversion
+        import pyvista as pv
+
         # 3. Create a plotter object.
         plotter = pv.Plotter(window_size=[1280, 720])
         pv.set_plot_theme("dark")
@@ -0,0 +1,103 @@
+import numpy as np
+import json
+import os
+from . import sorting
+from .threeD import Kernel_3dgs
+
+# 把大场景按八叉树切成多个 GLB，查看器只需下载视锥内的块。
+# 八叉树的格子即 63 位莫顿码的前缀：第 d 层的格子编号为 code >> (63 - 3d)。
+
+MAX_DEPTH = 21
+DEFAULT_TILE_SPLATS = 1 << 20
+TILES_VERSION = 1
+
+
+def octreeTiles(xyz: np.ndarray, maxSplats: int = DEFAULT_TILE_SPLATS, workers: int = None) -> list:
+    """
+    自适应八叉树切分：点数超过 maxSplats 的格子继续分成 8 个子格子，直到第 MAX_DEPTH 层；
+    按莫顿序相邻的叶子格子在总点数不超过 maxSplats 时合并为一块，避免稀疏区域产生大量很小的文件。
+    每块是莫顿码上连续的一段，块内的点保持输入顺序（即排序后的曲线顺序），空的格子不输出。
+
+    Args:
+        xyz: (n, 3) 坐标，不含补齐的点。
+        workers: 编码和排序使用的线程数，缺省为 CPU 数。
+
+    Returns:
+        [(cells, indices)]，按莫顿序排列。cells 为块包含的格子 [(depth, cell)]，
+        cell 为第 depth 层的莫顿前缀；indices 为升序的点序号。
+    """
+    n = xyz.shape[0]
+    min_coords, scale = Kernel_3dgs.bounds(xyz)
+    codes = sorting.encode_keys(Kernel_3dgs.morton_codes, xyz, min_coords, scale, workers)
+    order = sorting.parallel_argsort(codes, 63, workers)
+    sortedCodes = codes[order]
+
+    leaves = []
+    stack = [(0, 0, 0, n)]
+    while stack:
+        depth, cell, start, end = stack.pop()
+        if end - start <= maxSplats or depth == MAX_DEPTH:
+            leaves.append((depth, cell, start, end))
+            continue
+        # 子格子在排序后的编码中是连续的区间
+        shift = 63 - 3 * (depth + 1)
+        children = np.array([((cell << 3) + child) << shift for child in range(8)], dtype=np.uint64)
+        bounds = np.append(start + np.searchsorted(sortedCodes[start:end], children), end)
+        # 倒序入栈，按莫顿序出栈
+        for child in range(7, -1, -1):
+            if bounds[child] < bounds[child + 1]:
+                stack.append((depth + 1, (cell << 3) + child, int(bounds[child]), int(bounds[child + 1])))
+
+    # 叶子在排序后的编码中首尾相接，合并后每块仍是一段区间
+    groups = []
+    for depth, cell, start, end in leaves:
+        if groups and end - groups[-1][0] <= maxSplats:
+            groups[-1][1] = end
+            groups[-1][2].append((depth, cell))
+        else:
+            groups.append([start, end, [(depth, cell)]])
+    tileOf = np.empty(n, dtype=np.int64)
+    for tile, (start, end, _) in enumerate(groups):
+        tileOf[order[start:end]] = tile
+    # 稳定排序，块内保持原来的顺序
+    grouped = np.argsort(tileOf, kind='stable')
+    splits = np.cumsum([end - start for start, end, _ in groups])[:-1]
+    return [(cells, indices) for (_, _, cells), indices in zip(groups, np.split(grouped, splits))]
+
+def tilePath(outputPath: str, tile: int) -> str:
+    base, _ = os.path.splitext(outputPath)
+    return f"{base}_tile{tile}.glb"
+
+def manifestPath(outputPath: str) -> str:
+    base, _ = os.path.splitext(outputPath)
+    return base + ".tiles.json"
+
+def tileFiles(outputPath: str) -> list:
+    """
+    已有的块清单中列出的 GLB 路径，清单不存在或损坏时返回空列表。
+    """
+    try:
+        with open(manifestPath(outputPath), 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        directory = os.path.dirname(outputPath)
+        return [os.path.join(directory, tile["file"]) for tile in data["tiles"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return []
+
+def writeManifest(outputPath: str, gsType: str, name: str, tiles: list):
+    """
+    写入块清单 {"version", "gsType", "name", "num", "min", "max", "tiles"}，
+    tiles 的每项为 {"file", "cells", "num", "min", "max", "bytes"}，cells 为块包含的八叉树格子 [[depth, cell]]，
+    min / max 为块的包围盒。
+    """
+    data = {
+        "version": TILES_VERSION,
+        "gsType": gsType,
+        "name": name,
+        "num": sum(tile["num"] for tile in tiles),
+        "min": np.min([tile["min"] for tile in tiles], axis=0).tolist(),
+        "max": np.max([tile["max"] for tile in tiles], axis=0).tolist(),
+        "tiles": tiles,
+    }
+    with open(manifestPath(outputPath), 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=2)
@@ -1,10 +1,11 @@
 import numpy as np
 import math
 import warnings
+import functools
 import colorsys
 import time
-import pyvista as pv
-from scipy.spatial.distance import pdist
+import struct
+import os
 
 
 def packRGBA2u32(colors: np.ndarray) -> np.ndarray:
@@ -28,24 +29,41 @@ def uint8Quantify(x: np.ndarray, min, max):
 def alignUp(x, alignment):
     return ((x + alignment - 1) // alignment) * alignment
 
+# 纹理的最大边长，一页 chunk 纹理最多容纳 (4096 / 16)^2 个 chunk
+MAX_TEX_SIZE = 4096
+PAGE_CHUNKS = (MAX_TEX_SIZE // 16) ** 2
+
 def compute_tex_size(texel_num: int, chunkBased: bool) -> tuple:
-    # we wanna pad as less as possible
-    # for general usage, width and height are limited to 4096
+    """
+    在宽高都不超过上限的形状中取补齐最少的（width * ceil(texel_num / width) - texel_num 最小），
+    补齐相同时取最窄的。chunkBased 时单位为 chunk（16 × 16 纹素），否则为纹素。超过一页时见 layoutPages。
+
+    Returns:
+        (width, height)
+    """
     if texel_num <= 0:
         return 0, 0
 
-    max_height = max_width = 4096 // 16 if chunkBased else 4096
+    # for general usage, width and height are limited to 4096
+    max_height = max_width = MAX_TEX_SIZE // 16 if chunkBased else MAX_TEX_SIZE
 
     if texel_num > max_height * max_width:
-        raise ValueError("point num is too large! Should be less or equal to 4096 * 4096!")
-    
-    # suppose we have i columns of max_height
-    for i in range(1, max_width + 1):
-        if texel_num <= i * max_height:
-            return i, alignUp(texel_num, i) // i
+        raise ValueError("point num is too large! Should be less or equal to 4096 * 4096 per texture page!")
+
+    # 所有可行的宽度一次算出补齐量，argmin 取第一个即最窄的
+    widths = np.arange(-(-texel_num // max_height), max_width + 1)
+    width = int(widths[np.argmin(widths * -(-texel_num // widths) - texel_num)])
+    return width, -(-texel_num // width)
+
+def pageRanges(num_chunks: int) -> list:
+    """
+    chunk 分页：第 p 页为第 p * PAGE_CHUNKS 个 chunk 起的 PAGE_CHUNKS 个，最后一页为剩下的。
+
+    Returns:
+        [(firstChunk, chunks)]
+    """
+    return [(first, min(PAGE_CHUNKS, num_chunks - first)) for first in range(0, num_chunks, PAGE_CHUNKS)]
 
-    return 0, 0
-    
 def alignTo256(ply: np.ndarray, opacityIdx:int, alignment: int = 256) -> np.ndarray:
     num_vertices = ply.shape[0]
     num_to_pad = (alignment - (num_vertices % alignment)) % alignment
@@ -57,6 +75,749 @@ def alignTo256(ply: np.ndarray, opacityIdx:int, alignment: int = 256) -> np.ndar
     else:
         return ply
 
+def fillPadding(x: np.ndarray, count: int):
+    """
+    用第 count - 1 行填充 x[count:]，x 已按 alignUp(count, 256) 预分配。
+    """
+    if x.shape[0] > count:
+        x[count:] = x[count - 1]
+    return x
+
+# 最大轴长小于该值的高斯点在任何视角下都远小于一个像素
+DEGENERATE_SCALE = 1e-7
+
+def splatImportance(opacity: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """
+    opacity × 投影面积（体积的 2/3 次方），float64。
+    """
+    scale = scales.astype(np.float64)
+    return opacity * np.cbrt(scale[:, 0] * scale[:, 1] * scale[:, 2]) ** 2
+
+def waveChunks(opacity: np.ndarray, scales: np.ndarray, waves: int, chunkSize: int = 256) -> list:
+    """
+    按 chunk 内所有点的 splatImportance 之和从大到小把 chunk 分成 waves 组，
+    第 i 组的 chunk 数约为总数的 2^i / (2^waves - 1)，靠前的组小而重要。
+    组内保持原来的曲线顺序，纹理中相邻的 chunk 在空间上仍然相邻。
+
+    Args:
+        opacity, scales: 排序并补齐后的 (num_chunks * chunkSize,) 透明度和 (num_chunks * chunkSize, 3) 尺寸。
+
+    Returns:
+        [chunk 序号数组]，每组非空，组数不超过 chunk 数。
+    """
+    importance = splatImportance(opacity, scales).reshape([-1, chunkSize]).sum(axis=1)
+    num_chunks = importance.shape[0]
+    # 重要性相同时按曲线顺序，结果是确定的
+    ranked = np.argsort(-importance, kind='stable')
+    waves = min(waves, num_chunks)
+    bounds = [num_chunks * ((1 << i) - 1) // ((1 << waves) - 1) for i in range(waves + 1)]
+    # 每组至少一个 chunk
+    for i in range(1, waves + 1):
+        bounds[i] = min(max(bounds[i], bounds[i - 1] + 1), num_chunks - (waves - i))
+    return [np.sort(ranked[bounds[i]:bounds[i + 1]]) for i in range(waves)]
+
+def pruneIndices(xyz: np.ndarray, opacity: np.ndarray, scales: np.ndarray, values: list,
+                 minOpacity: float = None, maxSplats: int = None, dropDegenerate: bool = False,
+                 floaters=None) -> np.ndarray:
+    """
+    选出要保留的高斯点，按原顺序返回索引；没有点被删除时返回 None。
+    依次按透明度、退化和离群点过滤，最后按 maxSplats 选取。
+
+    Args:
+        xyz: (n, 3) 坐标。
+        opacity: (n,) sigmoid 之后的透明度。
+        scales: (n, 3) exp 之后的尺寸。
+        values: 检查是否含有 NaN / inf 的数组列表，每个形状为 (n, k)。
+        minOpacity: 删除透明度低于该值的点。
+        maxSplats: 最多保留的点数，按 opacity × 投影面积（体积的 2/3 次方）保留最重要的点。
+        dropDegenerate: 删除含有 NaN / inf 或最大轴长小于 DEGENERATE_SCALE 的点。
+        floaters: 接受 (m, 3) 坐标、返回离群点 bool 数组的函数，例如 outliers.floaterMask。
+    """
+    n = opacity.shape[0]
+    keep = np.ones(n, dtype=bool)
+    if minOpacity is not None:
+        keep &= opacity >= minOpacity
+    if dropDegenerate:
+        for x in values:
+            keep &= np.isfinite(x).all(axis=1)
+        keep &= scales.max(axis=1) >= DEGENERATE_SCALE
+    indices = np.flatnonzero(keep)
+    if floaters is not None:
+        indices = indices[~floaters(xyz[indices])]
+
+    if maxSplats is not None and len(indices) > maxSplats:
+        # 只需要前 maxSplats 个，不需要完整排序
+        importance = splatImportance(opacity[indices], scales[indices])
+        top = np.argpartition(-importance, maxSplats - 1)[:maxSplats]
+        indices = indices[np.sort(top)]
+
+    return None if len(indices) == n else indices
+
+def splatBounds(xyz: np.ndarray, scales: np.ndarray, sigmas: float = 3.0) -> tuple:
+    """
+    包含每个点 sigmas 倍最大轴长的球的包围盒 (min, max)，各为 (3,) float64。
+    """
+    radius = sigmas * scales.max(axis=1, keepdims=True).astype(np.float64)
+    return (xyz - radius).min(axis=0), (xyz + radius).max(axis=0)
+
+def gatherPadded(arrays, indices: np.ndarray, alignment: int = 256) -> tuple:
+    """
+    取出 indices 行，补齐到 alignment 的整数倍，补齐的行复制最后一行。None 保持为 None。
+    """
+    count = len(indices)
+    rows = alignUp(count, alignment)
+    result = []
+    for x in arrays:
+        if x is None:
+            result.append(None)
+            continue
+        out = np.empty((rows,) + x.shape[1:], dtype=x.dtype)
+        np.take(x, indices, axis=0, out=out[:count])
+        result.append(fillPadding(out, count))
+    return tuple(result)
+
+@functools.lru_cache(maxsize=None)
+def hilbert_tables(n: int) -> tuple:
+    """
+    构建 n 维希尔伯特曲线的状态转移表（Skilling 算法的逐层展开）。
+
+    每一层的状态是高层施加在低位上的带符号轴置换，加上 Gray 编码累积的奇偶位。
+    输入为该层各轴的比特组成的 n 位象限号（第 0 轴为最高位）。
+
+    Returns:
+        (digit_table, next_table)，形状均为 (num_states * 2**n,)，
+        用 state * 2**n + octant 索引。
+    """
+    cells = 1 << n
+
+    def apply(g, octant):
+        return g[octant]
+
+    def level_ops(y):
+        # 与 Skilling 算法相同：第 i 轴该位为 1 时翻转第 0 轴低位，否则交换第 0 轴与第 i 轴低位
+        ops = list(range(cells))
+        for i in range(n):
+            bit_i = 1 << (n - 1 - i)
+            if y & bit_i:
+                ops = [v ^ (1 << (n - 1)) for v in ops]
+            elif i != 0:
+                def swap(v, bit_i=bit_i):
+                    b0 = (v >> (n - 1)) & 1
+                    bi = 1 if v & bit_i else 0
+                    v &= ~((1 << (n - 1)) | bit_i)
+                    return v | (bi << (n - 1)) | (bit_i if b0 else 0)
+                ops = [swap(v) for v in ops]
+        return ops
+
+    identity = tuple(range(cells))
+    states = {(identity, 0): 0}
+    queue = [(identity, 0)]
+    digits = []
+    nexts = []
+    while queue:
+        g, parity = queue.pop(0)
+        for octant in range(cells):
+            y = apply(g, octant)
+            ops = level_ops(y)
+            g_next = tuple(ops[g[v]] for v in range(cells))
+
+            # Gray 编码：每一位与其前面所有轴异或，再整体异或高层的奇偶位
+            z = 0
+            acc = 0
+            for i in range(n):
+                acc ^= (y >> (n - 1 - i)) & 1
+                z |= acc << (n - 1 - i)
+            digit = z ^ (cells - 1 if parity else 0)
+            parity_next = parity ^ acc
+
+            key = (g_next, parity_next)
+            if key not in states:
+                states[key] = len(states)
+                queue.append(key)
+            digits.append(digit)
+            nexts.append(states[key])
+
+    return np.array(digits, dtype=np.uint64), np.array(nexts, dtype=np.uint16)
+
+@functools.lru_cache(maxsize=None)
+def hilbert_group_tables(n: int, levels: int) -> tuple:
+    """
+    将 hilbert_tables 合并为一次处理 levels 层的表，索引为 state * 2**(n * levels) + 交错后的 n * levels 位。
+    """
+    digit_table, next_table = hilbert_tables(n)
+    cells = 1 << n
+    num_states = len(next_table) // cells
+    group = np.arange(1 << (n * levels), dtype=np.uint64)
+
+    start = np.repeat(np.arange(num_states, dtype=np.uint64), len(group))
+    codes = np.tile(group, num_states)
+    state = start
+    digits = np.zeros_like(codes)
+    for level in range(levels - 1, -1, -1):
+        octant = (codes >> np.uint64(n * level)) & np.uint64(cells - 1)
+        index = state * np.uint64(cells) + octant
+        digits = (digits << np.uint64(n)) | digit_table[index]
+        state = next_table[index].astype(np.uint64)
+    return digits, state.astype(np.uint16)
+
+@functools.lru_cache(maxsize=None)
+def spread_table(n: int) -> np.ndarray:
+    """
+    字节 -> 比特间隔为 n 的展开值，用于查表交错坐标。
+    """
+    table = np.zeros(256, dtype=np.uint64)
+    for bit in range(8):
+        table |= ((np.arange(256, dtype=np.uint64) >> np.uint64(bit)) & np.uint64(1)) << np.uint64(bit * n)
+    return table
+
+def interleave_bits(int_coords: np.ndarray, bits: int) -> np.ndarray:
+    """
+    按位交错各轴坐标，每一层中第 0 轴在最高位（与 hilbert_tables 的象限号一致）。
+    """
+    n = int_coords.shape[1]
+    table = spread_table(n)
+    codes = np.zeros(int_coords.shape[0], dtype=np.uint64)
+    for i in range(n):
+        axis = int_coords[:, i].astype(np.uint64)
+        for byte in range(0, bits, 8):
+            spread = table[(axis >> np.uint64(byte)) & np.uint64(0xFF)]
+            codes |= spread << np.uint64(byte * n + (n - 1 - i))
+    return codes
+
+def hilbert_distances(int_coords: np.ndarray, bits: int) -> np.ndarray:
+    """
+    向量化计算希尔伯特曲线距离，与 hilbertcurve.HilbertCurve(bits, n) 的结果一致。
+
+    先按位交错得到莫顿码，再查表逐组（多层）把莫顿码转换为希尔伯特距离，
+    全部是 uint64 的数组运算。
+
+    Args:
+        int_coords: (N, n) 的整数坐标，每个分量在 [0, 2**bits - 1] 内。
+        bits: 每个轴的比特数，n * bits 不能超过 64。
+
+    Returns:
+        (N,) uint64 距离。
+    """
+    n = int_coords.shape[1]
+    if bits < 1 or n * bits > 64:
+        raise ValueError(f"{n}D hilbert curve supports 1 to {64 // n} bits per axis")
+
+    # 每组处理的层数，使查找表保持在 2**16 项左右
+    levels = max(1, 9 // n)
+    codes = interleave_bits(int_coords, bits)
+    state = np.zeros(codes.shape[0], dtype=np.uint64)
+    distances = np.zeros(codes.shape[0], dtype=np.uint64)
+
+    # 最高的 bits % levels 层逐层处理，其余按组处理
+    b = bits
+    while b > 0:
+        step = levels if b % levels == 0 else 1
+        digit_table, next_table = hilbert_group_tables(n, step)
+        b -= step
+        width = np.uint64(n * step)
+        group = (codes >> np.uint64(n * b)) & np.uint64((1 << (n * step)) - 1)
+        index = (state << width) | group
+        distances = (distances << width) | digit_table[index]
+        state = next_table[index].astype(np.uint64)
+    return distances
+
+# 占位符 Mesh 的唯一顶点，位于二进制数据末尾
+PLACEHOLDER_POS = np.array([[0,0,0]], dtype="float32").tobytes()
+
+@functools.lru_cache(maxsize=None)
+def generate_hilbert_array(size: int) -> np.ndarray:
+    """
+    生成一个按希尔伯特曲线顺序填充的2维 NumPy 数组。
+
+    Args:
+        size (int): 数组的边长，必须是2的幂 (e.g., 4, 8, 16, 32)。
+
+    Returns:
+        np.ndarray: 一个 (size, size) 的只读数组，其值表示希尔伯特曲线的访问顺序。
+    """
+    if size <= 0 or (size & (size - 1)) != 0:
+        raise ValueError("Size 必须是 2 的正整数次幂。")
+
+    hilbert_array = np.zeros((size, size), dtype=np.int32)
+
+    def _d2xy(d: int, n: int) -> tuple[int, int]:
+        """
+        将一维希尔伯特距离 d 转换为二维坐标 (x, y)。
+        n 是网格的阶数 (size = 2**n)。
+        """
+        x, y = 0, 0
+        s = 1
+        while s < n:
+            rx = 1 & (d >> 1)
+            ry = 1 & (d ^ rx)
+
+            # 旋转和翻转子方块
+            if ry == 0:
+                if rx == 1:
+                    x = s - 1 - x
+                    y = s - 1 - y
+                x, y = y, x
+
+            x += s * rx
+            y += s * ry
+            d >>= 2
+            s <<= 1
+        return x, y
+
+    total_points = size * size
+    for i in range(total_points):
+        # 注意：这里 n 是 size，不是阶数
+        x, y = _d2xy(i, size)
+        hilbert_array[y, x] = i
+
+    # 结果被缓存共享，禁止调用者修改
+    hilbert_array.flags.writeable = False
+    return hilbert_array
+
+@functools.lru_cache(maxsize=4)
+def tile_destinations(chunkWidth: int, chunkHeight: int, tileSize: int = 16) -> np.ndarray:
+    """
+    chunk 纹理的目标下标表：chunk c 的第 k 个纹素在展平后的输出纹理中的位置。
+    chunk 按行优先排成 chunkHeight × chunkWidth 个 tileSize × tileSize 的块，
+    块内按希尔伯特曲线排列。结果按纹理尺寸缓存，取前 num_chunks * tileSize**2 项即可。
+    """
+    hilbert = generate_hilbert_array(tileSize).ravel()
+    local_y = np.empty(tileSize * tileSize, dtype=np.int64)
+    local_x = np.empty(tileSize * tileSize, dtype=np.int64)
+    local_y[hilbert], local_x[hilbert] = np.divmod(np.arange(tileSize * tileSize), tileSize)
+
+    chunk_y, chunk_x = np.divmod(np.arange(chunkWidth * chunkHeight, dtype=np.int64), chunkWidth)
+    rows = chunk_y[:, np.newaxis] * tileSize + local_y
+    cols = chunk_x[:, np.newaxis] * tileSize + local_x
+    destinations = (rows * (chunkWidth * tileSize) + cols).ravel()
+    destinations.flags.writeable = False
+    return destinations
+
+def scatterRows(output: np.ndarray, destinations: np.ndarray, rows: np.ndarray):
+    """
+    output[destinations] = rows，两者都是 (N, channels) 的 C 连续数组。
+    每行视作一个 void 元素，一次一维的 scatter 完成拷贝。
+    """
+    row = np.dtype((np.void, output.shape[1] * output.itemsize))
+    output.view(row)[:, 0][destinations] = np.ascontiguousarray(rows).view(row)[:, 0]
+
+def layoutTextures(quantized_params: dict, texture_formats: dict, num_chunks: int) -> tuple:
+    """
+    把 quantize 的输出排成纹理，每个纹理只做一次 scatter 到预先分配（补零）的数组。
+
+    (num_chunks, 256, C) 的参数按 tile_destinations 放入 16x16 的块；
+    (num_chunks, 1, C) 的参数（u_range）按 chunk 顺序排成每行 chunkWidth 个 chunk。
+
+    Returns:
+        (descriptors, textures)，textures 按 descriptors 的 offset 顺序排列。
+    """
+    chunkWidth, chunkHeight = compute_tex_size(num_chunks, True)
+    descriptors = {}
+    textures = {}
+    offset = 0
+    for bind, (key, quantized_param) in enumerate(quantized_params.items()):
+        texels, channels = quantized_param.shape[1], quantized_param.shape[2]
+        if texels > 1:
+            tileSize = math.isqrt(texels)
+            texture = np.zeros([chunkHeight * tileSize, chunkWidth * tileSize, channels], dtype=quantized_param.dtype)
+            destinations = tile_destinations(chunkWidth, chunkHeight, tileSize)[:num_chunks * texels]
+            scatterRows(texture.reshape([-1, channels]), destinations, quantized_param.reshape([-1, channels]))
+        else:
+            # special for u_range: RGBA32UI texels of each chunk are stored side by side
+            texture = np.zeros([chunkHeight * chunkWidth, channels], dtype=quantized_param.dtype)
+            texture[:num_chunks] = quantized_param.reshape([num_chunks, channels])
+            texture = texture.reshape([chunkHeight, -1, 4])
+
+        descriptors["u_" + key] = {
+            "offset": offset,
+            "size": texture.nbytes,
+            "width": texture.shape[1],
+            "height": texture.shape[0],
+            "format": texture_formats[key],
+            "bind": bind,
+        }
+        offset += texture.nbytes
+        textures[key] = texture
+
+    return descriptors, textures
+
+def layoutPages(quantized_params: dict, texture_formats: dict, num_chunks: int) -> tuple:
+    """
+    与 layoutTextures 相同，chunk 超过一页（PAGE_CHUNKS）时按 pageRanges 分页，每页单独排布一套纹理，
+    纹理名加后缀 `_page{p}`，按页首尾相接。chunk c 位于第 c // PAGE_CHUNKS 页的第 c % PAGE_CHUNKS 个。
+
+    Returns:
+        (descriptors, textures, pages)。只有一页时纹理名不变，pages 为 None；
+        否则 pages 为页表 [{"page", "firstChunk", "chunks", "textures": {原纹理名: 该页的纹理名}}]。
+    """
+    if num_chunks <= PAGE_CHUNKS:
+        return *layoutTextures(quantized_params, texture_formats, num_chunks), None
+
+    sets = []
+    for page, (first, count) in enumerate(pageRanges(num_chunks)):
+        subset = {key: value[first:first + count] for key, value in quantized_params.items()}
+        sets.append((f"_page{page}", *layoutTextures(subset, texture_formats, count)))
+    descriptors, textures, ranges = concatTextureSets(sets)
+    pages = [{"page": page, "firstChunk": first, "chunks": count, "textures": names}
+             for page, ((first, count), (_, _, names)) in enumerate(zip(pageRanges(num_chunks), ranges))]
+    return descriptors, textures, pages
+
+def renamePages(pages: list, names: dict) -> list:
+    """
+    concatTextureSets 给纹理加上后缀之后，页表中的纹理名随之改变。
+    """
+    return [{**page, "textures": {key: names[name] for key, name in page["textures"].items()}} for page in pages]
+
+def rotationToQuaternion(matrices: np.ndarray) -> np.ndarray:
+    """
+    (n, 3, 3) 旋转矩阵（行列式为 1）-> (n, 4) 单位四元数 (x, y, z, w)，
+    与 Kernel_3dgs.calcCov 的约定一致：calcCov(s, q) = M diag(s^2) M^T。
+    """
+    m = matrices
+    trace = m[:, 0, 0] + m[:, 1, 1] + m[:, 2, 2]
+    q = np.empty((m.shape[0], 4), dtype=np.float64)
+    q[:, 3] = 0.5 * np.sqrt(np.maximum(0.0, 1.0 + trace))
+    q[:, 0] = 0.5 * np.sqrt(np.maximum(0.0, 1.0 + m[:, 0, 0] - m[:, 1, 1] - m[:, 2, 2]))
+    q[:, 1] = 0.5 * np.sqrt(np.maximum(0.0, 1.0 - m[:, 0, 0] + m[:, 1, 1] - m[:, 2, 2]))
+    q[:, 2] = 0.5 * np.sqrt(np.maximum(0.0, 1.0 - m[:, 0, 0] - m[:, 1, 1] + m[:, 2, 2]))
+    q[:, 0] = np.copysign(q[:, 0], m[:, 2, 1] - m[:, 1, 2])
+    q[:, 1] = np.copysign(q[:, 1], m[:, 0, 2] - m[:, 2, 0])
+    q[:, 2] = np.copysign(q[:, 2], m[:, 1, 0] - m[:, 0, 1])
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    return q
+
+# 码本纹理每行的码字数
+CODEBOOK_ENTRIES_PER_ROW = 512
+
+def codebookTexture(codebook: np.ndarray, entriesPerRow: int = CODEBOOK_ENTRIES_PER_ROW) -> np.ndarray:
+    """
+    把 (size, d) 码本按 float16 排成 RGBA32UI 纹理：每个码字占 ceil(d / 8) 个相邻纹素（不足补零），
+    每行 entriesPerRow 个码字，第 i 个码字从第 i // entriesPerRow 行、第 (i % entriesPerRow) * 纹素数 列开始。
+    """
+    size, d = codebook.shape
+    texelsPerEntry = -(-d // 8)
+    perRow = min(entriesPerRow, size)
+    rows = -(-size // perRow)
+    halfs = np.zeros((rows * perRow, texelsPerEntry * 8), dtype=np.float16)
+    halfs[:size, :d] = codebook
+    return halfs.view(np.uint32).reshape([rows, perRow * texelsPerEntry, 4])
+
+def appendTexture(descriptors: dict, textures: dict, key: str, texture: np.ndarray, format: str):
+    """
+    在 layoutTextures 的结果后追加一个不按 chunk 排布的纹理，texture 形状为 (height, width, channels)。
+    """
+    offset = sum(descriptor["size"] for descriptor in descriptors.values())
+    descriptors["u_" + key] = {
+        "offset": offset,
+        "size": texture.nbytes,
+        "width": texture.shape[1],
+        "height": texture.shape[0],
+        "format": format,
+        "bind": len(descriptors),
+    }
+    textures[key] = texture
+
+def concatTextureSets(sets: list) -> tuple:
+    """
+    把多组 layoutTextures 的结果按顺序首尾相接，调整 offset 和 bind。
+
+    Args:
+        sets: [(suffix, descriptors, textures)]，纹理名加上 suffix 以免重名。
+
+    Returns:
+        (descriptors, textures, ranges)，ranges[i] 为第 i 组的 (byteOffset, byteLength, {原名: 新名})。
+    """
+    descriptors, textures, ranges = {}, {}, []
+    offset = 0
+    for suffix, setDescriptors, setTextures in sets:
+        start = offset
+        names = {}
+        for (key, descriptor), (textureKey, texture) in zip(setDescriptors.items(), setTextures.items()):
+            names[key] = key + suffix
+            descriptors[key + suffix] = {**descriptor, "offset": offset, "bind": len(descriptors)}
+            textures[textureKey + suffix] = texture
+            offset += descriptor["size"]
+        ranges.append((start, offset - start, names))
+    return descriptors, textures, ranges
+
+def buildGLTF(descriptors: dict, texDataLength: int, gsType: str, name: str, pointCount: int,
+              extras: dict = None) -> 'GLTF2':
+    """
+    根据纹理描述创建 gltf（不含二进制数据），二进制数据为纹理数据后接 PLACEHOLDER_POS。
+    extras: 追加到 node extras 中的其他信息，例如 LOD 的层级表。
+    """
+    # pygltflib is only needed when writing, keep it out of the import path
+    from pygltflib import (GLTF2, Buffer, BufferView, Sampler, Image, Texture, Material, PbrMetallicRoughness,
+                           Accessor, Primitive, Attributes, Mesh, Node, Scene,
+                           NEAREST, ARRAY_BUFFER, FLOAT, VEC3, POINTS)
+
+    gltf = GLTF2()
+
+    # 2. 创建一个 Buffer 和一个 Sampler
+    gltf.buffers.append(Buffer(byteLength=texDataLength + len(PLACEHOLDER_POS)))
+    gltf.samplers.append(Sampler(magFilter=NEAREST, minFilter=NEAREST))
+
+    # 3. 为每个数据块创建 Image 和 Texture
+    texture_indices = {}
+
+    for key, descriptor in descriptors.items():
+        buffer_view = BufferView(buffer=0, byteOffset=descriptor['offset'], byteLength=descriptor['size'])
+        buffer_view_index = len(gltf.bufferViews)
+        gltf.bufferViews.append(buffer_view)
+
+        image = Image(
+            bufferView=buffer_view_index,
+            mimeType="image/vnd.custom-raw",
+            extras={
+                "name": key,
+                "format": descriptor['format'],
+                "width": descriptor['width'],
+                "height": descriptor['height']
+            }
+        )
+        image_index = len(gltf.images)
+        gltf.images.append(image)
+
+        texture = Texture(sampler=0, source=image_index)
+        texture_index = len(gltf.textures)
+        gltf.textures.append(texture)
+        texture_indices[key] = texture_index
+
+    # 4. 创建一个虚拟材质，并在 extras 中存储纹理映射
+    material = Material(
+        pbrMetallicRoughness=PbrMetallicRoughness(baseColorFactor=[1.0, 1.0, 1.0, 1.0]),
+        extras={"dataTextures": texture_indices}
+    )
+    gltf.materials.append(material)
+
+    # 5. 创建一个占位符 Mesh, Node, 和 Scene
+    gltf.bufferViews.append(BufferView(buffer=0, byteOffset=texDataLength, byteLength=len(PLACEHOLDER_POS), target=ARRAY_BUFFER))
+    gltf.accessors.append(Accessor(bufferView=len(gltf.bufferViews)-1, componentType=FLOAT, count=1, type=VEC3, max=[0,0,0], min=[0,0,0]))
+
+    primitive = Primitive(attributes=Attributes(POSITION=0), material=0, mode=POINTS)
+    gltf.meshes.append(Mesh(primitives=[primitive]))
+
+    gltf.nodes.append(Node(
+        mesh=0,
+        matrix=[
+          1, 0, 0, 0,
+          0, 1, 0, 0,
+          0, 0, 1, 0,
+          0, 0, 0, 1
+        ],
+        extras={
+            "gsType": gsType,
+            "name": name,
+            "num": pointCount,
+            "quality": "medium",
+            **(extras or {}),
+        }
+    ))
+    gltf.scenes.append(Scene(nodes=[0]))
+
+    return gltf
+
+def writeGLBHeader(file, gltf: 'GLTF2', binLength: int) -> int:
+    """
+    写入 GLB 文件头、JSON chunk 和 BIN chunk 头（与 pygltflib 的 save 输出一致），
+    返回二进制数据在文件中的起始偏移，调用者随后写入 binLength 字节的数据。
+    """
+    json_blob = gltf.gltf_to_json(separators=(',', ':'), indent=None).encode("utf-8")
+    # JSON chunk 补空格到 4 字节对齐，保证二进制数据也 4 字节对齐
+    json_blob += b' ' * (-(12 + len(json_blob)) % 4)
+    length = 12 + 8 + len(json_blob) + 8 + binLength
+
+    file.write(b'glTF')
+    file.write(struct.pack('<II', 2, length))
+    file.write(struct.pack('<I', len(json_blob)))
+    file.write(b'JSON')
+    file.write(json_blob)
+    file.write(struct.pack('<I', binLength))
+    file.write(b'BIN\x00')
+    return 12 + 8 + len(json_blob) + 8
+
+def writeArrays(file, arrays: list) -> int:
+    """
+    依次把数组的原始字节写入文件，不拼接成中间的 bytes，返回写入的字节数。
+    """
+    written = 0
+    for array in arrays:
+        data = memoryview(np.ascontiguousarray(array)).cast('B')
+        file.write(data)
+        written += data.nbytes
+    return written
+
+def writeGLB(outputPath: str, gltf: 'GLTF2', textures: list):
+    """
+    流式写出 glb：文件头和 JSON chunk 之后直接写入各纹理数组和 PLACEHOLDER_POS。
+    gltf 由 buildGLTF 创建，textures 的顺序与 descriptors 的 offset 一致。
+    """
+    binLength = gltf.buffers[0].byteLength
+    with open(outputPath, 'wb') as file:
+        binOffset = writeGLBHeader(file, gltf, binLength)
+        written = writeArrays(file, textures)
+        file.write(PLACEHOLDER_POS)
+        if written + len(PLACEHOLDER_POS) != binLength:
+            raise ValueError(f"texture data size {written} does not match the gltf buffer")
+    return binOffset
+
+def writeGLTFJson(jsonPath: str, gltf: 'GLTF2', textures: list):
+    """
+    与 GLTF2.save_json 的输出一致：二进制数据写入同名 .bin 文件，buffer 以 uri 引用。
+    """
+    binPath = os.path.splitext(jsonPath)[0] + ".bin"
+    with open(binPath, 'wb') as file:
+        writeArrays(file, textures)
+        file.write(PLACEHOLDER_POS)
+
+    buffer = gltf.buffers[0]
+    uri = buffer.uri
+    buffer.uri = os.path.basename(binPath)
+    try:
+        with open(jsonPath, 'w') as file:
+            file.write(gltf.gltf_to_json())
+    finally:
+        buffer.uri = uri
+
+ANALYSIS_PERCENTILES = (50, 90, 99)
+ANALYSIS_BATCH = 64
+# 计算直径时先只检查离中心最远的若干个点
+DIAMETER_CANDIDATES = 32
+
+def blockDiameters(centered: np.ndarray, squared: np.ndarray) -> np.ndarray:
+    """
+    批量求每组点的直径（两点间最大距离），结果是精确值。
+
+    直径的端点一般离中心很远，先只计算最远的 k 个点与组内所有点的距离得到下界 L；
+    其余点对的两个端点离中心都不超过第 k+1 远的距离 r，距离不超过 2r。
+    2r <= L 时下界即为直径，否则对该组计算全部点对。
+
+    Args:
+        centered: (B, N, 3)，已减去组中心的坐标。
+        squared: (B, N)，每个点到组中心距离的平方。
+    """
+    k = min(DIAMETER_CANDIDATES, centered.shape[1] - 1)
+    if k < 1:
+        return np.zeros(centered.shape[0])
+    order = np.argpartition(-squared, k, axis=1)
+    candidates = order[:, :k]
+    rest_max = np.take_along_axis(squared, order[:, k:k + 1], axis=1)[:, 0]
+
+    gram = np.matmul(np.take_along_axis(centered, candidates[:, :, None], axis=1), centered.transpose(0, 2, 1))
+    distances = np.take_along_axis(squared, candidates, axis=1)[:, :, None] + squared[:, None, :] - 2 * gram
+    diameters = np.maximum(distances.max(axis=(1, 2)), 0)
+
+    unresolved = np.flatnonzero(4 * rest_max > diameters)
+    if len(unresolved) > 0:
+        block = centered[unresolved]
+        gram = np.matmul(block, block.transpose(0, 2, 1))
+        distances = squared[unresolved][:, :, None] + squared[unresolved][:, None, :] - 2 * gram
+        diameters[unresolved] = np.maximum(distances.max(axis=(1, 2)), 0)
+
+    return np.sqrt(diameters)
+
+def summarizeValues(values: np.ndarray, bins: int) -> dict:
+    """
+    统计一组数值，返回可以直接写入 json 的字典（最值、均值、分位数和直方图）。
+    """
+    if len(values) == 0:
+        return {"min": 0.0, "max": 0.0, "mean": 0.0, "percentiles": {}, "histogram": {"edges": [], "counts": []}}
+    counts, edges = np.histogram(values, bins=bins)
+    return {
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "percentiles": {f"p{p}": float(v) for p, v in zip(ANALYSIS_PERCENTILES, np.percentile(values, ANALYSIS_PERCENTILES))},
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+    }
+
+def analyze_point_blocks(points: np.ndarray, block_size: int = 256, sample: int = None,
+                         bins: int = 32, seed: int = 0, verbose: bool = True) -> dict:
+    """
+    分析已排序和分组的点云，批量统计每个 chunk 的紧凑程度。
+
+    每个 chunk 计算:
+        extent: 包围盒最长边。
+        radius: 以包围盒中心为球心的包围球半径（不小于最小包围球半径）。
+        diameter: 组内两点间的最大距离（精确值），见 blockDiameters。
+
+    Args:
+        points: 已排序和分组的点云，形状为 (N, 3)，N 按 block_size 对齐，多余的点不参与统计。
+        block_size: 每个分组的大小。
+        sample: 随机抽取的 chunk 数量，None 或 0 表示统计全部 chunk。
+        bins: 直方图的桶数。
+        seed: 抽样使用的随机种子。
+        verbose: 是否打印统计摘要。
+
+    Returns:
+        统计结果字典，extent / radius / diameter 各自包含 min、max、mean、percentiles 和 histogram。
+    """
+    start_time = time.time()
+
+    n_points = len(points)
+    num_blocks = n_points // block_size
+    threshold_distance = np.sqrt(3)
+
+    blocks = points[:num_blocks * block_size].reshape([num_blocks, block_size, 3])
+    if sample and sample < num_blocks:
+        selected = np.sort(np.random.default_rng(seed).choice(num_blocks, sample, replace=False))
+    else:
+        selected = np.arange(num_blocks)
+
+    extents = np.empty(len(selected), dtype=np.float64)
+    radii = np.empty(len(selected), dtype=np.float64)
+    diameters = np.empty(len(selected), dtype=np.float64)
+    for start in range(0, len(selected), ANALYSIS_BATCH):
+        batch = selected[start:start + ANALYSIS_BATCH]
+        block = blocks[batch].astype(np.float64)
+        min_coords = block.min(axis=1, keepdims=True)
+        max_coords = block.max(axis=1, keepdims=True)
+        extents[start:start + len(batch)] = (max_coords - min_coords).max(axis=(1, 2))
+
+        # 以包围盒中心为原点，减小 |a|^2 + |b|^2 - 2ab 的相消误差
+        centered = block - (min_coords + max_coords) / 2
+        squared = np.einsum('bij,bij->bi', centered, centered)
+        radii[start:start + len(batch)] = np.sqrt(squared.max(axis=1))
+
+        diameters[start:start + len(batch)] = blockDiameters(centered, squared)
+
+    compact_blocks_count = int(np.sum(diameters < threshold_distance))
+    total_blocks_found = len(selected)
+    percentage_compact = compact_blocks_count / total_blocks_found * 100 if total_blocks_found > 0 else 0
+
+    result = {
+        "points": n_points,
+        "chunkSize": block_size,
+        "chunks": num_blocks,
+        "sampledChunks": total_blocks_found,
+        "compactThreshold": float(threshold_distance),
+        "compactChunks": compact_blocks_count,
+        "compactPercentage": percentage_compact,
+        "extent": summarizeValues(extents, bins),
+        "radius": summarizeValues(radii, bins),
+        "diameter": summarizeValues(diameters, bins),
+        "seconds": time.time() - start_time,
+    }
+
+    if verbose:
+        print(f"Analysis done, using {result['seconds']:.2f}s")
+        print("-" * 25)
+        print(f"point num: {n_points:,}")
+        print(f"chunk size: {block_size}")
+        print(f"chunk num: {num_blocks} ({total_blocks_found} analyzed)")
+        print("-" * 25)
+        print(f"compact threshold: sqrt(3) ≈ {threshold_distance:.4f}")
+        print(f"compact chunk num: {compact_blocks_count} / {total_blocks_found}")
+        print(f"compact chunk percentage: {percentage_compact:.2f}%")
+        print("-" * 25)
+        for key in ("extent", "radius", "diameter"):
+            stats = result[key]
+            percentiles = ", ".join(f"{p}: {v:.4f}" for p, v in stats["percentiles"].items())
+            print(f"chunk {key}: mean {stats['mean']:.4f}, {percentiles}, max {stats['max']:.4f}")
+        print()
+
+    return result
+
 def create_block_colors_high_contrast(n_points: int, block_size: int = 256) -> np.ndarray:
     """
     使用黄金比例配色法为点云创建高对比度的分块颜色。
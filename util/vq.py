@@ -0,0 +1,127 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from . import sorting
+
+# 球谐系数（1-3 阶，每点 45 个 float）的矢量量化：两级 mini-batch k-means 得到码本，
+# 每个点只保存一个不超过 16 位的码本索引。
+# 第一级把所有点分成 2^(bits/2) 个粗类，第二级在每个粗类内各训练 2^(bits - bits/2) 个码字，
+# 索引 = 粗类 * 细类数 + 细类。每个点只需和 2 * 2^(bits/2) 个中心比较，而不是全部码字。
+
+CODEBOOK_SIZE = 1 << 16
+BATCH_SIZE = 4096
+ITERATIONS = 50
+FINE_BATCH_SIZE = 2048
+FINE_ITERATIONS = 10
+# 分配时每块的点数，限制 (rows, k) 距离矩阵的内存
+BLOCK_ROWS = 1 << 14
+
+
+def nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    每行最近的中心的序号。||x - c||^2 = ||x||^2 - 2 x·c + ||c||^2，||x||^2 与中心无关省略。
+    """
+    distances = data @ centroids.T
+    distances *= -2
+    distances += (centroids * centroids).sum(axis=1)
+    return distances.argmin(axis=1)
+
+def kmeans(data: np.ndarray, k: int, rng: np.random.Generator,
+           iterations: int = ITERATIONS, batchSize: int = BATCH_SIZE) -> np.ndarray:
+    """
+    mini-batch k-means（Sculley 2010）：每次随机取 batchSize 个点，中心移向分到它的点的均值，
+    步长为 1 / 累计分到的点数。一直没有分到点的中心重新取一个随机点。
+
+    Returns:
+        (k, d) float32 中心。
+    """
+    n = data.shape[0]
+    centroids = data[rng.choice(n, k, replace=False)].astype(np.float32)
+    counts = np.zeros(k, dtype=np.int64)
+    for _ in range(iterations):
+        batch = data if n <= batchSize else data[rng.integers(0, n, batchSize)]
+        labels = nearest(batch, centroids)
+        batchCounts = np.bincount(labels, minlength=k)
+        # 按类别排序后分段求和，比 np.add.at 快得多
+        hit = batchCounts > 0
+        sums = np.zeros_like(centroids)
+        starts = np.concatenate([[0], np.cumsum(batchCounts)[:-1]])
+        sums[hit] = np.add.reduceat(batch[np.argsort(labels, kind='stable')], starts[hit], axis=0)
+
+        counts += batchCounts
+        # 累计均值：c += (sum - m * c) / count
+        centroids[hit] += (sums[hit] - batchCounts[hit, np.newaxis] * centroids[hit]) / counts[hit, np.newaxis]
+
+        dead = np.flatnonzero(counts == 0)
+        if len(dead) > 0:
+            centroids[dead] = data[rng.integers(0, n, len(dead))]
+    return centroids
+
+def assign(data: np.ndarray, centroids: np.ndarray, executor=None) -> np.ndarray:
+    """
+    分块计算每行最近的中心，executor 不为 None 时各块在线程中并行（矩阵乘法释放 GIL）。
+    """
+    labels = np.empty(data.shape[0], dtype=np.int64)
+
+    def assignBlock(start, end):
+        labels[start:end] = nearest(data[start:end], centroids)
+
+    blocks = [(start, min(start + BLOCK_ROWS, data.shape[0])) for start in range(0, data.shape[0], BLOCK_ROWS)]
+    sorting.run_blocks(executor, assignBlock, blocks)
+    return labels
+
+def buildCodebook(vectors: np.ndarray, size: int = CODEBOOK_SIZE, workers: int = None, seed: int = 0) -> tuple:
+    """
+    两级 k-means 码本。结果只与 seed 有关，与线程数无关。
+
+    Args:
+        vectors: (n, d) float32。
+        size: 码本大小，2 的幂，不超过 2^16。
+        workers: 线程数，缺省为 CPU 数。
+
+    Returns:
+        (codebook, indices)：(size, d) float32 码本和 (n,) uint16 索引。
+    """
+    if size < 2 or size > CODEBOOK_SIZE or size & (size - 1) != 0:
+        raise ValueError(f"codebook size must be a power of two in [2, {CODEBOOK_SIZE}]")
+    bits = size.bit_length() - 1
+    coarse, fine = 1 << (bits // 2), 1 << (bits - bits // 2)
+    workers = sorting.default_workers() if workers is None else workers
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    codebook = np.zeros((size, d), dtype=np.float32)
+    indices = np.zeros(n, dtype=np.uint16)
+    if n == 0:
+        return codebook, indices
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        if n <= coarse:
+            centroids = vectors[np.arange(coarse) % n]
+        else:
+            centroids = kmeans(vectors, coarse, np.random.default_rng([seed, 0]))
+        labels = assign(vectors, centroids, executor)
+
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(coarse + 1))
+
+        def fineCluster(c):
+            members = order[bounds[c]:bounds[c + 1]]
+            entries = codebook[c * fine:(c + 1) * fine]
+            # 没用到的码字保持为粗类中心
+            entries[:] = centroids[c]
+            if len(members) == 0:
+                return
+            data = vectors[members]
+            if len(members) <= fine:
+                # 点数不超过码字数时每个点就是一个码字，没有误差
+                entries[:len(members)] = data
+                local = np.arange(len(members))
+            else:
+                entries[:] = kmeans(data, fine, np.random.default_rng([seed, c + 1]),
+                                    FINE_ITERATIONS, FINE_BATCH_SIZE)
+                local = assign(data, entries)
+            indices[members] = c * fine + local
+
+        sorting.run_blocks(executor, fineCluster, [(c,) for c in range(coarse)])
+
+    return codebook, indices